@@ -4,7 +4,6 @@ import os
 import logging
 import sys
 from contextlib import asynccontextmanager
-from os import getenv
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -33,8 +32,14 @@ from icoapi.scripts.file_handling import (
 from icoapi.models.globals import (
     MeasurementSingleton,
     ICOsystemSingleton,
+    get_messenger,
+    get_trident_client,
     setup_trident,
 )
+from icoapi.scripts.bucket_cache import get_bucket_cache
+from icoapi.scripts.disk_sampler import get_disk_sampler
+from icoapi.scripts.settings import get_settings
+from icoapi.scripts.upload_queue import get_upload_queue
 from icoapi.utils.logging_setup import setup_logging
 
 
@@ -54,8 +59,14 @@ async def lifespan(application: FastAPI):  # pylint: disable=unused-argument
         await ICOsystemSingleton.create_instance_if_none()
     except Exception as e:  # pylint: disable=broad-exception-caught
         logger.error("Error when initializing CAN connection: %s", e)
+    await get_upload_queue().start()
+    await get_bucket_cache().start(get_trident_client)
+    await get_disk_sampler().start(get_messenger().mark_changed)
     yield
-    MeasurementSingleton.clear_clients()
+    await get_disk_sampler().stop()
+    await get_bucket_cache().stop()
+    await get_upload_queue().stop()
+    await MeasurementSingleton.clear_clients()
     await ICOsystemSingleton.close_instance()
 
 
@@ -72,7 +83,7 @@ app.include_router(prefix="/api/v1", router=config_routes.router)
 
 
 logger = logging.getLogger(__name__)
-origins = getenv("VITE_API_ORIGINS", "").split(",")
+origins = list(get_settings().api_origins)
 logger.info("Accepted origins for CORS: %s", origins)
 app.add_middleware(
     CORSMiddleware,
@@ -95,6 +106,8 @@ def main():
     ensure_folder_exists(get_application_dir())
     ensure_folder_exists(get_measurement_dir())
     ensure_folder_exists(get_config_dir())
+    logger.info("Measurement directory: %s", get_measurement_dir())
+    logger.info("Config directory: %s", get_config_dir())
 
     if is_bundled():
         config_src = os.path.join(sys._MEIPASS, "config")  # pylint: disable=protected-access
@@ -105,10 +118,10 @@ def main():
         get_config_dir()
     )
 
-    port = int(getenv("VITE_API_PORT", "33215"))
-    host = getenv("VITE_API_HOSTNAME", "0.0.0.0")
-
-    uvicorn.run("icoapi.api:app", host=host, port=port, log_config=None)
+    settings = get_settings()
+    uvicorn.run(
+        "icoapi.api:app", host=settings.api_hostname, port=settings.api_port, log_config=None
+    )
 
 
 if __name__ == "__main__":
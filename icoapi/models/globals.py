@@ -1,8 +1,10 @@
 """Keep track of global state of API"""
 
 import asyncio
+from dataclasses import asdict
+import json
 import logging
-from typing import List
+from typing import Any
 from starlette.websockets import WebSocket
 
 from icostate import CANInitError, ICOsystem
@@ -15,10 +17,16 @@ from icoapi.models.models import (
     SocketMessage,
     SystemStateModel,
     TridentConfig,
+    UploadJob,
 )
 from icoapi.models.trident import StorageClient
+from icoapi.scripts.bucket_cache import get_bucket_cache
+from icoapi.scripts.broadcast import MeasurementBroadcaster, StreamClient
+from icoapi.scripts.storage_writer import StorageWriter
 from icoapi.scripts.data_handling import read_and_parse_trident_config
-from icoapi.scripts.file_handling import get_dataspace_file_path, get_disk_space_in_gb
+from icoapi.scripts.disk_sampler import get_disk_sampler
+from icoapi.scripts.file_handling import get_dataspace_file_path
+from icoapi.scripts.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
@@ -101,7 +109,8 @@ class MeasurementState:
 
     def __init__(self) -> None:
         self.task: asyncio.Task | None = None
-        self.clients: List[WebSocket] = []
+        self.clients = MeasurementBroadcaster()
+        self.storage_writer: StorageWriter | None = None
         self.lock = asyncio.Lock()
         self.running = False
         self.name: str | None = None
@@ -115,13 +124,14 @@ class MeasurementState:
 
     def __setattr__(self, name: str, value) -> None:
         super().__setattr__(name, value)
-        asyncio.create_task(get_messenger().push_messenger_update())
+        get_messenger().mark_changed()
 
     async def reset(self) -> None:
         """Reset measurement"""
 
         self.task = None
-        self.clients = []
+        self.clients = MeasurementBroadcaster()
+        self.storage_writer = None
         self.lock = asyncio.Lock()
         self.running = False
         self.name = None
@@ -143,6 +153,8 @@ class MeasurementState:
             start_time=self.start_time,
             tool_name=self.tool_name,
             instructions=self.instructions,
+            clients=self.clients.get_status(),
+            storage=self.storage_writer.get_status() if self.storage_writer else None,
         )
 
 
@@ -172,19 +184,18 @@ class MeasurementSingleton:
         return cls._instance
 
     @classmethod
-    def clear_clients(cls):
-        """Clear list of WebSocket clients"""
+    async def clear_clients(cls):
+        """Close all WebSocket clients"""
 
-        num_of_clients = len(cls._instance.clients)
-        cls._instance.clients.clear()
+        num_of_clients = await cls._instance.clients.close()
         logger.info("Cleared %s clients from measurement WebSocket list", num_of_clients)
 
 
 async def get_measurement_state():
     """Get measurement singleton"""
 
-    # We need a coroutine here, since `Measurement.__setattr__`
-    # uses `asyncio.create_task`, which requires a running event loop.
+    # We need a coroutine here, since `Measurement.__setattr__` schedules
+    # state updates, which requires a running event loop.
     return MeasurementSingleton().get_instance()
 
 
@@ -195,11 +206,16 @@ class TridentHandler:
     """Singleton Wrapper for the Trident API client"""
 
     client: StorageClient | None = None
+    config: TridentConfig | None = None
     feature = Feature(enabled=False, healthy=False)
 
     @classmethod
     async def reset(cls):
+        if cls.client is not None:
+            cls.client.close()
         cls.client = None
+        cls.config = None
+        get_bucket_cache().invalidate()
         cls.feature = Feature(enabled=False, healthy=False)
         await get_messenger().push_messenger_update()
         logger.info("Reset TridentHandler")
@@ -213,6 +229,7 @@ class TridentHandler:
             config.default_bucket,
             config.domain,
         )
+        cls.config = config
         await get_messenger().push_messenger_update()
         logger.info(
             "Created TridentClient for user <%s> at service <%s>",
@@ -269,7 +286,7 @@ async def setup_trident():
                 logger.exception("Failed at creating trident connection")
                 await handler.set_health(False)
             else:
-                client.get_client().authenticate()
+                await client.run(client.authenticate)
                 if client.is_authenticated():
                     await handler.set_health(True)
 
@@ -288,67 +305,203 @@ async def setup_trident():
 # pylint: enable=missing-function-docstring
 
 
+def serialize_message(message: SocketMessage) -> str:
+    """Serialize a WebSocket message once for all clients"""
+
+    return json.dumps(message.model_dump(mode="json"), separators=(",", ":"), ensure_ascii=False)
+
+
+def get_state_changes(previous: dict[str, Any], current: dict[str, Any]) -> dict[str, Any]:
+    """
+    Get the fields of a state that changed as JSON merge patch (RFC 7396).
+
+    Nested objects only contain their changed fields, all other values
+    (including lists) replace the previous value as a whole. Removed fields
+    are ``None`` (``null``), which means "delete" in a merge patch.
+    """
+
+    changes: dict[str, Any] = {key: None for key in previous.keys() - current.keys()}
+    for key, value in current.items():
+        old = previous.get(key)
+        if isinstance(value, dict) and isinstance(old, dict):
+            nested = get_state_changes(old, value)
+            if nested:
+                changes[key] = nested
+        elif key not in previous or old != value:
+            changes[key] = value
+
+    return changes
+
+
 class GeneralMessenger:
     """
     This class servers as a handler for all clients which connect to the general state WebSocket.
+
+    State changes only mark the state as changed; a single background task
+    sends at most one state snapshot per ``WEBSOCKET_STATE_INTERVAL`` seconds.
+    Clients that opted into patches receive the full state once and
+    afterwards only the changed fields.
+
+    Every client has its own outbound queue and send task, so a slow client
+    does not delay the others. Each message is serialized once for all
+    clients. Clients that fail to receive a message within
+    ``WEBSOCKET_SEND_TIMEOUT`` seconds are removed.
     """
 
-    _clients: List[WebSocket] = []
+    _broadcaster: MeasurementBroadcaster | None = None
+    _patch_clients: set[WebSocket] = set()
+    _outdated_clients: set[WebSocket] = set()  # Clients waiting for the full state
+    _last_state: dict[str, Any] | None = None
+    _changed = False
+    _update_task: asyncio.Task | None = None
 
     @classmethod
-    def add_messenger(cls, messenger: WebSocket):
+    def get_broadcaster(cls) -> MeasurementBroadcaster:
+        """Get the outbound queues of the messenger clients"""
+
+        if cls._broadcaster is None:
+            # Messages of the state WebSocket are never dropped; clients that
+            # cannot keep up are removed after the send timeout instead
+            cls._broadcaster = MeasurementBroadcaster(
+                send_timeout=get_settings().websocket_send_timeout
+            )
+        return cls._broadcaster
+
+    @classmethod
+    def add_messenger(cls, messenger: WebSocket, patch: bool = False):
         """Add messenger client"""
 
-        cls._clients.append(messenger)
+        cls.get_broadcaster().add(messenger)
+        if patch:
+            cls._patch_clients.add(messenger)
+        cls.request_state(messenger)
         logger.info("Added WebSocket instance to general messenger list")
 
     @classmethod
     def remove_messenger(cls, messenger: WebSocket):
         """Remove messenger client"""
 
-        try:
-            cls._clients.remove(messenger)
+        cls._patch_clients.discard(messenger)
+        cls._outdated_clients.discard(messenger)
+        if cls.get_broadcaster().remove(messenger):
             logger.info("Removed WebSocket instance from general messenger list")
-        except ValueError:
-            logger.warning(
-                "Tried removing WebSocket instance from general messenger list but failed."
-            )
+        else:
+            logger.debug("WebSocket instance was already removed from general messenger list")
+
+    @classmethod
+    def prune(cls) -> list[StreamClient]:
+        """
+        Remove clients that can no longer receive messages.
+
+        :return: The remaining clients
+        """
+
+        broadcaster = cls.get_broadcaster()
+        for websocket in broadcaster.prune():
+            cls._patch_clients.discard(websocket)
+            cls._outdated_clients.discard(websocket)
+
+        return broadcaster.clients
+
+    @classmethod
+    def publish(cls, message: SocketMessage):
+        """Queue a message for all messenger clients"""
+
+        payload = serialize_message(message)
+        for client in cls.prune():
+            client.put(payload, droppable=False)
+
+    @classmethod
+    def mark_changed(cls):
+        """Schedule a state update for all messenger clients"""
+
+        cls._changed = True
+        if cls._update_task is not None and not cls._update_task.done():
+            return
+        try:
+            cls._update_task = asyncio.get_running_loop().create_task(cls.run_updates())
+        except RuntimeError:
+            # Without event loop there are no clients; the next change after
+            # the start of the loop schedules the update
+            pass
+
+    @classmethod
+    def request_state(cls, messenger: WebSocket):
+        """Schedule sending the full state to a single client"""
+
+        cls._outdated_clients.add(messenger)
+        cls.mark_changed()
 
     @classmethod
     async def push_messenger_update(cls):
         """Push updates about general state to messenger clients"""
 
-        state = await get_measurement_state()
-        cloud = await get_trident_feature()
-        for client in cls._clients:
-            await client.send_json(
-                SocketMessage(
-                    message="state",
-                    data=SystemStateModel(
-                        can_ready=ICOsystemSingleton.has_instance(),
-                        disk_capacity=get_disk_space_in_gb(),
-                        cloud=cloud,
-                        measurement_status=state.get_status(),
-                    ),
-                ).model_dump()
-            )
+        cls.mark_changed()
+
+    @classmethod
+    async def run_updates(cls):
+        """Send coalesced state updates as long as the state changes"""
+
+        while cls._changed:
+            await asyncio.sleep(get_settings().websocket_state_interval)
+            cls._changed = False
+            try:
+                await cls.send_state()
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                logger.error("Could not send SystemState: %s", error)
+
+    @classmethod
+    async def send_state(cls):
+        """Send the current state (or its changes) to the messenger clients"""
+
+        clients = cls.prune()
+        if not clients:
+            cls._last_state = None
+            return
+
+        measurement = await get_measurement_state()
+        state = SystemStateModel(
+            can_ready=ICOsystemSingleton.has_instance(),
+            disk_capacity=get_disk_sampler().get_capacity(),
+            cloud=await get_trident_feature(),
+            measurement_status=measurement.get_status(),
+        ).model_dump(mode="json")
+        changes = get_state_changes(cls._last_state or {}, state)
+        cls._last_state = state
+
+        payloads = {}
+        for client in clients:
+            websocket = client.websocket
+            if websocket in cls._outdated_clients or websocket not in cls._patch_clients:
+                message = SocketMessage(message="state", data=state)
+            elif changes:
+                message = SocketMessage(message="state_patch", data=changes)
+            else:
+                continue
+            cls._outdated_clients.discard(websocket)
+            if message.message not in payloads:
+                payloads[message.message] = serialize_message(message)
+            client.put(payloads[message.message], droppable=False)
 
-        if (len(cls._clients)) > 0:
-            logger.info("Pushed SystemState to %s clients.", len(cls._clients))
+        logger.debug("Queued SystemState for %s clients.", len(clients))
 
     @classmethod
     async def send_post_meta_request(cls):
         """Send post measurement metadata"""
 
-        for client in cls._clients:
-            await client.send_json(SocketMessage(message="post_meta_request").model_dump())
+        cls.publish(SocketMessage(message="post_meta_request"))
+
+    @classmethod
+    async def send_upload_progress(cls, job: UploadJob):
+        """Send state and progress of a cloud upload job"""
+
+        cls.publish(SocketMessage(message="upload_progress", data=asdict(job)))
 
     @classmethod
     async def send_post_meta_completed(cls):
         """Send post measurement metadata completed"""
 
-        for client in cls._clients:
-            await client.send_json(SocketMessage(message="post_meta_completed").model_dump())
+        cls.publish(SocketMessage(message="post_meta_completed"))
 
 
 def get_messenger():
@@ -1,11 +1,10 @@
 """Data Model Information"""
 
 from enum import unique, StrEnum
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from json import JSONEncoder
 from typing import Any, Dict, List, Optional
 
-import pandas
 from pydantic import BaseModel, model_validator
 
 from icostate import SensorNodeInfo
@@ -106,6 +105,15 @@ class Metadata:
 # pylint: disable=too-many-instance-attributes
 
 
+@dataclass
+class StorageLayout:
+    """HDF5 layout of the acceleration table of new measurement files"""
+
+    chunk_rows: int | None = None  # Rows per chunk (None: chosen by PyTables)
+    compression: str | None = None  # PyTables compression library (None: zlib, level 4)
+    compression_level: int | None = None  # 0 - 9
+
+
 @dataclass
 class MeasurementInstructions:
     """
@@ -123,6 +131,8 @@ class MeasurementInstructions:
         ift_window_width (int): IFT window width
         adc (ADCValues): ADC settings
         meta (Metadata): Pre-measurement metadata
+        storage_layout (StorageLayout): Chunk size and compression of the
+            measurement file (overrides the environment settings)
     """
 
     name: str | None
@@ -138,11 +148,29 @@ class MeasurementInstructions:
     meta: Metadata | None
     wait_for_post_meta: bool = False
     disconnect_after_measurement: bool = False
+    storage_layout: StorageLayout | None = None
 
 
 # pylint: enable=too-many-instance-attributes
 
 
+@unique
+class StreamFormat(StrEnum):
+    """Enum for data formats of the measurement stream"""
+
+    JSON = "json"
+    BINARY = "binary"
+
+
+@unique
+class LagPolicy(StrEnum):
+    """Enum for handling measurement clients that cannot keep up with the stream"""
+
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+    DECIMATE = "decimate"
+
+
 class DataValueModel(BaseModel, JSONEncoder):
     """Data model for sending measured data"""
 
@@ -179,6 +207,24 @@ class DiskCapacity:
 
     total: float | None
     available: float | None
+    recording_time_remaining: float | None = None  # Seconds, only while recording
+
+
+@unique
+class FileSortKey(StrEnum):
+    """Enum for sorting measurement files"""
+
+    NAME = "name"
+    CREATED = "created"
+    SIZE = "size"
+
+
+@unique
+class SortOrder(StrEnum):
+    """Enum for sort orders"""
+
+    ASC = "asc"
+    DESC = "desc"
 
 
 @dataclass
@@ -188,6 +234,15 @@ class FileListResponseModel:
     capacity: DiskCapacity
     files: list[MeasurementFileDetails]
     directory: str
+    total: int | None = None  # Number of files on all pages
+
+
+@unique
+class DownsamplingMode(StrEnum):
+    """Enum for algorithms to reduce measurement data for plotting"""
+
+    MINMAX = "minmax"
+    LTTB = "lttb"
 
 
 class Dataset(BaseModel, JSONEncoder):
@@ -206,6 +261,54 @@ class ParsedMeasurement(BaseModel, JSONEncoder):
     datasets: list[Dataset]
 
 
+@unique
+class RangeUnit(StrEnum):
+    """Enum for units of measurement data ranges"""
+
+    TIME = "time"  # Seconds since measurement start
+    ROW = "row"  # Row index in acceleration table
+
+
+class MeasurementRange(ParsedMeasurement):
+    """Data model for a (downsampled) range of measurement data"""
+
+    start_row: int
+    end_row: int
+    factor: int = 1  # Reduction factor of the used overview level (1: raw data)
+
+
+@dataclass
+class StreamClientStatus:
+    """Status of the outbound queue of a measurement stream client"""
+
+    client: str
+    stream_format: StreamFormat
+    queue_depth: int
+    queue_size: int
+    sent: int
+    dropped: int
+
+
+# pylint: disable=too-many-instance-attributes
+
+
+@dataclass
+class StorageWriterStatus:
+    """Queue and latency metrics of the measurement storage writer"""
+
+    queue_depth: int
+    queue_size: int
+    max_queue_depth: int
+    blocks: int
+    rows: int
+    last_write_latency: float  # Seconds
+    max_write_latency: float  # Seconds
+    mean_write_latency: float  # Seconds
+
+
+# pylint: enable=too-many-instance-attributes
+
+
 @dataclass
 class MeasurementStatus:
     """Measurement status information"""
@@ -215,6 +318,8 @@ class MeasurementStatus:
     start_time: Optional[str] = None
     tool_name: Optional[str] = None
     instructions: Optional[MeasurementInstructions] = None
+    clients: List[StreamClientStatus] = field(default_factory=list)
+    storage: Optional[StorageWriterStatus] = None
 
 
 @dataclass
@@ -264,6 +369,9 @@ class TridentConfig:
     password: str
     default_bucket: str
     enabled: bool
+    auto_upload: bool = False  # Upload measurement files after the measurement
+    compression: Optional[str] = None  # PyTables compression library for repacking
+    compression_level: int = 5
 
 
 # pylint: enable=too-many-instance-attributes
@@ -289,6 +397,40 @@ class TridentBucketObject:
 # pylint: enable=invalid-name, missing-class-docstring
 
 
+@unique
+class UploadJobState(StrEnum):
+    """Enum for the state of a cloud upload job"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+# pylint: disable=too-many-instance-attributes
+
+
+@dataclass
+class UploadJob:
+    """Cloud upload job of a measurement file"""
+
+    id: str  # pylint: disable=invalid-name
+    filename: str
+    bucket: str
+    key: str
+    state: UploadJobState
+    size: int  # Bytes
+    uploaded: int  # Bytes
+    multipart: bool
+    created: str
+    updated: str
+    error: Optional[str] = None
+
+
+# pylint: enable=too-many-instance-attributes
+
+
 @dataclass
 class LogResponse:
     """Response to log requests"""
@@ -381,16 +523,6 @@ class HDF5NodeInfo(BaseModel, JSONEncoder):
     attributes: dict[str, Any]
 
 
-@dataclass
-class ParsedHDF5FileContent(JSONEncoder):
-    """HDF5 data file content"""
-
-    acceleration_df: pandas.DataFrame
-    sensor_df: pandas.DataFrame
-    acceleration_meta: HDF5NodeInfo
-    pictures: dict[str, list[str]]
-
-
 class ParsedMetadata(BaseModel, JSONEncoder):
     """HDF5 metadata"""
 
@@ -1,15 +1,40 @@
 # https://git.ift.tuwien.ac.at/lab/ift/infrastructure/trident-client/-/blob/main/main.py?ref_type=heads
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import json
+import os
 import socket
+import threading
+import time
 from http.client import HTTPException
+from typing import Any, BinaryIO, Callable, TypeVar
 
 import requests
 import logging
 
 from icoapi.scripts.file_handling import tries_to_traverse_directory
+from icoapi.scripts.settings import get_settings
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+REFRESH_MARGIN = 30  # Refresh access tokens this many seconds before they expire
+
+
+def get_request_timeout() -> float:
+    """Get the timeout in seconds for connecting to and reading from the Trident API"""
+
+    return get_settings().trident_timeout
+
+
+def get_worker_count() -> int:
+    """Get the maximum number of concurrent requests to the Trident API"""
+
+    return get_settings().trident_workers
+
 
 class HostNotFoundError(HTTPException):
     """Error for host not found"""
@@ -23,6 +48,47 @@ class PresignError(HTTPException):
     """Error representing failure in presigning"""
 
 
+class ProgressReader:
+    """File wrapper that reports the number of bytes read so far"""
+
+    def __init__(self, file: BinaryIO, progress: Callable[[int], None]):
+        self.file = file
+        self.progress = progress
+        self.position = 0
+        self.size = os.fstat(file.fileno()).st_size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.file.read(size)
+        self.position += len(data)
+        self.progress(self.position)
+        return data
+
+
+def get_token_expiry(access_token: str | None, token_data: dict[str, Any]) -> float | None:
+    """
+    Get the expiry time of an access token as Unix timestamp.
+
+    The time is read from the ``exp`` claim of the JWT or, if the token can not
+    be decoded, from the ``expires_in`` field of the response.
+    """
+    if access_token:
+        try:
+            payload = access_token.split(".")[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+            return float(claims["exp"])
+        except (IndexError, KeyError, TypeError, ValueError):
+            pass
+
+    expires_in = token_data.get("expires_in")
+    if expires_in is not None:
+        return time.time() + float(expires_in)
+
+    return None
+
+
 class TridentConnection:
     def __init__(self, service: str, username: str, password: str, domain: str):
         self.service = service
@@ -31,21 +97,41 @@ class TridentConnection:
         self.domain = domain
         self.secrets = {"username": username, "password": password}
         self.session = requests.Session()
+        self.timeout = get_request_timeout()
+        # Requests run in multiple worker threads, but share the tokens
+        self.lock = threading.RLock()
+        self.access_token: str | None = None
+        self.expires_at: float | None = None
+
+    def _store_tokens(self, token_data: dict[str, Any]) -> str | None:
+        """Use the access and refresh token of an authentication response."""
+        access_token = token_data.get("access_token")
+        refresh_token: Any = token_data.get("refresh_token")
+
+        self.session.headers.update({"Authorization": f"Bearer {access_token}"})
+        self.session.cookies.set("refresh_token", refresh_token, domain=self.domain)
+        self.access_token = access_token
+        self.expires_at = get_token_expiry(access_token, token_data)
+        return access_token
+
+    def reset_session(self):
+        """Drop all tokens and start a new session."""
+        with self.lock:
+            self.session.close()
+            self.session = requests.Session()
+            self.access_token = None
+            self.expires_at = None
 
     def _get_access_token(self):
         """Retrieve access token from the authentication endpoint."""
         try:
             self.session.cookies.clear()
-            response = self.session.post(f"{self.service}/auth/login", json=self.secrets)
+            response = self.session.post(
+                f"{self.service}/auth/login", json=self.secrets, timeout=self.timeout
+            )
             response.raise_for_status()
 
-            token_data = response.json()
-            access_token = token_data.get("access_token")
-            refresh_token = token_data.get("refresh_token")
-
-            self.session.headers.update({"Authorization": f"Bearer {access_token}"})
-            self.session.cookies.set("refresh_token", refresh_token, domain=self.domain)
-
+            access_token = self._store_tokens(response.json())
             logger.info("Successfully retrieved access and refresh token.")
             return access_token
 
@@ -66,57 +152,81 @@ class TridentConnection:
         """Refresh the access token using the refresh token."""
         refresh_token = self.session.cookies.get("refresh_token", domain=self.domain)
         if not refresh_token:
-            logger.error("Refresh token not found when trying to refresh authentication.")
+            logger.warning("Refresh token not found when trying to refresh authentication.")
+            self.reset_session()
+            return self._get_access_token()
 
         try:
             response = self.session.post(
-                f"{self.service}/auth/refresh", json={"refresh_token": refresh_token}
+                f"{self.service}/auth/refresh",
+                json={"refresh_token": refresh_token},
+                timeout=self.timeout,
             )
             response.raise_for_status()
 
-            token_data = response.json()
-            new_access_token = token_data.get("access_token")
-            new_refresh_token = token_data.get("refresh_token")
-
-            self.session.cookies.set("refresh_token", new_refresh_token, domain=self.domain)
-            self.session.headers.update({"Authorization": f"Bearer {new_access_token}"})
+            new_access_token = self._store_tokens(response.json())
             logger.info("Access and refresh token refreshed successfully.")
             return new_access_token
         except requests.exceptions.RequestException as e:
             logger.error(f"Error refreshing access and refresh token: {e}")
-            self.session.close()
-            self.session = requests.Session()
+            self.reset_session()
             logger.warning("Refresh failed. Started new session.")
-            self._ensure_auth()
+            return self._ensure_auth()
 
     def _ensure_auth(self):
         """Ensure an access token is available before making a request."""
         if not self.session.headers.get("Authorization"):
-            self._get_access_token()
+            return self._get_access_token()
+        return self.access_token
+
+    def _expires_soon(self) -> bool:
+        """Return whether the access token expires within the refresh margin."""
+        return self.expires_at is not None and time.time() >= self.expires_at - REFRESH_MARGIN
 
     def is_authenticated(self):
         """Return whether the authentication was successful."""
         return self.session.headers.get("Authorization") is not None
 
     def authenticate(self):
-        self._ensure_auth()
+        with self.lock:
+            self._ensure_auth()
 
-    def refresh(self):
-        self._refresh_with_refresh_token()
+    def refresh(self, expired_token: str | None = None):
+        """
+        Refresh the access token.
+
+        If ``expired_token`` is given, the refresh is skipped when another
+        thread already replaced that token, so concurrent requests that fail
+        with the same token share a single refresh.
+        """
+        with self.lock:
+            if expired_token is not None and expired_token != self.access_token:
+                return
+            self._refresh_with_refresh_token()
+
+    def get_valid_token(self) -> str | None:
+        """Get an access token, refreshing it only if it is missing or about to expire."""
+        with self.lock:
+            if not self.is_authenticated():
+                return self._get_access_token()
+            if self._expires_soon():
+                logger.info("Access token expires soon. Refreshing...")
+                return self._refresh_with_refresh_token()
+            return self.access_token
 
     def request(self, method, path, **kwargs):
         """Generic request handler with authentication and retry on token expiration."""
-        self._refresh_with_refresh_token()
-        self._ensure_auth()
+        access_token = self.get_valid_token()
         url = self.service + path
+        kwargs.setdefault("timeout", self.timeout)
 
         try:
             logger.info(f"{method} request for {url}")
             response = self.session.request(method, url, **kwargs)
             if response.status_code == 401:
                 logger.warning("Authentication expired during session. Refreshing...")
-                self._refresh_with_refresh_token()
-                return self.session.request(method, url, **kwargs)  # Retry with new token
+                self.refresh(access_token)
+                response = self.session.request(method, url, **kwargs)  # Retry with new token
 
             if response.status_code >= 500:
                 logger.error(
@@ -126,7 +236,8 @@ class TridentConnection:
             return response
         except requests.exceptions.RequestException as e:
             logger.error(f"Request error: {e}")
-            raise HTTPException(f"Failed request. Response: {response.text}") from e
+            text = e.response.text if e.response is not None else str(e)
+            raise HTTPException(f"Failed request. Response: {text}") from e
 
     def post(self, path, data):
         return self.request("POST", path, json=data)
@@ -152,6 +263,30 @@ class StorageClient:
     ):
         self.connection = TridentConnection(service, username, password, domain)
         self.default_bucket = default_bucket
+        # Presigned uploads must not carry the Trident authorization header
+        self.upload_session = requests.Session()
+        self.executor = ThreadPoolExecutor(
+            max_workers=get_worker_count(), thread_name_prefix="trident"
+        )
+
+    async def run(self, function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Execute a blocking client method in the thread pool of the client.
+
+        All methods of the client use blocking HTTP requests; API handlers
+        call them through this method, so slow or unreachable cloud services
+        never block the event loop (and therefore the measurement stream).
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(function, *args, **kwargs))
+
+    def close(self):
+        """Close all connections and stop the worker threads"""
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.connection.session.close()
+        self.upload_session.close()
 
     def get_client(self):
         return self.connection
@@ -159,35 +294,59 @@ class StorageClient:
     def get_buckets(self):
         return self.connection.get("/s3/buckets").json()
 
-    def get_bucket_objects(self, bucket: str | None = None):
+    def get_bucket_page(
+        self,
+        bucket: str | None = None,
+        prefix: str | None = None,
+        continuation_token: str | None = None,
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        """
+        Get a single page of the objects in a bucket.
+
+        :return: The objects and the continuation token of the next page
+            (``None`` for the last page)
+        """
+        bucket = bucket if bucket else self.default_bucket
+        params = {"bucket": bucket}
+        if prefix:
+            params["prefix"] = prefix
+        if continuation_token:
+            params["continuationToken"] = continuation_token
         try:
-            response = self.connection.get(
-                f"/s3/list?bucket={bucket if bucket else self.default_bucket}"
-            )
+            response = self.connection.get("/s3/list", params=params)
         except Exception:
             logger.error("Error getting bucket objects.")
             raise HTTPException
 
         try:
-            return response.json()
+            data = response.json()
         except json.decoder.JSONDecodeError as e:
             if response.status_code == 200:
-                logger.info(
-                    f"No objects found in bucket <{bucket if bucket else self.default_bucket}>."
-                )
-                return []
+                logger.info(f"No objects found in bucket <{bucket}>.")
+                return [], None
             logger.error(f"Error with decoding JSON response: {e}")
-            return []
+            return [], None
 
-    def upload_file(
+        # Services without pagination return a plain list of all objects
+        if isinstance(data, list):
+            return data, None
+        return data.get("Contents") or [], data.get("NextContinuationToken")
+
+    def get_bucket_objects(self, bucket: str | None = None, prefix: str | None = None):
+        objects, continuation_token = self.get_bucket_page(bucket, prefix)
+        while continuation_token:
+            page, continuation_token = self.get_bucket_page(bucket, prefix, continuation_token)
+            objects.extend(page)
+        return objects
+
+    def get_object_key(
         self,
-        file_path: str,
         filename: str,
         bucket: str | None = None,
         folder: str | None = "default",
-    ):
+    ) -> str:
+        """Get the object key of a file in the given folder of the bucket"""
         bucket = bucket if bucket else self.default_bucket
-        complete_filename_with_folder = filename
         if folder is None:
             logger.info(f"Trying file <{filename}> to bucket <{bucket}> with no folder specified.")
         elif folder == "":
@@ -201,17 +360,14 @@ class StorageClient:
                 " trying to traverse directories!"
             )
         else:
-            complete_filename_with_folder = f"{folder}/{filename}"
             logger.info(f"Trying file <{filename}> to bucket <{bucket}> under folder <{folder}>.")
+            return f"{folder}/{filename}"
 
-        presigned_url_response = self.connection.get(
-            "/s3/presigned-upload",
-            params={
-                "bucket": bucket,
-                "key": complete_filename_with_folder,
-                "expiresInSeconds": 600,
-            },
-        )
+        return filename
+
+    def get_presigned_url(self, path: str, params: dict[str, Any]) -> str:
+        """Get a presigned URL for an upload from the given endpoint"""
+        presigned_url_response = self.connection.get(path, params=params)
 
         if presigned_url_response.status_code != 200:
             logger.error(
@@ -227,9 +383,96 @@ class StorageClient:
             logger.error("Error getting presigned URL for upload: no presigned URL returned.")
             raise PresignError
         logger.info(f"Got presigned URL for upload: {presigned_url}")
+        return presigned_url
+
+    def upload_file(
+        self,
+        file_path: str,
+        filename: str,
+        bucket: str | None = None,
+        folder: str | None = "default",
+    ):
+        key = self.get_object_key(filename, bucket, folder)
+        return self.upload_object(file_path, key, bucket)
+
+    def upload_object(
+        self,
+        file_path: str,
+        key: str,
+        bucket: str | None = None,
+        progress: Callable[[int], None] | None = None,
+    ):
+        """
+        Upload a file with a single request.
+
+        :param progress: Called with the number of bytes read from the file
+            while it is sent; exceptions raised by it abort the upload
+        """
+        bucket = bucket if bucket else self.default_bucket
+        presigned_url = self.get_presigned_url(
+            "/s3/presigned-upload",
+            {"bucket": bucket, "key": key, "expiresInSeconds": 600},
+        )
 
         with open(file_path, "rb") as f:
-            return requests.put(presigned_url, data=f)
+            data = f if progress is None else ProgressReader(f, progress)
+            return self.upload_session.put(
+                presigned_url, data=data, timeout=self.connection.timeout
+            )
+
+    def create_multipart_upload(self, key: str, bucket: str | None = None) -> str:
+        """Start a multipart upload and return its upload ID"""
+        bucket = bucket if bucket else self.default_bucket
+        response = self.connection.post("/s3/multipart/create", {"bucket": bucket, "key": key})
+        return response.json()["uploadId"]
+
+    def upload_part(
+        self,
+        key: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes,
+        bucket: str | None = None,
+    ) -> str:
+        """Upload a single part of a multipart upload and return its ETag"""
+        bucket = bucket if bucket else self.default_bucket
+        presigned_url = self.get_presigned_url(
+            "/s3/multipart/presigned-part",
+            {
+                "bucket": bucket,
+                "key": key,
+                "uploadId": upload_id,
+                "partNumber": part_number,
+                "expiresInSeconds": 600,
+            },
+        )
+        response = self.upload_session.put(
+            presigned_url, data=data, timeout=self.connection.timeout
+        )
+        response.raise_for_status()
+        return response.headers["ETag"]
+
+    def complete_multipart_upload(
+        self,
+        key: str,
+        upload_id: str,
+        parts: list[dict[str, Any]],
+        bucket: str | None = None,
+    ):
+        """Combine the uploaded parts (``PartNumber`` and ``ETag``) into the object"""
+        bucket = bucket if bucket else self.default_bucket
+        return self.connection.post(
+            "/s3/multipart/complete",
+            {"bucket": bucket, "key": key, "uploadId": upload_id, "parts": parts},
+        )
+
+    def abort_multipart_upload(self, key: str, upload_id: str, bucket: str | None = None):
+        """Abort a multipart upload and remove its uploaded parts"""
+        bucket = bucket if bucket else self.default_bucket
+        return self.connection.delete(
+            "/s3/multipart/abort",
+            params={"bucket": bucket, "key": key, "uploadId": upload_id},
+        )
 
     def authenticate(self, *args, **kwargs):
         self.connection.authenticate()
@@ -241,5 +484,4 @@ class StorageClient:
         return self.connection.is_authenticated()
 
     def revoke_auth(self):
-        self.connection.session.close()
-        self.connection.session = requests.Session()
+        self.connection.reset_session()
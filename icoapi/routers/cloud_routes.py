@@ -1,16 +1,19 @@
 """Support for uploading data to cloud storage"""
 
+import asyncio
 import logging
 import os
 
 from fastapi import HTTPException, APIRouter
 from fastapi.params import Depends, Annotated, Body
-from starlette.status import HTTP_502_BAD_GATEWAY
+from starlette.status import HTTP_404_NOT_FOUND, HTTP_409_CONFLICT, HTTP_502_BAD_GATEWAY
 
-from icoapi.models.globals import get_trident_client, setup_trident
-from icoapi.models.models import TridentBucketObject
+from icoapi.models.globals import get_messenger, get_trident_client, setup_trident
+from icoapi.models.models import TridentBucketObject, UploadJob
 from icoapi.models.trident import AuthorizationError, HostNotFoundError, StorageClient
-from icoapi.scripts.file_handling import get_measurement_dir
+from icoapi.scripts.bucket_cache import get_bucket_cache
+from icoapi.scripts.file_handling import get_measurement_dir, tries_to_traverse_directory
+from icoapi.scripts.upload_queue import FINISHED_STATES, get_upload_queue, queue_upload
 
 router = APIRouter(prefix="/cloud", tags=["Cloud Connection"])
 
@@ -22,17 +25,47 @@ async def upload_file(
     filename: Annotated[str, Body(embed=True)],
     client: Annotated[StorageClient, Depends(get_trident_client)],
     measurement_dir: Annotated[str, Depends(get_measurement_dir)],
-):
-    """Upload file to cloud storage"""
+) -> UploadJob | None:
+    """
+    Queue the upload of a file to cloud storage
+
+    The file is uploaded in the background; the state and progress of the
+    upload are sent over the state WebSocket and available at ``/cloud/uploads``.
+    """
 
     if client is None:
         logger.warning("Tried to upload file to cloud, but no cloud connection is available.")
-    else:
-        try:
-            client.upload_file(os.path.join(measurement_dir, filename), filename)
-            logger.info("Successfully uploaded file <%s>", filename)
-        except HTTPException as e:
-            logger.error(e)
+        return None
+
+    file_path = os.path.join(measurement_dir, filename)
+    if tries_to_traverse_directory(filename) or not os.path.isfile(file_path):
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="File not found")
+
+    return await queue_upload(client, file_path)
+
+
+@router.get("/uploads")
+async def list_uploads() -> list[UploadJob]:
+    """Get all upload jobs, newest first"""
+
+    return await asyncio.to_thread(get_upload_queue().list_jobs)
+
+
+@router.delete("/uploads/{job_id}")
+async def cancel_upload(job_id: str) -> UploadJob:
+    """Cancel a queued or running upload job"""
+
+    queue = get_upload_queue()
+    job = await asyncio.to_thread(queue.get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Upload job not found")
+    if job.state in FINISHED_STATES:
+        raise HTTPException(status_code=HTTP_409_CONFLICT, detail=f"Upload job is {job.state}")
+
+    job = await asyncio.to_thread(queue.cancel, job_id)
+    assert job is not None
+    await get_messenger().send_upload_progress(job)
+    return job
 
 
 @router.post("/authenticate")
@@ -45,8 +78,12 @@ async def authenticate(storage: Annotated[StorageClient, Depends(get_trident_cli
     else:
         storage.revoke_auth()
         await setup_trident()
+        # The setup replaces the client, which closes the previous one
+        client = await get_trident_client()
+        if client is None:
+            return
         try:
-            storage.authenticate()
+            await client.run(client.authenticate)
         except HTTPException as e:
             logger.error(e)
         except HostNotFoundError as e:
@@ -62,8 +99,14 @@ async def authenticate(storage: Annotated[StorageClient, Depends(get_trident_cli
 @router.get("")
 async def get_cloud_files(
     storage: Annotated[StorageClient, Depends(get_trident_client)],
+    prefix: str | None = None,
 ) -> list[TridentBucketObject]:
-    """Get files from cloud"""
+    """
+    Get files from cloud
+
+    The listing is cached for ``CLOUD_LIST_TTL`` seconds; use ``prefix`` to
+    only list the objects of a folder.
+    """
 
     if storage is None:
         logger.warning("Tried to authenticate to cloud, but no cloud connection is available.")
@@ -71,7 +114,7 @@ async def get_cloud_files(
         return []
 
     try:
-        objects = storage.get_bucket_objects()
+        objects = await get_bucket_cache().get_objects(storage, prefix=prefix)
         return [TridentBucketObject(**obj) for obj in objects]
     except Exception as e:
         logger.error("Error getting cloud files.")
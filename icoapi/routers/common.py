@@ -4,7 +4,7 @@ import json
 import logging
 from typing import Annotated
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Query, status
 from fastapi.params import Depends
 from starlette.websockets import WebSocket, WebSocketDisconnect
 
@@ -17,7 +17,7 @@ from icoapi.models.globals import (
     get_trident_feature,
 )
 from icoapi.models.models import Feature, SocketMessage, SystemStateModel
-from icoapi.scripts.file_handling import get_disk_space_in_gb
+from icoapi.scripts.disk_sampler import get_disk_sampler
 
 router = APIRouter(tags=["General"])
 
@@ -33,7 +33,7 @@ def state(
 
     return SystemStateModel(
         can_ready=ICOsystemSingleton.has_instance(),
-        disk_capacity=get_disk_space_in_gb(),
+        disk_capacity=get_disk_sampler().get_capacity(),
         measurement_status=measurement_state.get_status(),
         cloud=cloud,
     )
@@ -51,19 +51,24 @@ async def reset_can():
 async def state_websocket(
     websocket: WebSocket,
     messenger: Annotated[GeneralMessenger, Depends(get_messenger)],
+    patch: bool = Query(False),
 ):
-    """State WebSocket for general information about system state"""
+    """
+    State WebSocket for general information about system state
+
+    Clients receive the full state as ``state`` message. With ``?patch=true``
+    they receive it only once (and after ``get_state``); later updates are
+    ``state_patch`` messages that contain only the changed fields.
+    """
 
     await websocket.accept()
-    messenger.add_messenger(websocket)
+    messenger.add_messenger(websocket, patch)
 
     try:
-        await messenger.push_messenger_update()
-
         while True:
             text = await websocket.receive_text()
             msg = SocketMessage(**json.loads(text))
             if msg.message == "get_state":
-                await messenger.push_messenger_update()
+                messenger.request_state(websocket)
     except WebSocketDisconnect:
         messenger.remove_messenger(websocket)
@@ -11,7 +11,7 @@ import yaml
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from starlette.responses import FileResponse
 
-from icoapi.models.globals import TridentHandler, setup_trident
+from icoapi.models.globals import setup_trident
 from icoapi.models.models import (
     ConfigFile,
     ConfigFileBackup,
@@ -57,6 +57,8 @@ from icoapi.scripts.errors import (
     HTTP_500_CONFIG_WRITE_SPEC,
 )
 from icoapi.scripts.file_handling import get_config_dir
+from icoapi.scripts.sensor_registry import get_sensor_registry
+from icoapi.scripts.settings import reload_settings
 
 router = APIRouter(prefix="/config", tags=["Configuration"])
 
@@ -124,6 +126,13 @@ def store_config(content: bytes, config_dir: str, filename: str):
         logger.info("No existing %s found in %s; storing new file", filename, config_dir)
 
     logger.info("%s saved to %s", filename, target_path)
+    if filename == CONFIG_FILE_DEFINITIONS.SENSORS.filename:
+        get_sensor_registry().invalidate()
+    elif filename == CONFIG_FILE_DEFINITIONS.ENV.filename:
+        try:
+            reload_settings(target_path)
+        except ValueError as exc:
+            logger.error("Could not apply settings of %s: %s", target_path, exc)
     return backup_path, target_path
 
 
@@ -267,7 +276,6 @@ async def upload_dataspace_file(
 
     store_config(raw_content, config_dir, CONFIG_FILE_DEFINITIONS.DATASPACE.filename)
 
-    TridentHandler.client = None
     await setup_trident()
 
     return header
@@ -407,7 +415,6 @@ async def restore_config_file(
     logger.info("Restored %s from backup %s", payload.filename, payload.backup_filename)
 
     if payload.filename == CONFIG_FILE_DEFINITIONS.DATASPACE.filename:
-        TridentHandler.client = None
         await setup_trident()
         logger.info("Trident client re-initialized")
     return {"detail": "Configuration restored successfully."}
@@ -1,107 +1,180 @@
 """Routes for measurement data"""
 
 import asyncio
+from email.utils import parsedate
 import json
 import logging
 import os
+import stat
 from datetime import datetime
 from typing import Annotated, AsyncGenerator
 
 import pandas as pd
-import tables
-from fastapi import APIRouter, HTTPException, UploadFile
+from fastapi import APIRouter, HTTPException, Query, Request, UploadFile
 from fastapi.params import Depends
 from fastapi.responses import FileResponse, StreamingResponse
 from icotronic.measurement import Storage
-from starlette.responses import PlainTextResponse
+from starlette.responses import PlainTextResponse, Response
+from starlette.status import HTTP_409_CONFLICT
 from tables import NoSuchNodeError, Node
 
 
 from icoapi.models.globals import get_trident_client
 from icoapi.models.models import (
     Dataset,
+    DownsamplingMode,
     FileCloudDetails,
     FileListResponseModel,
-    HDF5NodeInfo,
+    FileSortKey,
     MeasurementFileDetails,
+    MeasurementRange,
     Metadata,
     MetadataPrefix,
-    ParsedHDF5FileContent,
     ParsedMeasurement,
     ParsedMetadata,
-    Sensor,
+    RangeUnit,
+    SortOrder,
     TridentBucketObject,
 )
 from icoapi.models.trident import StorageClient
+from icoapi.scripts.bucket_cache import get_bucket_cache
+from icoapi.scripts.disk_sampler import get_disk_sampler
 from icoapi.scripts.errors import (
     HTTP_404_FILE_NOT_FOUND_EXCEPTION,
     HTTP_404_FILE_NOT_FOUND_SPEC,
 )
+from icoapi.scripts.file_index import get_file_index
 from icoapi.scripts.file_handling import (
-    get_disk_space_in_gb,
-    get_drive_or_root_path,
     get_measurement_dir,
-    get_suffixed_filename,
+    ChecksumMismatchError,
+    FileTooLargeError,
     is_dangerous_filename,
+    store_file,
 )
 
 from icoapi.scripts.measurement import write_metadata
+from icoapi.scripts.settings import get_settings
+from icoapi.scripts.measurement_file import (
+    clear_metadata_cache,
+    ensure_overview,
+    get_file_lock,
+    MeasurementFileError,
+    read_metadata,
+    read_range,
+)
 
 router = APIRouter(prefix="/files", tags=["File Handling"])
 
 logger = logging.getLogger(__name__)
 
 
+async def get_cloud_upload_times(storage: StorageClient | None) -> dict[str, str]:
+    """Get the upload time of the files in the cloud storage by file name"""
+
+    upload_times: dict[str, str] = {}
+    if storage is None:
+        return upload_times
+
+    try:
+        for obj in await get_bucket_cache().get_objects(storage):
+            cloud_file = TridentBucketObject(**obj)
+            upload_times.setdefault(os.path.basename(cloud_file.Key), cloud_file.LastModified)
+    except HTTPException:
+        logger.error("Error listing cloud files")
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.error("General exception when comparing files to cloud: %s", e)
+
+    return upload_times
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+
+
 @router.get("")
 async def list_files_and_capacity(
     measurement_dir: Annotated[str, Depends(get_measurement_dir)],
     storage: Annotated[StorageClient, Depends(get_trident_client)],
+    sort: FileSortKey = FileSortKey.CREATED,
+    order: SortOrder = SortOrder.DESC,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int | None, Query(ge=1)] = None,
 ) -> FileListResponseModel:
-    """Get file list and storage capacity information"""
+    """
+    Get file list and storage capacity information
+
+    The files are read from the file index of the measurement directory and
+    can be sorted and split into pages with ``offset`` and ``limit``.
+    """
 
     try:
-        capacity = get_disk_space_in_gb(get_drive_or_root_path())
+        capacity = get_disk_sampler().get_capacity()
         files_info: list[MeasurementFileDetails] = []
-        cloud_files: list[TridentBucketObject] = []
-        if storage is not None:
-            try:
-                objects = storage.get_bucket_objects()
-                cloud_files = [TridentBucketObject(**obj) for obj in objects]
-            except HTTPException:
-                logger.error("Error listing cloud files")
-            except Exception as e:  # pylint: disable=broad-exception-caught
-                logger.error("General exception when comparing files to cloud: %s", e)
-        # Iterate over files in the directory
-        for filename in os.listdir(measurement_dir):
-            file_path = os.path.join(measurement_dir, filename)
-            if os.path.isfile(file_path):
-                # Get file creation time and size
-                creation_time = datetime.fromtimestamp(os.path.getctime(file_path)).isoformat()
-                file_size = os.path.getsize(file_path)
-                cloud_details = FileCloudDetails(is_uploaded=False, upload_timestamp=None)
-                if storage is not None:
-                    matches = [file for file in cloud_files if filename in file.Key]
-                    if matches:
-                        cloud_details.is_uploaded = True
-                        cloud_details.upload_timestamp = matches[0].LastModified
-
-                details = MeasurementFileDetails(
+        cloud_files = await get_cloud_upload_times(storage)
+
+        file_index = get_file_index()
+        await asyncio.to_thread(file_index.sync, measurement_dir)
+        files, total = await asyncio.to_thread(
+            file_index.list_files, measurement_dir, sort, order, offset, limit
+        )
+        for filename, file_size, created in files:
+            upload_timestamp = cloud_files.get(filename)
+            files_info.append(
+                MeasurementFileDetails(
                     name=filename,
                     size=file_size,
-                    created=creation_time,
-                    cloud=cloud_details,
+                    created=datetime.fromtimestamp(created).isoformat(),
+                    cloud=FileCloudDetails(
+                        is_uploaded=upload_timestamp is not None,
+                        upload_timestamp=upload_timestamp,
+                    ),
                 )
-                files_info.append(details)
-        return FileListResponseModel(capacity, files_info, measurement_dir)
+            )
+        return FileListResponseModel(capacity, files_info, measurement_dir, total)
     except FileNotFoundError as error:
         raise HTTPException(status_code=404, detail="Directory not found") from error
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
-@router.get("/{name}")
-async def download_file(name: str, measurement_dir: Annotated[str, Depends(get_measurement_dir)]):
-    """Download measurement files"""
+# pylint: enable=too-many-arguments, too-many-positional-arguments, too-many-locals
+
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # Bytes per read, if the server cannot send the file itself
+
+
+def is_not_modified(request: Request, response: Response) -> bool:
+    """
+    Check if the client already has the current version of a file.
+
+    ``If-None-Match`` takes precedence over ``If-Modified-Since``
+    (RFC 9110, section 13.2.2).
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = {etag.strip().removeprefix("W/") for etag in if_none_match.split(",")}
+        return "*" in etags or response.headers["etag"] in etags
+
+    if_modified_since = parsedate(request.headers.get("if-modified-since", ""))
+    last_modified = parsedate(response.headers["last-modified"])
+    return (
+        if_modified_since is not None
+        and last_modified is not None
+        and last_modified <= if_modified_since
+    )
+
+
+@router.api_route("/{name}", methods=["GET", "HEAD"])
+async def download_file(
+    name: str, request: Request, measurement_dir: Annotated[str, Depends(get_measurement_dir)]
+):
+    """
+    Download measurement files
+
+    Supports conditional requests (``If-None-Match``, ``If-Modified-Since``)
+    and byte ranges (``Range``, ``If-Range``), so interrupted downloads can be
+    resumed and unchanged files are not transferred again.
+    """
 
     # Sanitization
     danger, cause = is_dangerous_filename(name)
@@ -109,10 +182,30 @@ async def download_file(name: str, measurement_dir: Annotated[str, Depends(get_m
         raise HTTPException(status_code=405, detail=f"Method not allowed: {cause}")
 
     full_path = os.path.join(measurement_dir, name)
-    if not os.path.isfile(full_path):
+    try:
+        stat_result = os.stat(full_path)
+    except OSError:
+        stat_result = None
+    if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
         raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(path=full_path, filename=name)
+    # Files can change (e.g. metadata updates), so clients have to revalidate
+    response = FileResponse(
+        path=full_path,
+        filename=name,
+        stat_result=stat_result,
+        headers={"cache-control": "no-cache"},
+    )
+    response.chunk_size = DOWNLOAD_CHUNK_SIZE
+    if is_not_modified(request, response):
+        return Response(
+            status_code=304,
+            headers={
+                key: response.headers[key] for key in ("etag", "last-modified", "cache-control")
+            },
+        )
+
+    return response
 
 
 @router.delete("/{name}")
@@ -128,6 +221,9 @@ async def delete_file(name: str, measurement_dir: Annotated[str, Depends(get_mea
     if os.path.isfile(full_path):
         try:
             os.remove(full_path)
+            clear_metadata_cache()
+            get_file_index().update(measurement_dir, name)
+            get_disk_sampler().sample()
             return {"detail": f"File '{name}' deleted successfully"}
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to delete file: {str(e)}") from e
@@ -137,9 +233,20 @@ async def delete_file(name: str, measurement_dir: Annotated[str, Depends(get_mea
 
 @router.get("/analyze/{name}", response_model=ParsedMeasurement)
 async def get_analyzed_file(
-    name: str, measurement_dir: Annotated[str, Depends(get_measurement_dir)]
+    name: str,
+    measurement_dir: Annotated[str, Depends(get_measurement_dir)],
+    mode: DownsamplingMode = DownsamplingMode.MINMAX,
+    points: Annotated[int, Query(ge=3, le=1_000_000)] = 4000,
 ) -> StreamingResponse:
-    """Analyze measurement file"""
+    """
+    Analyze measurement file
+
+    The measurement data is reduced to about ``points`` values per channel with
+    the min/max envelope (``minmax``) or the Largest-Triangle-Three-Buckets
+    algorithm (``lttb``). Peaks are preserved in both modes. The min/max
+    envelope is read from the overview levels of the file, so only about
+    ``points`` rows are read.
+    """
 
     danger, cause = is_dangerous_filename(name)
     if danger:
@@ -149,26 +256,30 @@ async def get_analyzed_file(
     if not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="File not found")
 
-    parsed_file_content = get_file_data(file_path)
+    try:
+        metadata = await asyncio.to_thread(read_metadata, file_path)
+        measurement = await asyncio.to_thread(
+            read_range, file_path, None, None, RangeUnit.TIME, points, mode
+        )
+    except MeasurementFileError as error:
+        raise HTTPException(status_code=500, detail=str(error)) from error
+    logger.debug(
+        "Reduced %s rows of file <%s> to %s rows (%s)",
+        measurement.end_row,
+        name,
+        len(measurement.timestamp),
+        mode,
+    )
 
     # Total number of rows for progress tracking
-    total_rows = len(parsed_file_content.acceleration_df)
+    total_rows = len(measurement.timestamp)
 
     # Streaming generator function
     # We approach this as a StreamingResponse because reading, parsing and
     # sending the complete dataset takes forever
     async def data_generator() -> AsyncGenerator[str, None]:
         # First: yield metadata
-        sensors_raw = parsed_file_content.sensor_df.to_dict(orient="records")
-        for sensor_raw in sensors_raw:
-            if "dimension" not in sensor_raw:
-                sensor_raw["dimension"] = ""
-        sensors: list[Sensor] = [Sensor(**sensor) for sensor in sensors_raw]
-        yield ParsedMetadata(
-            acceleration=parsed_file_content.acceleration_meta,
-            pictures=parsed_file_content.pictures,
-            sensors=sensors,
-        ).model_dump_json() + "\n"
+        yield metadata.model_dump_json() + "\n"
 
         # Then: yield measurement data
         batch_size = 1000
@@ -176,17 +287,14 @@ async def get_analyzed_file(
 
         for start in range(0, total_rows, batch_size):
             end = min(start + batch_size, total_rows)
-            batch = parsed_file_content.acceleration_df.iloc[start:end:10]
-            batch_counter = batch["counter"].tolist()
-            batch_timestamp = batch["timestamp"].tolist()
-            datasets = batch.drop(columns=["counter", "timestamp"])
 
             batch_dict = ParsedMeasurement(
                 name=name,
-                counter=batch_counter,
-                timestamp=batch_timestamp,
+                counter=measurement.counter[start:end],
+                timestamp=measurement.timestamp[start:end],
                 datasets=[
-                    Dataset(name=column, data=batch[column].tolist()) for column in datasets.columns
+                    Dataset(name=dataset.name, data=dataset.data[start:end])
+                    for dataset in measurement.datasets
                 ],
             )
 
@@ -194,7 +302,7 @@ async def get_analyzed_file(
             yield batch_dict.model_dump_json() + "\n"
 
             # Update progress
-            parsed_rows += len(batch) * 10
+            parsed_rows += end - start
             progress = parsed_rows / total_rows
             yield json.dumps({"progress": progress}) + "\n"
 
@@ -207,19 +315,81 @@ async def get_analyzed_file(
     return StreamingResponse(data_generator(), media_type="application/json")
 
 
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+
+
+@router.get("/analyze/{name}/range", response_model=MeasurementRange)
+async def get_measurement_range(
+    name: str,
+    measurement_dir: Annotated[str, Depends(get_measurement_dir)],
+    start: Annotated[float | None, Query(ge=0)] = None,
+    end: Annotated[float | None, Query(ge=0)] = None,
+    unit: RangeUnit = RangeUnit.TIME,
+    points: Annotated[int, Query(ge=3, le=1_000_000)] = 4000,
+    mode: DownsamplingMode = DownsamplingMode.MINMAX,
+) -> MeasurementRange:
+    """
+    Get a range of measurement data
+
+    The range is given in seconds since the measurement start (``unit=time``)
+    or as row indices (``unit=row``); ``end`` is exclusive. Only the rows of the
+    range are read from the file and reduced to about ``points`` values per
+    channel.
+    """
+
+    danger, cause = is_dangerous_filename(name)
+    if danger:
+        raise HTTPException(status_code=405, detail=f"Method not allowed: {cause}")
+
+    file_path = os.path.join(measurement_dir, name)
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    try:
+        return await asyncio.to_thread(read_range, file_path, start, end, unit, points, mode)
+    except MeasurementFileError as error:
+        raise HTTPException(status_code=500, detail=str(error)) from error
+
+
+# pylint: enable=too-many-arguments, too-many-positional-arguments
+
+
 @router.post("/analyze")
 async def post_analyzed_file(
-    file: UploadFile, measurement_dir: Annotated[str, Depends(get_measurement_dir)]
+    file: UploadFile,
+    measurement_dir: Annotated[str, Depends(get_measurement_dir)],
+    sha256: Annotated[str | None, Query(pattern="^[0-9a-fA-F]{64}$")] = None,
 ) -> PlainTextResponse:
-    """Upload file for analysis"""
+    """
+    Upload file for analysis
+
+    The file is copied in chunks in a separate thread. Files larger than
+    ``FILE_IMPORT_MAX_SIZE`` are rejected; if ``sha256`` is given, files with
+    a different checksum are rejected. The overview of the acceleration data
+    for the analysis is stored in the imported file.
+    """
 
     assert file.filename is not None
-    filename = get_suffixed_filename(file.filename, measurement_dir)
+    danger, cause = is_dangerous_filename(file.filename)
+    if danger:
+        raise HTTPException(status_code=405, detail=f"Method not allowed: {cause}")
 
-    file_path = os.path.join(measurement_dir, filename)
+    max_size = get_settings().file_import_max_size
+    too_large = HTTPException(status_code=413, detail=f"File is larger than {max_size} bytes")
+    if max_size is not None and file.size is not None and file.size > max_size:
+        raise too_large
 
-    with open(file_path, "wb") as f:
-        f.write(file.file.read())
+    try:
+        filename = await asyncio.to_thread(
+            store_file, file.file, file.filename, measurement_dir, max_size, sha256
+        )
+    except FileTooLargeError as error:
+        raise too_large from error
+    except ChecksumMismatchError as error:
+        raise HTTPException(status_code=400, detail="Checksum does not match") from error
+    await asyncio.to_thread(ensure_overview, os.path.join(measurement_dir, filename))
+    get_file_index().update(measurement_dir, filename)
+    get_disk_sampler().sample()
 
     return PlainTextResponse(filename)
 
@@ -230,12 +400,43 @@ async def get_file_meta(
 ) -> ParsedMetadata:
     """Get measurement file metadata"""
 
-    data = get_file_data(os.path.join(measurement_dir, name))
-    return ParsedMetadata(
-        acceleration=data.acceleration_meta,
-        pictures=data.pictures,
-        sensors=[Sensor(**sensor) for sensor in data.sensor_df.to_dict(orient="records")],
-    )
+    file_path = os.path.join(measurement_dir, name)
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    try:
+        return await asyncio.to_thread(read_metadata, file_path)
+    except MeasurementFileError as error:
+        raise HTTPException(status_code=500, detail=str(error)) from error
+
+
+def overwrite_metadata(file_path: str, prefix: MetadataPrefix, metadata: Metadata) -> None:
+    """
+    Replace the pre or post metadata of a measurement file.
+
+    The file is changed while holding its lock, so the change is not lost
+    if the file is compressed at the same time.
+    """
+
+    storage = Storage(file_path)
+    with get_file_lock(file_path):
+        try:
+            data = storage.open()
+        except ValueError as error:
+            # The file is open in another mode, e.g. by a running analysis
+            raise HTTPException(
+                status_code=HTTP_409_CONFLICT, detail="File is currently in use"
+            ) from error
+        try:
+            node: Node = data.hdf.get_node("/acceleration")
+            del node.attrs[f"{prefix}_metadata"]
+            write_metadata(prefix, metadata, data)
+        except NoSuchNodeError as error:
+            raise HTTPException(
+                status_code=500, detail="Acceleration data not found in the file"
+            ) from error
+        finally:
+            storage.close()
 
 
 @router.post(
@@ -256,16 +457,8 @@ async def overwrite_post_meta(
     if not os.path.isfile(file_path):
         raise HTTP_404_FILE_NOT_FOUND_EXCEPTION
 
-    # we have the file and the metadata object
-    with Storage(file_path) as storage:
-        try:
-            node: Node = storage.hdf.get_node("/acceleration")
-            del node.attrs["post_metadata"]
-        except NoSuchNodeError as error:
-            raise HTTPException(
-                status_code=500, detail="Acceleration data not found in the file"
-            ) from error
-        write_metadata(MetadataPrefix.POST, metadata, storage)
+    await asyncio.to_thread(overwrite_metadata, file_path, MetadataPrefix.POST, metadata)
+    get_file_index().update(measurement_dir, name)
 
 
 @router.post(
@@ -286,164 +479,8 @@ async def overwrite_pre_meta(
     if not os.path.isfile(file_path):
         raise HTTP_404_FILE_NOT_FOUND_EXCEPTION
 
-    # we have the file and the metadata object
-    with Storage(file_path) as storage:
-        try:
-            node: Node = storage.hdf.get_node("/acceleration")
-            del node.attrs["pre_metadata"]
-        except NoSuchNodeError as error:
-            raise HTTPException(
-                status_code=500, detail="Acceleration data not found in the file"
-            ) from error
-        write_metadata(MetadataPrefix.PRE, metadata, storage)
-
-
-def get_node_names(hdf5_file_handle: tables.File) -> list[str]:
-    """Get name of HDF5 nodes"""
-
-    nodes = hdf5_file_handle.list_nodes("/")
-    return [node._v_pathname for node in nodes]  # pylint: disable=protected-access
-
-
-def get_picture_node_names(hdf5_file_handle: tables.File) -> list[str]:
-    """Get name of nodes that contain picture data"""
-
-    names = get_node_names(hdf5_file_handle)
-    return [name for name in names if "pictures" in name]
-
-
-def parse_json_if_possible(val):
-    """
-    If val is a str or bytes containing JSON, return the deserialized object.
-    Otherwise, return val unchanged.
-    """
-    # Only attempt on str/bytes
-    if isinstance(val, (bytes, bytearray)):
-        try:
-            text = val.decode("utf-8")
-        except UnicodeDecodeError:
-            return val
-    elif isinstance(val, str):
-        text = val
-    else:
-        return val
-
-    # Try parsing
-    try:
-        return json.loads(text)
-    except json.JSONDecodeError:
-        return val
-
-
-# pylint: disable=protected-access
-
-
-def node_to_dict(node):
-    """Convert HDF5 metadata node to dictionary"""
-
-    info = HDF5NodeInfo(
-        name=node._v_name,
-        path=node._v_pathname,
-        type=node.__class__.__name__,
-        attributes={},
-    )
-
-    for key in node._v_attrs._f_list(attrset="all"):
-        raw = node._v_attrs[key]
-        # first coerce numpy‐types to Python
-        if hasattr(raw, "tolist"):
-            pyval = raw.tolist()
-        elif hasattr(raw, "item"):
-            pyval = raw.item()
-        else:
-            pyval = raw
-        # then parse JSON if it is a JSON string
-        info.attributes[key] = parse_json_if_possible(pyval)
-
-    return info
-
-
-# pylint: enable=protected-access
-
-
-# pylint: disable=too-many-locals
-
-
-def get_file_data(
-    file_path: str,
-) -> ParsedHDF5FileContent:
-    """Get HDF5 measurement data"""
-
-    with tables.open_file(file_path, mode="r") as file_handle:
-
-        picture_node_names = get_picture_node_names(file_handle)
-        pictures: dict[str, list[str]] = {}
-        for node_name in picture_node_names:
-            node = file_handle.get_node(node_name)
-            assert isinstance(node, tables.Array)
-            pictures[node_name.removeprefix("/")] = [
-                img.decode("utf-8") for img in node.read().tolist()
-            ]
-
-        try:
-            acceleration_data = file_handle.get_node("/acceleration")
-            assert isinstance(acceleration_data, tables.Table)
-            acceleration_df = pd.DataFrame.from_records(
-                acceleration_data.read(), columns=acceleration_data.colnames
-            )
-            acceleration_meta = node_to_dict(acceleration_data)
-        except NoSuchNodeError as error:
-            raise HTTPException(
-                status_code=500, detail="Acceleration data not found in the file"
-            ) from error
-        except AssertionError as error:
-            raise HTTPException(
-                status_code=500, detail="Acceleration data is not a table"
-            ) from error
-
-        # pylint: disable=consider-using-dict-items, consider-iterating-dictionary
-        try:
-            for pics_key in pictures.keys():
-
-                obj: dict[int, str] = {}
-                for index, pic in enumerate(pictures[pics_key]):
-                    obj[index] = pic
-                if MetadataPrefix.PRE in pics_key:
-                    stripped_key = pics_key.split(f"{MetadataPrefix.PRE}__")[1]
-                    acceleration_meta.attributes["pre_metadata"]["parameters"][stripped_key] = obj
-                elif MetadataPrefix.POST in pics_key:
-                    stripped_key = pics_key.split(f"{MetadataPrefix.POST}__")[1]
-                    acceleration_meta.attributes["post_metadata"]["parameters"][stripped_key] = obj
-                else:
-                    logger.error("Unknown picture key: %s", pics_key)
-        except KeyError:
-            pass
-        except IndexError as error:
-            raise HTTPException(status_code=500, detail="Picture data is not prefixed.") from error
-
-        # pylint: enable=consider-using-dict-items, consider-iterating-dictionary
-
-        sensor_df = pd.DataFrame()
-        try:
-            sensor_data = file_handle.get_node("/sensors")
-            assert isinstance(sensor_data, tables.Table)
-            sensor_df = pd.DataFrame.from_records(sensor_data.read(), columns=sensor_data.colnames)
-        except NoSuchNodeError:
-            # No sensor data available; pass
-            pass
-        except AssertionError:
-            # sensor data available, but not in the right shape
-            pass
-
-    return ParsedHDF5FileContent(
-        acceleration_df=acceleration_df,
-        sensor_df=sensor_df,
-        acceleration_meta=acceleration_meta,
-        pictures=pictures,
-    )
-
-
-# pylint: enable=too-many-locals
+    await asyncio.to_thread(overwrite_metadata, file_path, MetadataPrefix.PRE, metadata)
+    get_file_index().update(measurement_dir, name)
 
 
 def ensure_dataframe_with_columns(df, required_columns) -> pd.DataFrame:
@@ -5,7 +5,7 @@ import datetime
 import logging
 
 import pathvalidate
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from starlette.websockets import WebSocket, WebSocketDisconnect
 
 from icoapi.models.models import (
@@ -13,6 +13,7 @@ from icoapi.models.models import (
     ControlResponse,
     MeasurementInstructions,
     Metadata,
+    StreamFormat,
 )
 from icoapi.models.globals import (
     get_messenger,
@@ -22,6 +23,8 @@ from icoapi.models.globals import (
     ICOsystem,
 )
 from icoapi.scripts.measurement import run_measurement
+from icoapi.scripts.storage_writer import get_storage_layout, validate_storage_layout
+from icoapi.scripts.stream_encoding import get_stream_format, negotiate_stream_format
 
 router = APIRouter(prefix="/measurement", tags=["Measurement"])
 
@@ -41,6 +44,10 @@ async def start_measurement(
     measurement_state.stop_flag = False
 
     if not measurement_state.running:
+        errors = validate_storage_layout(get_storage_layout(instructions.storage_layout))
+        if errors:
+            raise HTTPException(status_code=422, detail=errors)
+
         start = datetime.datetime.now()
         filename = start.strftime("%Y-%m-%d_%H-%M-%S")
         if instructions.name:
@@ -113,13 +120,22 @@ async def measurement_status(
 async def websocket_endpoint(
     websocket: WebSocket,
     measurement_state: MeasurementState = Depends(get_measurement_state),
+    stream_format: StreamFormat = Query(StreamFormat.JSON, alias="format"),
 ):
-    """Stream measurement data"""
+    """
+    Stream measurement data
+
+    Clients can opt in to the binary frame format with ``?format=binary`` or the
+    WebSocket subprotocol ``icoapi.binary.v1``.
+    """
 
-    await websocket.accept()
-    measurement_state.clients.append(websocket)
+    subprotocol = negotiate_stream_format(websocket, stream_format)
+    await websocket.accept(subprotocol=subprotocol)
+    measurement_state.clients.add(websocket)
     logger.info(
-        "Client connected to measurement stream - now %s clients", len(measurement_state.clients)
+        "Client connected to measurement stream with format <%s> - now %s clients",
+        get_stream_format(websocket),
+        len(measurement_state.clients),
     )
 
     try:
@@ -127,13 +143,12 @@ async def websocket_endpoint(
             await websocket.receive_text()
 
     except WebSocketDisconnect:
-        try:
-            measurement_state.clients.remove(websocket)
+        if measurement_state.clients.remove(websocket):
             logger.info(
                 "Client disconnected from measurement stream - now %s clients",
                 len(measurement_state.clients),
             )
-        except ValueError:
+        else:
             logger.debug(
                 "Client was already disconnected - still %s clients",
                 len(measurement_state.clients),
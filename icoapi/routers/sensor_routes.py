@@ -3,7 +3,7 @@
 from fastapi import APIRouter, status
 
 from icoapi.models.models import AvailableSensorInformation
-from icoapi.scripts.data_handling import get_sensor_config_data
+from icoapi.scripts.sensor_registry import get_sensor_registry
 
 router = APIRouter(prefix="/sensor", tags=["Sensor"])
 
@@ -16,7 +16,7 @@ router = APIRouter(prefix="/sensor", tags=["Sensor"])
 def query_sensors():
     """Get available sensors"""
 
-    sensors, configs, default = get_sensor_config_data()
+    sensors, configs, default = get_sensor_registry().get_config_data()
     return AvailableSensorInformation(
         sensors=sensors, configurations=configs, default_configuration_id=default
     )
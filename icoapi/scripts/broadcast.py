@@ -0,0 +1,283 @@
+"""Fan-out of messages to WebSocket clients (measurement stream and state)"""
+
+import asyncio
+from collections import deque
+import json
+import logging
+from typing import Any, Callable
+
+from starlette.websockets import WebSocket
+
+from icoapi.models.models import LagPolicy, StreamClientStatus, StreamFormat
+from icoapi.scripts.settings import get_settings
+from icoapi.scripts.stream_encoding import get_stream_format
+
+logger = logging.getLogger(__name__)
+
+
+def get_queue_size() -> int:
+    """Get the maximum number of queued messages per measurement client"""
+
+    return get_settings().websocket_queue_size
+
+
+def get_lag_policy() -> LagPolicy:
+    """Get the policy for measurement clients that cannot keep up with the stream"""
+
+    return get_settings().websocket_lag_policy
+
+
+# pylint: disable=too-many-instance-attributes
+
+
+class StreamClient:
+    """
+    Outbound queue of a single WebSocket client.
+
+    Messages are sent by a separate task, so that a slow client only delays
+    its own messages. If the queue is full, droppable messages are discarded
+    according to the lag policy. Messages that are not droppable (e.g. IFT
+    values or errors) are always queued. If sending fails or takes longer
+    than ``send_timeout`` seconds, the client is considered dead and the send
+    task ends.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        queue_size: int,
+        lag_policy: LagPolicy,
+        send_timeout: float | None = None,
+    ) -> None:
+        self.websocket = websocket
+        self.stream_format = get_stream_format(websocket)
+        self.queue_size = queue_size
+        self.lag_policy = lag_policy
+        self.send_timeout = send_timeout
+        self.queue: deque[tuple[str | bytes, bool]] = deque()
+        self.sent = 0
+        self.dropped = 0
+        self.closing = False
+        self.pending = asyncio.Event()
+        self.task = asyncio.create_task(self.send_queued())
+
+    def put(self, payload: str | bytes, droppable: bool = True) -> None:
+        """Add a message to the outbound queue"""
+
+        if self.closing or self.task.done():
+            return
+
+        if droppable and len(self.queue) >= self.queue_size:
+            if self.dropped == 0:
+                logger.warning(
+                    "Client <%s> cannot keep up with the measurement stream - applying policy <%s>",
+                    self.websocket.client,
+                    self.lag_policy,
+                )
+            match self.lag_policy:
+                case LagPolicy.DROP_NEWEST:
+                    self.dropped += 1
+                    return
+                case LagPolicy.DROP_OLDEST:
+                    self.drop_oldest()
+                case LagPolicy.DECIMATE:
+                    self.decimate()
+
+        self.queue.append((payload, droppable))
+        self.pending.set()
+
+    def drop_oldest(self) -> None:
+        """Remove the oldest droppable message from the queue"""
+
+        for index, (_, droppable) in enumerate(self.queue):
+            if droppable:
+                del self.queue[index]
+                self.dropped += 1
+                return
+
+    def decimate(self) -> None:
+        """Remove every second droppable message from the queue"""
+
+        kept: deque[tuple[str | bytes, bool]] = deque()
+        keep = False
+        for message in self.queue:
+            if message[1]:
+                keep = not keep
+                if not keep:
+                    self.dropped += 1
+                    continue
+            kept.append(message)
+        self.queue = kept
+
+    async def send_queued(self) -> None:
+        """Send queued messages until the client is closed"""
+
+        while True:
+            if not self.queue:
+                if self.closing:
+                    return
+                self.pending.clear()
+                await self.pending.wait()
+                continue
+
+            payload, _ = self.queue.popleft()
+            try:
+                await asyncio.wait_for(self.send(payload), self.send_timeout)
+                self.sent += 1
+            except (RuntimeError, OSError, asyncio.TimeoutError) as error:
+                logger.warning(
+                    "Failed to send data to client <%s>: %r", self.websocket.client, error
+                )
+                self.queue.clear()
+                return
+
+    async def send(self, payload: str | bytes) -> None:
+        """Send a single message"""
+
+        if isinstance(payload, bytes):
+            await self.websocket.send_bytes(payload)
+        else:
+            await self.websocket.send_text(payload)
+
+    def is_alive(self) -> bool:
+        """Check if messages can still be sent to the client"""
+
+        return not self.task.done()
+
+    async def close(self, timeout: float) -> None:
+        """Send remaining messages and close the connection"""
+
+        self.closing = True
+        self.pending.set()
+        try:
+            await asyncio.wait_for(self.task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Discarded %s unsent messages for client <%s>",
+                len(self.queue),
+                self.websocket.client,
+            )
+        try:
+            await self.websocket.close()
+        except RuntimeError:
+            logger.debug("Connection to client <%s> was already closed", self.websocket.client)
+
+    def get_status(self) -> StreamClientStatus:
+        """Get queue status of client"""
+
+        client = self.websocket.client
+        return StreamClientStatus(
+            client=f"{client.host}:{client.port}" if client else "unknown",
+            stream_format=self.stream_format,
+            queue_depth=len(self.queue),
+            queue_size=self.queue_size,
+            sent=self.sent,
+            dropped=self.dropped,
+        )
+
+
+# pylint: enable=too-many-instance-attributes
+
+
+class MeasurementBroadcaster:
+    """
+    Distribute measurement data to all clients of the measurement stream.
+
+    Publishing only serializes the data (once per stream format) and adds it
+    to the queues of the clients; it never waits for the network.
+    """
+
+    def __init__(
+        self,
+        queue_size: int | None = None,
+        lag_policy: LagPolicy | None = None,
+        send_timeout: float | None = None,
+    ) -> None:
+        self.queue_size = get_queue_size() if queue_size is None else queue_size
+        self.lag_policy = get_lag_policy() if lag_policy is None else lag_policy
+        self.send_timeout = send_timeout
+        self.clients: list[StreamClient] = []
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    def add(self, websocket: WebSocket) -> None:
+        """Add a client to the measurement stream"""
+
+        self.clients.append(
+            StreamClient(websocket, self.queue_size, self.lag_policy, self.send_timeout)
+        )
+
+    def remove(self, websocket: WebSocket) -> bool:
+        """
+        Remove a client from the measurement stream.
+
+        :return: True if the client was part of the measurement stream
+        """
+
+        for client in self.clients:
+            if client.websocket is websocket:
+                self.clients.remove(client)
+                client.task.cancel()
+                return True
+        return False
+
+    def prune(self) -> list[WebSocket]:
+        """
+        Remove all clients that can no longer receive messages.
+
+        :return: The WebSockets of the removed clients
+        """
+
+        dead = [client for client in self.clients if not client.is_alive()]
+        for client in dead:
+            self.clients.remove(client)
+            logger.info("Removed unresponsive client <%s>", client.websocket.client)
+
+        return [client.websocket for client in dead]
+
+    def publish(
+        self,
+        get_json: Callable[[], Any],
+        get_binary: Callable[[], bytes] | None = None,
+        droppable: bool = True,
+    ) -> None:
+        """
+        Queue data for all clients in their negotiated stream format.
+
+        Each payload is only created and serialized once, if at least one client
+        requested the corresponding format. Without a binary payload all clients
+        receive the JSON message. Clients that can no longer receive messages
+        are removed first.
+        """
+
+        self.prune()
+        payloads: dict[StreamFormat, str | bytes] = {}
+        for client in self.clients:
+            stream_format = client.stream_format
+            if get_binary is None:
+                stream_format = StreamFormat.JSON
+            if stream_format not in payloads:
+                payloads[stream_format] = (
+                    get_binary()
+                    if get_binary is not None and stream_format == StreamFormat.BINARY
+                    else json.dumps(get_json(), separators=(",", ":"), ensure_ascii=False)
+                )
+            client.put(payloads[stream_format], droppable)
+
+    def get_status(self) -> list[StreamClientStatus]:
+        """Get queue status of all clients"""
+
+        return [client.get_status() for client in self.clients]
+
+    async def close(self, timeout: float = 5) -> int:
+        """
+        Send remaining messages to all clients and close their connections.
+
+        :return: Number of closed clients
+        """
+
+        clients = self.clients
+        self.clients = []
+        await asyncio.gather(*(client.close(timeout) for client in clients))
+        return len(clients)
@@ -0,0 +1,139 @@
+"""Cache for the object listings of cloud buckets"""
+
+import asyncio
+from dataclasses import dataclass, field
+from functools import cache
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from icoapi.models.trident import StorageClient
+from icoapi.scripts.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+IDLE_FACTOR = 10  # Listings not read for this many TTLs are no longer refreshed
+
+
+def get_cache_ttl() -> float:
+    """Get the time in seconds a bucket listing stays valid"""
+
+    return get_settings().cloud_list_ttl
+
+
+@dataclass
+class BucketListing:
+    """Cached object listing of a bucket (prefix)"""
+
+    objects: list[dict[str, Any]] = field(default_factory=list)
+    fetched: float = 0.0  # Monotonic time of the last fetch (0: never)
+    read: float = 0.0  # Monotonic time of the last read
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class BucketCache:
+    """
+    Cache bucket listings of the storage client for a limited time.
+
+    Listings are fetched at most once per ``CLOUD_LIST_TTL`` seconds;
+    concurrent reads of an expired listing share a single request. A
+    background task refreshes listings that were read recently before they
+    expire, so regular polling of the file list does not wait for the cloud.
+    Listings of a bucket are dropped after our own uploads to it and all
+    listings are dropped if the storage client changes.
+    """
+
+    def __init__(self, ttl: float | None = None) -> None:
+        self.ttl = get_cache_ttl() if ttl is None else ttl
+        self.listings: dict[tuple[str, str], BucketListing] = {}
+        self.task: asyncio.Task | None = None
+
+    @staticmethod
+    def get_key(
+        client: StorageClient, bucket: str | None, prefix: str | None
+    ) -> tuple[str, str]:
+        """Get the cache key of a listing"""
+
+        return (bucket or client.default_bucket, prefix or "")
+
+    async def get_objects(
+        self,
+        client: StorageClient,
+        bucket: str | None = None,
+        prefix: str | None = None,
+    ) -> list[dict[str, Any]]:
+        """Get the (cached) objects of a bucket with an optional key prefix"""
+
+        listing = self.listings.setdefault(self.get_key(client, bucket, prefix), BucketListing())
+        listing.read = time.monotonic()
+        if not self.is_fresh(listing):
+            await self.fetch(client, listing, bucket, prefix)
+
+        return listing.objects
+
+    def is_fresh(self, listing: BucketListing) -> bool:
+        """Check if a listing can be used without fetching it again"""
+
+        return listing.fetched > 0 and time.monotonic() - listing.fetched < self.ttl
+
+    async def fetch(
+        self,
+        client: StorageClient,
+        listing: BucketListing,
+        bucket: str | None,
+        prefix: str | None,
+    ) -> None:
+        """Fetch a listing, unless another task just did"""
+
+        started = time.monotonic()
+        async with listing.lock:
+            if listing.fetched >= started:
+                return
+            listing.objects = await client.run(client.get_bucket_objects, bucket, prefix)
+            listing.fetched = time.monotonic()
+
+    def invalidate(self, bucket: str | None = None) -> None:
+        """Drop the listings of a bucket (or of all buckets)"""
+
+        for key in list(self.listings):
+            if bucket is None or key[0] == bucket:
+                del self.listings[key]
+
+    async def start(self, get_client: Callable[[], Awaitable[StorageClient | None]]) -> None:
+        """Start refreshing recently read listings in the background"""
+
+        if self.ttl > 0 and self.task is None:
+            self.task = asyncio.create_task(self.refresh(get_client))
+
+    async def stop(self) -> None:
+        """Stop the background refresh"""
+
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def refresh(self, get_client: Callable[[], Awaitable[StorageClient | None]]) -> None:
+        """Refresh listings shortly before they expire"""
+
+        while True:
+            await asyncio.sleep(self.ttl / 2)
+            client = await get_client()
+            if client is None:
+                continue
+            now = time.monotonic()
+            for (bucket, prefix), listing in list(self.listings.items()):
+                if now - listing.read > IDLE_FACTOR * self.ttl:
+                    self.listings.pop((bucket, prefix), None)
+                elif now - listing.fetched >= self.ttl / 2:
+                    try:
+                        await self.fetch(client, listing, bucket, prefix or None)
+                    except Exception as e:  # pylint: disable=broad-exception-caught
+                        logger.warning("Could not refresh listing of bucket <%s>: %s", bucket, e)
+
+
+@cache
+def get_bucket_cache() -> BucketCache:
+    """Get the bucket listing cache"""
+
+    return BucketCache()
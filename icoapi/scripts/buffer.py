@@ -0,0 +1,73 @@
+"""Growable buffer for per-sample measurement history"""
+
+import numpy as np
+
+
+class Float64Buffer:
+    """
+    Contiguous ``float64`` buffer with amortized growth.
+
+    Values are stored in a NumPy array whose capacity grows in chunks of at
+    least ``chunk_size`` values (doubling for large buffers), so appending is
+    amortized constant time. Values at the start can be discarded to use the
+    buffer as a sliding window. ``view`` returns the current values without
+    copying them.
+    """
+
+    def __init__(self, chunk_size: int = 65536) -> None:
+        self.chunk_size = max(1, chunk_size)
+        self.data = np.empty(self.chunk_size, dtype=np.float64)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __getitem__(self, index: int) -> float:
+        return float(self.view()[index])
+
+    def reserve(self, size: int) -> None:
+        """Make sure the buffer can store ``size`` more values"""
+
+        if self.end + size <= len(self.data):
+            return
+
+        length = len(self)
+        if self.start > 0 and length + size <= len(self.data) // 2:
+            # Enough free space at the start: move values instead of growing
+            self.data[:length] = self.data[self.start : self.end]
+        else:
+            capacity = max(2 * len(self.data), length + size + self.chunk_size)
+            data = np.empty(capacity, dtype=np.float64)
+            data[:length] = self.data[self.start : self.end]
+            self.data = data
+        self.start = 0
+        self.end = length
+
+    def append(self, value: float) -> None:
+        """Add a single value"""
+
+        self.reserve(1)
+        self.data[self.end] = value
+        self.end += 1
+
+    def extend(self, values: np.ndarray) -> None:
+        """Add multiple values"""
+
+        self.reserve(len(values))
+        self.data[self.end : self.end + len(values)] = values
+        self.end += len(values)
+
+    def discard(self, count: int) -> None:
+        """Remove the first ``count`` values"""
+
+        self.start = min(self.end, self.start + max(0, count))
+
+    def view(self) -> np.ndarray:
+        """
+        Get the stored values without copying them.
+
+        The view is only valid until the next change of the buffer.
+        """
+
+        return self.data[self.start : self.end]
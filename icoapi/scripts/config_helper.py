@@ -6,6 +6,7 @@ from pathlib import Path
 from typing import Any, Optional, Tuple, Union
 import numbers
 
+import tables
 import yaml
 
 from icoapi.models.models import ConfigFileInfoHeader
@@ -367,6 +368,31 @@ def validate_dataspace_payload(payload: Any) -> list[str]:
                 if not is_valid_string(value):
                     errors.append(f"connection -> {key}: expected non-empty string")
 
+    errors.extend(validate_dataspace_upload(payload.get("upload")))
+
+    return errors
+
+
+def validate_dataspace_upload(upload: Any) -> list[str]:
+    """Validate optional upload settings of dataspace configuration"""
+
+    if upload is None:
+        return []
+    if not isinstance(upload, dict):
+        return ["upload: expected mapping with upload settings"]
+
+    errors = []
+    if not isinstance(upload.get("automatic", False), bool):
+        errors.append("upload -> automatic: expected boolean")
+    compression = upload.get("compression")
+    if compression is not None and compression not in tables.filters.all_complibs:
+        errors.append(
+            "upload -> compression: expected one of " + ", ".join(tables.filters.all_complibs)
+        )
+    level = upload.get("compression_level", 5)
+    if not isinstance(level, int) or isinstance(level, bool) or not 0 <= level <= 9:
+        errors.append("upload -> compression_level: expected integer between 0 and 9")
+
     return errors
 
 
@@ -0,0 +1,208 @@
+"""Block-wise conversion of streamed measurement data"""
+
+from dataclasses import dataclass
+
+import numpy as np
+from icotronic.can.streaming import StreamingConfiguration, StreamingData
+
+from icoapi.scripts.sensor_registry import MeasurementSensorInfo
+
+CHANNEL_NAMES = ("first", "second", "third")
+
+
+def get_active_channels(streaming_configuration: StreamingConfiguration) -> list[str]:
+    """Get the names of all channels enabled in the streaming configuration"""
+
+    return [name for name in CHANNEL_NAMES if getattr(streaming_configuration, name)]
+
+
+@dataclass
+class ConvertedBlock:
+    """
+    Block of streaming messages with values converted to physical units.
+
+    Attributes:
+        counter (np.ndarray): Message counters, one entry per message
+        timestamp (np.ndarray): Message timestamps in seconds since measurement start
+        values (np.ndarray): Physical values with one row per message and one
+            column per value in the message
+        columns (tuple[str, ...]): Channel name of each column in ``values``
+    """
+
+    counter: np.ndarray
+    timestamp: np.ndarray
+    values: np.ndarray
+    columns: tuple[str, ...]
+
+    def __len__(self) -> int:
+        return len(self.counter)
+
+    def channel_values(self, channel: str) -> np.ndarray | None:
+        """
+        Get one value per message for a channel.
+
+        In single channel mode every message contains multiple samples of the
+        same channel; only the first one of each message is returned, like in
+        the data sent to the WebSocket clients.
+        """
+
+        try:
+            return self.values[:, self.columns.index(channel)]
+        except ValueError:
+            return None
+
+    def streaming_data(self) -> list[StreamingData]:
+        """Get converted block as list of streaming data messages"""
+
+        return [
+            StreamingData(counter=counter, timestamp=timestamp, values=values)
+            for counter, timestamp, values in zip(
+                self.counter.tolist(), self.timestamp.tolist(), self.values.tolist()
+            )
+        ]
+
+    def to_dicts(self) -> list[dict]:
+        """Get converted block in the format of ``DataValueModel.model_dump()``"""
+
+        channels = {}
+        for channel in CHANNEL_NAMES:
+            values = self.channel_values(channel)
+            channels[channel] = values.tolist() if values is not None else [None] * len(self)
+
+        return [
+            {
+                "timestamp": timestamp,
+                "first": first,
+                "second": second,
+                "third": third,
+                "ift": None,
+                "counter": counter,
+                "dataloss": None,
+            }
+            for timestamp, first, second, third, counter in zip(
+                self.timestamp.tolist(),
+                channels["first"],
+                channels["second"],
+                channels["third"],
+                self.counter.tolist(),
+            )
+        ]
+
+
+class ChannelConversion:
+    """
+    Affine conversion of raw ADC values to physical values.
+
+    The conversion from raw values to volts and the conversion from volts to
+    physical values of the sensor are folded into one gain and offset per
+    column when the measurement starts, so converting a value only needs
+    one multiplication and one addition.
+    """
+
+    def __init__(
+        self,
+        columns: tuple[str, ...],
+        sensor_info: MeasurementSensorInfo,
+    ) -> None:
+        sensors = dict(
+            zip(
+                CHANNEL_NAMES,
+                (
+                    sensor_info.first_channel_sensor,
+                    sensor_info.second_channel_sensor,
+                    sensor_info.third_channel_sensor,
+                ),
+            )
+        )
+        gains = []
+        offsets = []
+        for channel in columns:
+            sensor = sensors[channel]
+            assert sensor is not None
+            gains.append(sensor_info.voltage_scaling * sensor.scaling_factor)
+            offsets.append(sensor.offset)
+
+        self.columns = columns
+        self.gains = np.array(gains, dtype=np.float64)
+        self.offsets = np.array(offsets, dtype=np.float64)
+
+    def convert(self, raw: np.ndarray) -> np.ndarray:
+        """Convert raw values with one row per message and one column per value"""
+
+        return raw * self.gains + self.offsets
+
+    def convert_value(self, raw: float, column: int) -> float:
+        """Convert a single raw value of the given column"""
+
+        return float(raw * self.gains[column] + self.offsets[column])
+
+
+class MeasurementBlock:
+    """
+    Accumulate streaming messages and convert them to physical values per block.
+
+    The raw values of all messages are collected in a preallocated array with
+    one row per message. On conversion all values are mapped to physical
+    values with the channel conversion in one vectorized operation.
+    """
+
+    def __init__(
+        self,
+        streaming_configuration: StreamingConfiguration,
+        sensor_info: MeasurementSensorInfo,
+        size: int,
+    ) -> None:
+        active_channels = get_active_channels(streaming_configuration)
+        # In single channel mode each message contains three samples of the same
+        # channel, otherwise one sample per enabled channel.
+        if len(active_channels) == 1:
+            self.columns = tuple(active_channels * 3)
+        else:
+            self.columns = tuple(active_channels)
+
+        self.conversion = ChannelConversion(self.columns, sensor_info)
+
+        self.size = max(1, size)
+        self.length = 0
+        self.counter = np.empty(self.size, dtype=np.uint8)
+        self.timestamp = np.empty(self.size, dtype=np.float64)
+        self.raw = np.empty((self.size, len(self.columns)), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def is_full(self) -> bool:
+        """Check if the block reached its maximum size"""
+
+        return self.length >= self.size
+
+    def append(self, data: StreamingData) -> None:
+        """Add a (raw) streaming message to the block"""
+
+        self.counter[self.length] = data.counter
+        self.timestamp[self.length] = data.timestamp
+        self.raw[self.length] = data.values
+        self.length += 1
+
+    def raw_values(self, channel: str) -> np.ndarray | None:
+        """Get the first raw value of a channel for every collected message"""
+
+        try:
+            return self.raw[: self.length, self.columns.index(channel)].copy()
+        except ValueError:
+            return None
+
+    def convert(self) -> ConvertedBlock:
+        """Convert all collected messages and start a new block"""
+
+        length = self.length
+        values = self.conversion.convert(self.raw[:length])
+        converted = ConvertedBlock(
+            counter=self.counter[:length].copy(),
+            timestamp=self.timestamp[:length].copy(),
+            values=values,
+            columns=self.columns,
+        )
+        self.length = 0
+
+        return converted
@@ -3,22 +3,19 @@
 import logging
 import os
 from os import PathLike, path
-from typing import List, Optional
+from typing import List
 import yaml
 
 from tables import Float32Col, IsDescription, StringCol
 from icotronic.measurement import StorageData
 
 from icoapi.models.models import (
-    MeasurementInstructionChannel,
-    MeasurementInstructions,
     Sensor,
     PCBSensorConfiguration,
     TridentConfig,
 )
-from icoapi.models.models import ADCValues
 from icoapi.scripts.config_helper import validate_dataspace_payload
-from icoapi.scripts.file_handling import ensure_folder_exists, get_sensors_file_path
+from icoapi.scripts.file_handling import ensure_folder_exists
 
 logger = logging.getLogger(__name__)
 
@@ -166,20 +163,6 @@ def get_voltage_from_raw(v_ref: float) -> float:
     return v_ref / 2**16
 
 
-def get_sensors() -> list[Sensor]:
-    """Get sensor default configuration"""
-
-    file_path = get_sensors_file_path()
-    try:
-        sensors, _, _ = read_and_parse_sensor_data(file_path)
-        return sensors
-    except FileNotFoundError:
-        sensor_defaults = get_sensor_defaults()
-        configuration_defaults = get_sensor_configuration_defaults()
-        write_sensor_defaults(sensor_defaults, configuration_defaults, file_path)
-        return sensor_defaults
-
-
 def read_and_parse_sensor_data(
     file_path: str | PathLike,
 ) -> tuple[list[Sensor], list[PCBSensorConfiguration], str]:
@@ -217,20 +200,6 @@ def read_and_parse_sensor_data(
         raise FileNotFoundError(f"Could not find sensor.yaml file at {file_path}") from error
 
 
-def get_sensor_config_data() -> tuple[list[Sensor], list[PCBSensorConfiguration], str]:
-    """Get sensor configuration data"""
-
-    file_path = get_sensors_file_path()
-    try:
-        return read_and_parse_sensor_data(file_path)
-
-    except FileNotFoundError:
-        sensor_default = get_sensor_defaults()
-        configuration_defaults = get_sensor_configuration_defaults()
-        write_sensor_defaults(sensor_default, configuration_defaults, file_path)
-        return read_and_parse_sensor_data(file_path)
-
-
 def write_sensor_defaults(
     sensors: list[Sensor], configuration: list[dict], file_path: str | PathLike
 ):
@@ -249,85 +218,6 @@ def write_sensor_defaults(
         )
 
 
-def find_sensor_by_id(sensors: List[Sensor], sensor_id: str) -> Optional[Sensor]:
-    """
-    Finds a sensor by its ID from the list of sensors.
-
-    Args:
-    - sensors (List[Sensor]): The list of Sensor objects.
-    - sensor_id (str): The ID of the sensor to find.
-
-    Returns:
-    - Optional[Sensor]: The Sensor object with the matching ID, or None if not found.
-    """
-    for sensor in sensors:
-        if sensor.sensor_id == sensor_id:
-            logger.debug(
-                "Found sensor with ID %s: %s | k2: %s | d2: %s",
-                sensor.sensor_id,
-                sensor.name,
-                sensor.scaling_factor,
-                sensor.offset,
-            )
-            return sensor
-    return None
-
-
-def get_sensor_for_channel(
-    channel_instruction: MeasurementInstructionChannel,
-) -> Optional[Sensor]:
-    """Get sensor for a specific measurement channel"""
-
-    sensors = get_sensors()
-
-    if channel_instruction.sensor_id:
-        logger.debug(
-            "Got sensor id %s for channel number %s",
-            channel_instruction.sensor_id,
-            channel_instruction.channel_number,
-        )
-        sensor = find_sensor_by_id(sensors, channel_instruction.sensor_id)
-        if sensor:
-            return sensor
-
-        logger.error("Could not find sensor with ID %s.", channel_instruction.sensor_id)
-
-    logger.info(
-        "No sensor ID requested or not found for channel %s. Taking defaults.",
-        channel_instruction.channel_number,
-    )
-    if channel_instruction.channel_number in range(1, 11):
-        sensor = sensors[channel_instruction.channel_number - 1]
-        logger.info(
-            "Default sensor for channel %s: %s | k2: %s | d2: %s",
-            channel_instruction.channel_number,
-            sensor.name,
-            sensor.scaling_factor,
-            sensor.offset,
-        )
-        return sensor
-
-    if channel_instruction.channel_number == 0:
-        logger.info("Disabled channel; return None")
-        return None
-
-    logger.error(
-        "Could not get sensor for channel %s. Interpreting as percentage.",
-        channel_instruction.channel_number,
-    )
-    return Sensor(
-        name="Raw",
-        sensor_type=None,
-        sensor_id="raw_default_01",
-        unit="-",
-        phys_min=-100,
-        phys_max=100,
-        volt_min=0,
-        volt_max=3.3,
-        dimension="Raw",
-    )
-
-
 # pylint: disable=too-few-public-methods
 
 
@@ -407,6 +297,7 @@ def read_and_parse_trident_config(file_path: str) -> TridentConfig:
 
     data = payload.get("connection")
     logger.info("Found dataspace config: %s", data)
+    upload = payload.get("upload") or {}
 
     return TridentConfig(
         protocol=str(data["protocol"]).strip(),
@@ -417,38 +308,7 @@ def read_and_parse_trident_config(file_path: str) -> TridentConfig:
         password=str(data["password"]),
         default_bucket=str(data["bucket"]),
         enabled=bool(data["enabled"]),
+        auto_upload=bool(upload.get("automatic", False)),
+        compression=upload.get("compression"),
+        compression_level=int(upload.get("compression_level", 5)),
     )
-
-
-# pylint: disable=too-few-public-methods
-
-
-class MeasurementSensorInfo:
-    """Sensor information for measurement"""
-
-    first_channel_sensor: Sensor | None
-    second_channel_sensor: Sensor | None
-    third_channel_sensor: Sensor | None
-    voltage_scaling: float
-
-    def __init__(self, instructions: MeasurementInstructions):
-        super().__init__()
-        self.first_channel_sensor = get_sensor_for_channel(instructions.first)
-        self.second_channel_sensor = get_sensor_for_channel(instructions.second)
-        self.third_channel_sensor = get_sensor_for_channel(instructions.third)
-        assert isinstance(instructions.adc, ADCValues)
-        assert isinstance(instructions.adc.reference_voltage, float)
-        self.voltage_scaling = get_voltage_from_raw(instructions.adc.reference_voltage)
-
-    def get_values(self):
-        """Return sensors for channels and voltage scaling"""
-
-        return (
-            self.first_channel_sensor,
-            self.second_channel_sensor,
-            self.third_channel_sensor,
-            self.voltage_scaling,
-        )
-
-
-# pylint: enable=too-few-public-methods
@@ -0,0 +1,144 @@
+"""Periodically sampled capacity of the measurement disk"""
+
+import asyncio
+from functools import cache
+import logging
+import os
+import shutil
+import time
+from typing import Callable
+
+from icoapi.models.models import DiskCapacity
+from icoapi.scripts.file_handling import get_drive_or_root_path, get_measurement_dir
+from icoapi.scripts.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def get_sample_interval() -> float:
+    """Get the time in seconds between two samples of the disk capacity"""
+
+    return get_settings().disk_sample_interval
+
+
+class DiskSampler:
+    """
+    Cache the capacity of the disk that stores the measurement files.
+
+    The capacity is sampled by a background task every ``DISK_SAMPLE_INTERVAL``
+    seconds and after files were written or deleted, so state updates and
+    requests do not query the file system. While a measurement is recorded,
+    the growth of its file is used to project the remaining recording time.
+    """
+
+    def __init__(self, interval: float | None = None) -> None:
+        self.interval = get_sample_interval() if interval is None else interval
+        self.capacity = DiskCapacity(None, None)
+        self.sampled = 0.0  # Monotonic time of the last sample (0: never)
+        self.recording: tuple[str, int, float] | None = None  # Path, size and time at start
+        self.on_change: Callable[[], None] | None = None
+        self.task: asyncio.Task | None = None
+
+    @staticmethod
+    def get_path() -> str:
+        """Get a path on the measurement disk"""
+
+        measurement_dir = get_measurement_dir()
+        return measurement_dir if os.path.isdir(measurement_dir) else get_drive_or_root_path()
+
+    def get_capacity(self) -> DiskCapacity:
+        """Get the (cached) disk capacity"""
+
+        if self.sampled == 0 or time.monotonic() - self.sampled >= self.interval:
+            self.sample()
+
+        return self.capacity
+
+    def sample(self) -> DiskCapacity:
+        """Read the disk capacity and notify about changes"""
+
+        try:
+            total, _, free = shutil.disk_usage(self.get_path())
+            capacity = DiskCapacity(
+                round(total / (2**30), 2),
+                round(free / (2**30), 2),
+                self.get_recording_time_remaining(free),
+            )
+        except OSError as e:
+            logger.error("Error retrieving disk space: %s", e)
+            capacity = DiskCapacity(None, None)
+
+        self.sampled = time.monotonic()
+        if capacity != self.capacity:
+            self.capacity = capacity
+            if self.on_change is not None:
+                self.on_change()
+
+        return capacity
+
+    def get_recording_time_remaining(self, free: int) -> float | None:
+        """
+        Project the time until the disk is full with the current recording rate.
+
+        :param free: Free disk space in bytes
+        :return: Seconds until the disk is full or ``None`` without recording
+        """
+
+        if self.recording is None:
+            return None
+
+        path, start_size, start_time = self.recording
+        try:
+            written = os.path.getsize(path) - start_size
+        except OSError:
+            return None
+        elapsed = time.monotonic() - start_time
+        if written <= 0 or elapsed <= 0:
+            return None
+
+        return round(free / (written / elapsed))
+
+    def start_recording(self, path: str | os.PathLike) -> None:
+        """Track the byte rate of a measurement file"""
+
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        self.recording = (os.fspath(path), size, time.monotonic())
+
+    def stop_recording(self) -> None:
+        """Stop tracking the measurement file and sample the final capacity"""
+
+        self.recording = None
+        self.sample()
+
+    async def start(self, on_change: Callable[[], None] | None = None) -> None:
+        """Start sampling the disk capacity in the background"""
+
+        self.on_change = on_change
+        if self.interval > 0 and self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop the background sampling"""
+
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        self.on_change = None
+
+    async def run(self) -> None:
+        """Sample the disk capacity at a fixed interval"""
+
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+
+@cache
+def get_disk_sampler() -> DiskSampler:
+    """Get the disk capacity sampler"""
+
+    return DiskSampler()
@@ -0,0 +1,116 @@
+"""Reduce measurement data to a fixed number of points for plotting"""
+
+import math
+
+import numpy as np
+
+from icoapi.models.models import DownsamplingMode
+
+
+def minmax_indices(values: np.ndarray, points: int) -> np.ndarray:
+    """
+    Select the minimum and maximum of equally sized buckets.
+
+    :param values: Values of a single channel
+    :param points: Maximum number of selected indices
+    :return: Sorted indices of the selected values
+    """
+
+    length = len(values)
+    if length <= points:
+        return np.arange(length)
+
+    bucket_size = math.ceil(length / max(1, points // 2))
+    buckets = math.ceil(length / bucket_size)
+    padded = np.full((buckets, bucket_size), np.nan)
+    padded.reshape(-1)[:length] = values
+    offsets = np.arange(buckets) * bucket_size
+
+    # Buckets without any valid value fall back to their first index
+    padded[np.all(np.isnan(padded), axis=1), 0] = 0
+    minima = np.nanargmin(padded, axis=1)
+    maxima = np.nanargmax(padded, axis=1)
+
+    return np.unique(np.concatenate((minima + offsets, maxima + offsets)))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Select points with the Largest-Triangle-Three-Buckets algorithm.
+
+    :param x: Timestamps
+    :param y: Values of a single channel
+    :param points: Number of selected indices
+    :return: Sorted indices of the selected values
+    """
+
+    length = len(y)
+    if length <= points or points < 3:
+        return np.arange(length) if length <= points else np.array([0, length - 1])
+
+    # The first and last point are always part of the result, the remaining
+    # points are split into `points - 2` buckets
+    edges = np.linspace(1, length - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = length - 1
+
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+            average_x = x[next_start:next_end].mean()
+            average_y = y[next_start:next_end].mean()
+        else:
+            average_x, average_y = x[-1], y[-1]
+
+        # Twice the area of the triangles (previous point, candidate, average
+        # of the next bucket)
+        areas = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(np.nanargmax(areas)) if not np.all(np.isnan(areas)) else start
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def downsample(
+    timestamps: np.ndarray,
+    channels: list[np.ndarray],
+    points: int,
+    mode: DownsamplingMode,
+) -> np.ndarray:
+    """
+    Get the row indices of a downsampled measurement.
+
+    The indices are selected for every channel separately; the result is the
+    union of all selected indices, so all channels share the same timestamps.
+
+    :param timestamps: Timestamps of all rows
+    :param channels: Values of all channels
+    :param points: Target number of points per channel
+    :param mode: Downsampling algorithm
+    :return: Sorted row indices
+    """
+
+    length = len(timestamps)
+    if length <= points or not channels:
+        return np.arange(length)
+
+    x = timestamps.astype(np.float64)
+    indices = [
+        (
+            lttb_indices(x, values.astype(np.float64), points)
+            if mode == DownsamplingMode.LTTB
+            else minmax_indices(values.astype(np.float64), points)
+        )
+        for values in channels
+    ]
+
+    # Always keep the first and last row to preserve the time range
+    indices.append(np.array([0, length - 1]))
+
+    return np.unique(np.concatenate(indices))
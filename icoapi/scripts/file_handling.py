@@ -1,21 +1,31 @@
 """File handling code"""
 
+import hashlib
 import logging
 import os
 import platform
 import sys
-from typing import Tuple
+from typing import BinaryIO, Tuple
 import shutil
 import re
 
 from dotenv import load_dotenv
-from platformdirs import user_data_dir
 
-from icoapi.models.models import DiskCapacity
 from icoapi.scripts.config_helper import CONFIG_FILE_DEFINITIONS
+from icoapi.scripts.settings import get_settings, reload_settings
 
 logger = logging.getLogger(__name__)
 
+COPY_CHUNK_SIZE = 1024 * 1024  # Bytes per read when storing uploaded files
+
+
+class FileTooLargeError(Exception):
+    """Error for uploaded files that exceed the size limit"""
+
+
+class ChecksumMismatchError(Exception):
+    """Error for uploaded files whose content does not match the given checksum"""
+
 
 def load_env_file():
     """Load environment configuration"""
@@ -43,6 +53,7 @@ def load_env_file():
     if not env_loaded:
         logger.critical("Environment variables not found")
         raise EnvironmentError(".env not found")
+    reload_settings()
 
 
 def is_bundled():
@@ -54,24 +65,19 @@ def is_bundled():
 def get_application_dir() -> str:
     """Get application directory"""
 
-    name = os.getenv("VITE_APPLICATION_FOLDER", "ICOdaq")
-    return user_data_dir(name, appauthor=False)
+    return get_settings().application_dir
 
 
 def get_measurement_dir() -> str:
     """Get measurement directory"""
 
-    measurement_dir = os.path.join(get_application_dir(), "measurements")
-    logger.info("Measurement directory: %s", measurement_dir)
-    return measurement_dir
+    return get_settings().measurement_dir
 
 
 def get_config_dir() -> str:
     """Get configuration directory"""
 
-    config_dir = os.path.join(get_application_dir(), "config")
-    logger.info("Config directory: %s", config_dir)
-    return config_dir
+    return get_settings().config_dir
 
 
 def get_dataspace_file_path() -> str:
@@ -139,21 +145,6 @@ def is_dangerous_filename(filename: str) -> Tuple[bool, str | None]:
     return False, None
 
 
-def get_disk_space_in_gb(path_or_drive: str | os.PathLike = "/") -> DiskCapacity:
-    """Get disk space in Gigabyte"""
-
-    try:
-        total, _, free = shutil.disk_usage(path_or_drive)
-
-        total_gb = round(total / (2**30), 2)
-        available_gb = round(free / (2**30), 2)
-
-        return DiskCapacity(total_gb, available_gb)
-    except Exception as e:  # pylint: disable=broad-exception-caught
-        logger.error("Error retrieving disk space: %s", e)
-        return DiskCapacity(None, None)
-
-
 def get_drive_or_root_path() -> str:
     """Get root of filesystem"""
 
@@ -161,23 +152,73 @@ def get_drive_or_root_path() -> str:
     return "C:\\" if os_type == "Windows" else "/"
 
 
-def get_suffixed_filename(base_name: str, directory: str) -> str:
-    """Get suffixed filename"""
+_suffixes: dict[tuple[str, str, str], int] = {}
+
+
+def create_unique_file(base_name: str, directory: str) -> tuple[str, BinaryIO]:
+    """
+    Create a new file without overwriting an existing one.
+
+    If the name is taken, the suffix ``__<number>`` is added to the name (an
+    existing suffix of ``base_name`` is replaced). Every file is created
+    atomically with ``O_EXCL``, so concurrent uploads never share a name, and
+    the last used suffix is remembered, so the directory is never listed.
+
+    :return: The name and the opened file
+    """
 
-    possible_filename = base_name
-    suffix: int = 0
-    while possible_filename in os.listdir(directory):
-        suffix += 1
-        tokens = possible_filename.split(".")
-        extension = tokens[-1]
-        # reassemble filename if dots were used in it (bad user, bad!)
-        name = ".".join(tokens[:-1])
-        has_suffix = bool(re.search(r"__\d+$", name))
-        if has_suffix:
-            name = "__".join(name.split("__")[:-1])
-        possible_filename = f"{name}__{suffix}.{extension}"
+    name, extension = os.path.splitext(base_name)
+    key = (directory, re.sub(r"__\d+$", "", name), extension)
+    candidate = base_name
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        try:
+            descriptor = os.open(os.path.join(directory, candidate), flags, 0o644)
+            return candidate, os.fdopen(descriptor, "wb")
+        except FileExistsError:
+            _suffixes[key] = _suffixes.get(key, 0) + 1
+            candidate = f"{key[1]}__{_suffixes[key]}{extension}"
+
+
+def store_file(
+    source: BinaryIO,
+    base_name: str,
+    directory: str,
+    max_size: int | None = None,
+    sha256: str | None = None,
+) -> str:
+    """
+    Copy a file into a directory in chunks of constant size.
+
+    :param source: Opened source file
+    :param base_name: Preferred name of the copy, see ``create_unique_file``
+    :param directory: Target directory
+    :param max_size: Maximum number of bytes
+    :param sha256: Expected SHA-256 checksum (hexadecimal) of the content
+    :raises FileTooLargeError: If the file is larger than ``max_size``
+    :raises ChecksumMismatchError: If the checksum of the content is different
+    :return: Name of the copy
+    """
 
-    return possible_filename
+    name, target = create_unique_file(base_name, directory)
+    checksum = hashlib.sha256() if sha256 is not None else None
+    size = 0
+    try:
+        with target:
+            while chunk := source.read(COPY_CHUNK_SIZE):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise FileTooLargeError(f"File is larger than {max_size} bytes")
+                if checksum is not None:
+                    checksum.update(chunk)
+                target.write(chunk)
+        if checksum is not None and sha256 is not None and checksum.hexdigest() != sha256.lower():
+            raise ChecksumMismatchError(f"SHA-256 checksum of {base_name} does not match")
+    except BaseException:
+        os.remove(os.path.join(directory, name))
+        raise
+
+    return name
 
 
 def ensure_folder_exists(path):
@@ -0,0 +1,173 @@
+"""Persistent index of the files in the measurement directory"""
+
+from contextlib import closing, contextmanager
+import logging
+import os
+import sqlite3
+import threading
+from typing import Iterator
+
+from icoapi.models.models import FileSortKey, SortOrder
+from icoapi.scripts.file_handling import get_application_dir
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1  # Increase to rebuild the index after changes of the schema
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    modified INTEGER NOT NULL,
+    PRIMARY KEY (directory, name)
+);
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    modified INTEGER NOT NULL
+);
+"""
+
+
+class FileIndex:
+    """
+    SQLite catalog of the measurement files with size and creation time.
+
+    The catalog is checked against the directory modification time on every
+    access, which changes whenever files are added, removed or renamed.
+    Changes of the content of existing files (e.g. when a measurement is
+    finished or metadata is overwritten) have to be reported with ``update``.
+    Hidden files (e.g. temporary copies) are not part of the catalog. Every
+    directory (e.g. after the measurement directory was changed) has its
+    own entries.
+    """
+
+    def __init__(self, database_path: str) -> None:
+        self.database_path = database_path
+        self.lock = threading.Lock()
+        with closing(self.connect()) as connection:
+            (version,) = connection.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA_VERSION:
+                # The index only caches the directory content, so it is rebuilt
+                connection.executescript(
+                    "DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS directories;"
+                )
+                connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            connection.executescript(SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the index database"""
+
+        return sqlite3.connect(self.database_path)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection and commit all changes at the end (if successful)"""
+
+        with self.lock, closing(self.connect()) as connection:
+            with connection:
+                yield connection
+
+    def sync(self, directory: str) -> None:
+        """Update the index, if the content of the directory changed"""
+
+        with self.transaction() as connection:
+            modified = os.stat(directory).st_mtime_ns
+            row = connection.execute(
+                "SELECT modified FROM directories WHERE path = ?", (directory,)
+            ).fetchone()
+            if row is not None and row[0] == modified:
+                return
+
+            indexed = dict(
+                connection.execute(
+                    "SELECT name, modified FROM files WHERE directory = ?", (directory,)
+                )
+            )
+            present = set()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.is_file() or entry.name.startswith("."):
+                        continue
+                    present.add(entry.name)
+                    stat = entry.stat()
+                    if indexed.get(entry.name) != stat.st_mtime_ns:
+                        connection.execute(
+                            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                            (
+                                directory,
+                                entry.name,
+                                stat.st_size,
+                                stat.st_ctime,
+                                stat.st_mtime_ns,
+                            ),
+                        )
+            connection.executemany(
+                "DELETE FROM files WHERE directory = ? AND name = ?",
+                [(directory, name) for name in indexed.keys() - present],
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO directories VALUES (?, ?)", (directory, modified)
+            )
+            logger.info("Indexed %s files in %s", len(present), directory)
+
+    def update(self, directory: str, name: str) -> None:
+        """Add or update a single file of the directory"""
+
+        path = os.path.join(directory, name)
+        with self.transaction() as connection:
+            if not os.path.isfile(path):
+                connection.execute(
+                    "DELETE FROM files WHERE directory = ? AND name = ?", (directory, name)
+                )
+                return
+            stat = os.stat(path)
+            connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                (directory, name, stat.st_size, stat.st_ctime, stat.st_mtime_ns),
+            )
+
+    def list_files(
+        self,
+        directory: str,
+        sort: FileSortKey = FileSortKey.CREATED,
+        order: SortOrder = SortOrder.DESC,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> tuple[list[tuple[str, int, float]], int]:
+        """
+        Get a page of the indexed files of a directory.
+
+        :return: Name, size and creation time of the files and the total
+            number of files
+        """
+
+        # The sort key and order are enum values and therefore safe to embed
+        query = (
+            "SELECT name, size, created FROM files WHERE directory = ? "
+            f"ORDER BY {sort} {order}, name LIMIT ? OFFSET ?"
+        )
+        with self.transaction() as connection:
+            files = connection.execute(
+                query, (directory, -1 if limit is None else limit, offset)
+            ).fetchall()
+            (total,) = connection.execute(
+                "SELECT COUNT(*) FROM files WHERE directory = ?", (directory,)
+            ).fetchone()
+
+        return files, total
+
+
+_indexes: dict[str, FileIndex] = {}
+
+
+def get_file_index() -> FileIndex:
+    """Get the file index of the application directory"""
+
+    database_path = os.path.join(get_application_dir(), "file_index.sqlite")
+    if database_path not in _indexes:
+        os.makedirs(os.path.dirname(database_path), exist_ok=True)
+        _indexes[database_path] = FileIndex(database_path)
+
+    return _indexes[database_path]
@@ -0,0 +1,151 @@
+"""Online computation of IFT values during a measurement"""
+
+import asyncio
+import logging
+import math
+from typing import Callable
+
+from icolyzer import iftlibrary
+import numpy as np
+
+from icoapi.scripts.buffer import Float64Buffer
+
+logger = logging.getLogger(__name__)
+
+MINIMUM_DURATION = 0.6  # The IFT library requires at least 0.6 s of samples
+
+
+def is_ift_computable(sample_frequency: float, window_length: float) -> bool:
+    """Check if IFT values can be calculated with the given parameters"""
+
+    return sample_frequency >= 200 and 0.005 <= window_length <= 1
+
+
+# pylint: disable=too-many-instance-attributes
+
+
+class IFTEngine:
+    """
+    Calculate IFT values with a sliding window while samples arrive.
+
+    Samples are processed in segments of (a little more than) 0.6 seconds.
+    Each segment is calculated together with one window of samples before
+    and after it, so the results are exactly the same as the ones of a single
+    calculation over all samples. The engine only keeps the samples of the
+    current segment and its context, independent of the measurement duration.
+
+    The calculation runs in a worker thread; every calculated segment is
+    passed to ``publish`` as arrays of timestamps and IFT values.
+    """
+
+    def __init__(
+        self,
+        sample_frequency: float,
+        window_length: float,
+        publish: Callable[[np.ndarray, np.ndarray], None],
+    ) -> None:
+        self.sample_frequency = sample_frequency
+        self.window_length = window_length
+        self.publish = publish
+        self.enabled = is_ift_computable(sample_frequency, window_length)
+
+        # The library needs strictly more than 0.6 s of samples
+        self.minimum_size = math.floor(MINIMUM_DURATION * sample_frequency) + 1
+        self.context = math.floor(window_length * sample_frequency)
+        self.segment_size = self.minimum_size
+
+        self.timestamps = Float64Buffer()
+        self.samples = Float64Buffer()
+        # Absolute index of the first buffered sample
+        self.offset = 0
+        # Absolute index of the first sample without IFT value
+        self.processed = 0
+        self.received = 0
+        self.task: asyncio.Task | None = None
+
+    def append(self, timestamps: np.ndarray, samples: np.ndarray) -> None:
+        """Add samples and start the calculation of complete segments"""
+
+        if not self.enabled or len(samples) == 0:
+            return
+
+        self.timestamps.extend(timestamps)
+        self.samples.extend(samples)
+        self.received += len(samples)
+
+        if self.segment_ready() and (self.task is None or self.task.done()):
+            self.task = asyncio.create_task(self.process_segments())
+
+    def segment_ready(self) -> bool:
+        """Check if enough samples are available for the next segment"""
+
+        return self.received - self.processed >= self.segment_size + self.context
+
+    async def process_segments(self) -> None:
+        """Calculate IFT values for all complete segments"""
+
+        while self.segment_ready():
+            await self.calculate(self.processed + self.segment_size, self.context)
+
+    async def finish(self) -> None:
+        """Calculate the IFT values of all remaining samples"""
+
+        if not self.enabled:
+            logger.info(
+                "No IFT value could be calculated with window length %ss and sample rate %s Hz.",
+                self.window_length,
+                self.sample_frequency,
+            )
+            return
+
+        if self.task is not None:
+            await self.task
+            self.task = None
+
+        if self.received < self.minimum_size:
+            logger.info(
+                "No IFT value could be calculated with window length %ss and %s samples.",
+                self.window_length,
+                self.received,
+            )
+            return
+
+        if self.processed < self.received:
+            await self.calculate(self.received, 0)
+
+    async def calculate(self, end: int, lookahead: int) -> None:
+        """
+        Calculate IFT values for the samples from ``processed`` up to ``end``.
+
+        :param end: Absolute index after the last sample that should be published
+        :param lookahead: Number of samples after ``end`` used as context
+        """
+
+        start = self.processed
+        # Use (at least) one window before the segment as context and extend it
+        # if the input would otherwise be too short for the library
+        first = max(0, start - max(self.context, self.minimum_size - (end + lookahead - start)))
+        # Copy the input, since the buffer can change during the calculation
+        samples = self.samples.view()[first - self.offset : end + lookahead - self.offset].copy()
+
+        values = await asyncio.to_thread(
+            iftlibrary.ift_value, samples, self.sample_frequency, self.window_length
+        )
+
+        timestamps = self.timestamps.view()[start - self.offset : end - self.offset].copy()
+        ift_values = np.asarray(values[start - first : end - first], dtype=np.float64)
+        self.processed = end
+        self.trim()
+        self.publish(timestamps, ift_values)
+
+    def trim(self) -> None:
+        """Remove samples that are not required for future calculations"""
+
+        keep_from = max(0, self.processed - max(self.context, self.minimum_size))
+        if keep_from > self.offset:
+            self.timestamps.discard(keep_from - self.offset)
+            self.samples.discard(keep_from - self.offset)
+            self.offset = keep_from
+
+
+# pylint: enable=too-many-instance-attributes
@@ -3,10 +3,8 @@
 import asyncio
 import json
 import logging
-import os
 from pathlib import Path
 
-from icolyzer import iftlibrary
 from icostate import ICOsystem
 from icotronic.can.adc import ADCConfiguration
 from icotronic.can.error import NoResponseError
@@ -14,7 +12,6 @@ from icotronic.can.error import UnsupportedFeatureException
 from icotronic.can.sensor import SensorConfiguration
 from icotronic.can.streaming import (
     StreamingConfiguration,
-    StreamingData,
     StreamingTimeoutError,
 )
 from icotronic.measurement import Storage, StorageData
@@ -23,11 +20,12 @@ from starlette.websockets import WebSocketDisconnect
 import tables.exceptions
 
 from icoapi.models.models import ADCValues
-from icoapi.scripts.data_handling import (
-    add_sensor_data_to_storage,
-    MeasurementSensorInfo,
-)
+from icoapi.scripts.conversion import ConvertedBlock, MeasurementBlock
+from icoapi.scripts.data_handling import add_sensor_data_to_storage
+from icoapi.scripts.disk_sampler import get_disk_sampler
 from icoapi.scripts.file_handling import get_measurement_dir
+from icoapi.scripts.file_index import get_file_index
+from icoapi.scripts.ift import IFTEngine
 from icoapi.models.globals import GeneralMessenger, MeasurementState
 from icoapi.models.models import (
     DataValueModel,
@@ -35,7 +33,21 @@ from icoapi.models.models import (
     Metadata,
     MetadataPrefix,
 )
+from icoapi.scripts.measurement_file import build_overview, MeasurementFileError
+from icoapi.scripts.sensor_registry import MeasurementSensorInfo
+from icoapi.scripts.settings import get_settings
 from icoapi.scripts.sth_scripts import disconnect_sth_devices
+from icoapi.scripts.storage_writer import (
+    StorageWriter,
+    apply_storage_layout,
+    get_storage_layout,
+)
+from icoapi.scripts.stream_encoding import (
+    encode_data_frame,
+    encode_dataloss_frame,
+    encode_ift_frame,
+)
+from icoapi.scripts.upload_queue import schedule_measurement_processing
 
 logger = logging.getLogger(__name__)
 
@@ -97,21 +109,6 @@ async def write_sensor_config_if_required(
             ) from exception
 
 
-def get_measurement_indices(
-    streaming_configuration: StreamingConfiguration,
-) -> list[int]:
-    """
-    Obtain ordered indices from streaming configuration
-    :param streaming_configuration: Selected / Activated channels for the measurement
-    :return: list containing [first_index, second_index, third_index]
-    """
-    first_index = 0
-    second_index = 1 if streaming_configuration.first else 0
-    third_index = (second_index + 1) if streaming_configuration.second else (first_index + 1)
-
-    return [first_index, second_index, third_index]
-
-
 def create_objects(timestamps: list[float], ift_vals: list[float]) -> list[dict[str, float]]:
     """
     Assembles the ift values and timestamps into a list of objects.
@@ -127,86 +124,34 @@ def create_objects(timestamps: list[float], ift_vals: list[float]) -> list[dict[
     return result
 
 
-def maybe_get_ift_value(
-    samples: list[float], sample_frequency=9524 / 3, window_length=0.15
-) -> list[float] | None:
-    """
-    Try to get IFT_value calculated
-    :param samples: list of samples for calculation
-    :param sample_frequency: sample frequency of the sample list
-    :param window_length: window for sliding calculation
-    :return: IFT value list or None if not calculatable
-    """
-    if (
-        (len(samples) <= 0.6 * sample_frequency)
-        or (sample_frequency < 200)
-        or (window_length < 0.005)
-        or (window_length > 1)
-    ):
-        return None
-    return iftlibrary.ift_value(samples, sample_frequency, window_length)
-
-
-async def send_ift_values(
-    timestamps: list[float],
-    values: list[float],
-    instructions: MeasurementInstructions,
+def publish_ift_values(
+    timestamps: np.ndarray,
+    ift_values: np.ndarray,
     measurement_state: MeasurementState,
 ) -> None:
-    """Calculate and send IFT values"""
-
-    logger.debug("IFT value computation requested for channel: <%s>", instructions.ift_channel)
-
-    assert isinstance(instructions.adc, ADCValues)
-    assert isinstance(instructions.adc.prescaler, int)
-    assert isinstance(instructions.adc.acquisition_time, int)
-    assert isinstance(instructions.adc.oversampling_rate, int)
-    assert isinstance(instructions.adc.reference_voltage, float)
-
-    freq = ADCConfiguration(
-        prescaler=instructions.adc.prescaler if instructions.adc.prescaler else 2,
-        acquisition_time=(
-            instructions.adc.acquisition_time if instructions.adc.acquisition_time else 8
-        ),
-        oversampling_rate=(
-            instructions.adc.oversampling_rate if instructions.adc.oversampling_rate else 64
-        ),
-        reference_voltage=(
-            instructions.adc.reference_voltage if instructions.adc.reference_voltage else 3.3
-        ),
-    ).sample_rate()
-
-    ift_values = maybe_get_ift_value(
-        values,
-        sample_frequency=freq,
-        window_length=instructions.ift_window_width / 1000,
+    """Queue IFT values for all measurement clients"""
+
+    def ift_wrapped() -> list[dict]:
+        return [
+            DataValueModel(
+                first=None,
+                second=None,
+                third=None,
+                ift=create_objects(timestamps.tolist(), ift_values.tolist()),
+                counter=1,
+                timestamp=1,
+                dataloss=None,
+            ).model_dump()
+        ]
+
+    measurement_state.clients.publish(
+        ift_wrapped,
+        lambda: encode_ift_frame(timestamps, ift_values),
+        droppable=False,
     )
-
-    if ift_values is None:
-        logger.info(
-            "No IFT value could be calculated with window length"
-            " %sms, %s timestamps and %s values.",
-            instructions.ift_window_width,
-            len(timestamps),
-            len(values),
-        )
-        return
-
-    ift_wrapped: DataValueModel = DataValueModel(
-        first=None,
-        second=None,
-        third=None,
-        ift=create_objects(timestamps, ift_values),
-        counter=1,
-        timestamp=1,
-        dataloss=None,
+    logger.debug(
+        "Queued %s IFT values for %s clients", len(ift_values), len(measurement_state.clients)
     )
-    for client in measurement_state.clients:
-        try:
-            await client.send_json([ift_wrapped.model_dump()])
-            logger.debug("Sent IFT value to client <%s>", client.client)
-        except RuntimeError:
-            logger.warning("Client must be disconnected, passing")
 
 
 def write_metadata(prefix: MetadataPrefix, metadata: Metadata, storage: StorageData) -> None:
@@ -275,67 +220,26 @@ def write_image_array(storage: StorageData, name: str, array: np.ndarray, overwr
             storage.hdf.create_array(storage.hdf.root, name, array)
 
 
-def get_sendable_data_and_apply_conversion(
-    streaming_configuration: StreamingConfiguration,
-    sensor_info: MeasurementSensorInfo,
-    data: StreamingData,
-) -> DataValueModel:
-    """Convert measurement data from raw to physical value"""
-
-    (
-        first_channel_sensor,
-        second_channel_sensor,
-        third_channel_sensor,
-        voltage_scaling,
-    ) = sensor_info.get_values()
-
-    data_to_send = DataValueModel(
-        first=None,
-        second=None,
-        third=None,
-        ift=None,
-        counter=data.counter,
-        timestamp=data.timestamp,
-        dataloss=None,
-    )
+def convert_block(
+    block: MeasurementBlock, ift_engine: IFTEngine | None, ift_channel: str
+) -> ConvertedBlock:
+    """Convert collected messages and pass the samples of the IFT channel to the IFT engine"""
+
+    samples = block.raw_values(ift_channel) if ift_engine is not None else None
+    converted = block.convert()
+    if ift_engine is not None and samples is not None:
+        ift_engine.append(converted.timestamp, samples)
+
+    return converted
+
+
+def publish_block(block: ConvertedBlock, measurement_state: MeasurementState) -> None:
+    """Queue converted measurement data for all measurement clients"""
 
-    if streaming_configuration.first:
-        if not streaming_configuration.second and not streaming_configuration.third:
-
-            def convert_single(val: float) -> float:
-                volts = val * voltage_scaling
-                return first_channel_sensor.convert_to_phys(volts)
-
-            data.apply(convert_single)
-            data_to_send.first = data.values[0]
-
-        elif streaming_configuration.second and not streaming_configuration.third:
-            data.values = [
-                first_channel_sensor.convert_to_phys(data.values[0] * voltage_scaling),
-                second_channel_sensor.convert_to_phys(data.values[1] * voltage_scaling),
-            ]
-            data_to_send.first = data.values[0]
-            data_to_send.second = data.values[1]
-
-        elif not streaming_configuration.second and streaming_configuration.third:
-            data.values = [
-                first_channel_sensor.convert_to_phys(data.values[0] * voltage_scaling),
-                third_channel_sensor.convert_to_phys(data.values[1] * voltage_scaling),
-            ]
-            data_to_send.first = data.values[0]
-            data_to_send.third = data.values[1]
-
-        else:
-            data.values = [
-                first_channel_sensor.convert_to_phys(data.values[0] * voltage_scaling),
-                second_channel_sensor.convert_to_phys(data.values[1] * voltage_scaling),
-                third_channel_sensor.convert_to_phys(data.values[2] * voltage_scaling),
-            ]
-            data_to_send.first = data.values[0]
-            data_to_send.second = data.values[1]
-            data_to_send.third = data.values[2]
-
-    return data_to_send
+    if len(block) == 0:
+        return
+
+    measurement_state.clients.publish(block.to_dicts, lambda: encode_data_frame(block))
 
 
 # pylint: disable=too-many-branches, too-many-locals, too-many-statements
@@ -369,13 +273,15 @@ async def run_measurement(
     # Write sensor configuration to the holder if possible / necessary.
     await write_sensor_config_if_required(system, sensor_configuration)
 
-    # NOTE: The array data.values only contains the activated channels. This
-    # means we need to compute the index at which each channel is located.
-    # This may not be pretty, but it works.
-    [first_index, second_index, third_index] = get_measurement_indices(streaming_configuration)
+    ift_engine: IFTEngine | None = None
+    if instructions.ift_requested:
+        logger.debug("IFT value computation requested for channel: <%s>", instructions.ift_channel)
+        ift_engine = IFTEngine(
+            sample_rate,
+            instructions.ift_window_width / 1000,
+            lambda timestamps, values: publish_ift_values(timestamps, values, measurement_state),
+        )
 
-    timestamps: list[float] = []
-    ift_relevant_channel: list[float] = []
     ift_sent: bool = False
     start_time: float = 0
     measurement_file_path = Path(f"{get_measurement_dir()}/{measurement_state.name}.hdf5")
@@ -383,6 +289,13 @@ async def run_measurement(
         with Storage(measurement_file_path, streaming_configuration) as storage:
 
             logger.info("Opened measurement file: <%s> for writing", measurement_file_path)
+            await asyncio.to_thread(
+                apply_storage_layout,
+                storage,
+                get_storage_layout(instructions.storage_layout),
+                int(instructions.time * sample_rate) if instructions.time else None,
+            )
+            get_disk_sampler().start_recording(measurement_file_path)
 
             storage["conversion"] = "true"
             assert isinstance(instructions.adc, ADCValues)
@@ -396,10 +309,19 @@ async def run_measurement(
 
                 logger.info("Opened measurement stream: <%s>", measurement_file_path)
 
-                counter: int = 0
-                data_collected_for_send: list = []
-
                 sensor_info = MeasurementSensorInfo(instructions)
+                # One block contains the messages sent to the clients in one update
+                block = MeasurementBlock(
+                    streaming_configuration,
+                    sensor_info,
+                    sample_rate // get_settings().websocket_update_rate,
+                )
+                if ift_engine is not None and instructions.ift_channel not in block.columns:
+                    logger.warning(
+                        "IFT channel <%s> is not part of the measurement - no IFT values",
+                        instructions.ift_channel,
+                    )
+                    ift_engine = None
                 (first_channel_sensor, second_channel_sensor, third_channel_sensor, _) = (
                     sensor_info.get_values()
                 )
@@ -439,87 +361,79 @@ async def run_measurement(
                             sensor_configuration.third,
                         )
 
-                async for data, _ in stream:
+                # Write measurement data in a separate thread from now on
+                storage_writer = StorageWriter(storage)
+                measurement_state.storage_writer = storage_writer
+                storage_writer.start()
 
-                    if start_time == 0:
-                        start_time = data.timestamp
-                        logger.debug("Set measurement start time to %s", start_time)
+                try:
+                    async for data, _ in stream:
 
-                    # Convert timestamp to seconds since measurement start
-                    data.timestamp = data.timestamp - start_time
+                        if start_time == 0:
+                            start_time = data.timestamp
+                            logger.debug("Set measurement start time to %s", start_time)
 
-                    # Save values required for future calculations
-                    timestamps.append(data.timestamp)
-                    if instructions.ift_requested:
-                        match instructions.ift_channel:
-                            case "first":
-                                ift_relevant_channel.append(data.values[first_index])
-                            case "second":
-                                ift_relevant_channel.append(data.values[second_index])
-                            case "third":
-                                ift_relevant_channel.append(data.values[third_index])
+                        # Convert timestamp to seconds since measurement start
+                        data.timestamp = data.timestamp - start_time
 
-                    data_to_send = get_sendable_data_and_apply_conversion(
-                        streaming_configuration, sensor_info, data
-                    )
-                    storage.add_streaming_data(data)
-
-                    if counter >= (sample_rate // int(os.getenv("WEBSOCKET_UPDATE_RATE", "60"))):
-                        for client in measurement_state.clients:
-                            try:
-                                await client.send_json(data_collected_for_send)
-                            except RuntimeError:
-                                logger.warning("Failed to send data to client <%s>", client.client)
-                        data_collected_for_send.clear()
-                        counter = 0
-                    else:
-                        data_collected_for_send.append(data_to_send.model_dump())
-                        counter += 1
-
-                    # Skip exit conditions on the first iteration
-                    if timestamps[0] is None:
-                        continue
-
-                    # Exit conditions
-                    if instructions.time is not None:
-                        if data.timestamp - timestamps[0] >= instructions.time:
-                            logger.info(
-                                "Timeout reached at with current being"
-                                " <%s> and first entry being %ss",
-                                data.timestamp,
-                                timestamps[0],
+                        block.append(data)
+                        if block.is_full():
+                            converted = convert_block(
+                                block, ift_engine, instructions.ift_channel
                             )
+                            await storage_writer.put(converted)
+                            publish_block(converted, measurement_state)
+
+                        # Exit conditions (the timestamps start at 0)
+                        if instructions.time is not None:
+                            if data.timestamp >= instructions.time:
+                                logger.info(
+                                    "Timeout reached with current timestamp being <%s>s",
+                                    data.timestamp,
+                                )
+                                break
+
+                        if measurement_state.stop_flag:
+                            logger.info("Stop flag set - stopping measurement")
                             break
-
-                    if measurement_state.stop_flag:
-                        logger.info("Stop flag set - stopping measurement")
-                        break
+                finally:
+                    # Also store the messages of the last incomplete block if
+                    # the measurement was stopped or cancelled
+                    converted = convert_block(block, ift_engine, instructions.ift_channel)
+                    await storage_writer.put(converted)
+                    await storage_writer.drain()
+                publish_block(converted, measurement_state)
 
                 # Send dataloss
-                for client in measurement_state.clients:
-                    try:
-                        await client.send_json([
-                            DataValueModel(
-                                first=None,
-                                second=None,
-                                third=None,
-                                ift=None,
-                                counter=None,
-                                timestamp=None,
-                                dataloss=storage.dataloss(),
-                            ).model_dump()
-                        ])
-                    except RuntimeError:
-                        logger.warning("Client must be disconnected, passing")
+                dataloss = await asyncio.to_thread(storage.dataloss)
+                measurement_state.clients.publish(
+                    lambda: [
+                        DataValueModel(
+                            first=None,
+                            second=None,
+                            third=None,
+                            ift=None,
+                            counter=None,
+                            timestamp=None,
+                            dataloss=dataloss,
+                        ).model_dump()
+                    ],
+                    lambda: encode_dataloss_frame(dataloss),
+                    droppable=False,
+                )
+
+            # Store overview of the data for the analysis of large files
+            try:
+                await asyncio.to_thread(build_overview, storage.hdf)
+            except (MeasurementFileError, tables.exceptions.HDF5ExtError, OSError) as error:
+                logger.warning("Unable to store measurement overview: %s", error)
 
             if instructions.disconnect_after_measurement:
                 await disconnect_sth_devices(system)
 
-            # Send IFT value values at once after the measurement is finished.
-            if instructions.ift_requested:
-                await send_ift_values(
-                    timestamps, ift_relevant_channel, instructions, measurement_state
-                )
+            # Send the IFT values of the remaining samples
+            if ift_engine is not None:
+                await ift_engine.finish()
                 ift_sent = True
 
             if measurement_state.wait_for_post_meta:
@@ -533,17 +447,16 @@ async def run_measurement(
 
     except StreamingTimeoutError as e:
         logger.debug("Stream timeout error")
-        for client in measurement_state.clients:
-            await client.send_json({"error": True, "type": type(e).__name__, "message": str(e)})
-        measurement_state.clients.clear()
+        error_message = {"error": True, "type": type(e).__name__, "message": str(e)}
+        measurement_state.clients.publish(lambda: error_message, droppable=False)
     except asyncio.CancelledError as e:
         logger.debug(
             "Measurement cancelled. IFT: requested <%s> | already sent: <%s>",
             instructions.ift_requested,
             ift_sent,
         )
-        if instructions.ift_requested and not ift_sent:
-            await send_ift_values(timestamps, ift_relevant_channel, instructions, measurement_state)
+        if ift_engine is not None and not ift_sent:
+            await ift_engine.finish()
         raise asyncio.CancelledError from e
     except WebSocketDisconnect:
         logger.info("WebSocket disconnected")
@@ -551,9 +464,11 @@ async def run_measurement(
         logger.error("Unhandled measurement error - stacktrace below")
         logger.error(e)
     finally:
-        clients = len(measurement_state.clients)
-        for client in measurement_state.clients:
-            await client.close()
+        get_file_index().update(str(measurement_file_path.parent), measurement_file_path.name)
+        get_disk_sampler().stop_recording()
+        if measurement_file_path.exists():
+            schedule_measurement_processing(str(measurement_file_path))
+        clients = await measurement_state.clients.close()
         logger.info("Ended measurement and cleared %s clients", clients)
         await measurement_state.reset()
 
@@ -0,0 +1,638 @@
+"""Read parts of measurement files without loading the whole acceleration table"""
+
+from functools import lru_cache
+import json
+import logging
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import tables
+from tables import Float32Col, NoSuchNodeError, UInt8Col, UInt64Col
+from tables.exceptions import HDF5ExtError
+
+from icoapi.models.models import (
+    Dataset,
+    DownsamplingMode,
+    HDF5NodeInfo,
+    MeasurementRange,
+    MetadataPrefix,
+    ParsedMetadata,
+    RangeUnit,
+    Sensor,
+)
+from icoapi.scripts.downsampling import downsample
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_ROWS = 500_000
+METADATA_CACHE_SIZE = 16  # Number of files whose metadata is cached
+
+OVERVIEW_GROUP = "overview"
+OVERVIEW_FACTORS = (10, 100, 1000)
+# Multiple of all overview factors, so that the buckets of every chunk are complete
+OVERVIEW_CHUNK_ROWS = 1_000_000
+
+
+class MeasurementFileError(Exception):
+    """Raised if a measurement file does not have the expected structure"""
+
+
+_file_locks: dict[str, threading.Lock] = {}
+_file_locks_guard = threading.Lock()
+
+
+def get_file_lock(file_path: str) -> threading.Lock:
+    """
+    Get the lock that guards changes of an existing measurement file.
+
+    Code that writes to a stored measurement file or replaces it (metadata
+    changes, overview, compression) has to hold the lock, so no change is
+    lost and the file is never opened in two different modes.
+    """
+
+    path = os.path.realpath(file_path)
+    with _file_locks_guard:
+        return _file_locks.setdefault(path, threading.Lock())
+
+
+def open_measurement_file(file_path: str, mode: str = "r") -> tables.File:
+    """
+    Open a measurement file.
+
+    :raises MeasurementFileError: If the file is no HDF5 file or is already
+        open in another mode (e.g. while it is written or compressed)
+    """
+
+    try:
+        return tables.open_file(file_path, mode=mode)
+    except (HDF5ExtError, ValueError) as error:
+        name = os.path.basename(file_path)
+        raise MeasurementFileError(f"Unable to open {name}: {error}") from error
+
+
+def get_acceleration_table(file_handle: tables.File) -> tables.Table:
+    """Get the acceleration table of an open measurement file"""
+
+    try:
+        table = file_handle.get_node("/acceleration")
+    except NoSuchNodeError as error:
+        raise MeasurementFileError("Acceleration data not found in the file") from error
+    if not isinstance(table, tables.Table):
+        raise MeasurementFileError("Acceleration data is not a table")
+
+    return table
+
+
+def record_storage_layout(table: tables.Table) -> None:
+    """Store the chunk size and compression of a table in its attributes"""
+
+    filters = table.filters
+    table.attrs["chunk_rows"] = f"{table.chunkshape[0] if table.chunkshape else 1}"
+    table.attrs["compression"] = f"{filters.complib if filters.complevel else 'none'}"
+    table.attrs["compression_level"] = f"{filters.complevel}"
+
+
+def get_read_chunk_rows(table: tables.Table) -> int:
+    """
+    Get the number of rows that should be read at once.
+
+    The number is a multiple of the rows per HDF5 chunk of the table (stored
+    in the attribute ``chunk_rows`` of new measurement files), so compressed
+    chunks are only decompressed once.
+    """
+
+    chunk_rows = table.chunkshape[0] if table.chunkshape else 1
+    return max(chunk_rows, READ_CHUNK_ROWS // chunk_rows * chunk_rows)
+
+
+def get_node_names(hdf5_file_handle: tables.File) -> list[str]:
+    """Get name of HDF5 nodes"""
+
+    nodes = hdf5_file_handle.list_nodes("/")
+    return [node._v_pathname for node in nodes]  # pylint: disable=protected-access
+
+
+def get_picture_node_names(hdf5_file_handle: tables.File) -> list[str]:
+    """Get name of nodes that contain picture data"""
+
+    names = get_node_names(hdf5_file_handle)
+    return [name for name in names if "pictures" in name]
+
+
+def parse_json_if_possible(val):
+    """
+    If val is a str or bytes containing JSON, return the deserialized object.
+    Otherwise, return val unchanged.
+    """
+    # Only attempt on str/bytes
+    if isinstance(val, (bytes, bytearray)):
+        try:
+            text = val.decode("utf-8")
+        except UnicodeDecodeError:
+            return val
+    elif isinstance(val, str):
+        text = val
+    else:
+        return val
+
+    # Try parsing
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return val
+
+
+# pylint: disable=protected-access
+
+
+def node_to_dict(node):
+    """Convert HDF5 metadata node to dictionary"""
+
+    info = HDF5NodeInfo(
+        name=node._v_name,
+        path=node._v_pathname,
+        type=node.__class__.__name__,
+        attributes={},
+    )
+
+    for key in node._v_attrs._f_list(attrset="all"):
+        raw = node._v_attrs[key]
+        # first coerce numpy‐types to Python
+        if hasattr(raw, "tolist"):
+            pyval = raw.tolist()
+        elif hasattr(raw, "item"):
+            pyval = raw.item()
+        else:
+            pyval = raw
+        # then parse JSON if it is a JSON string
+        info.attributes[key] = parse_json_if_possible(pyval)
+
+    return info
+
+
+# pylint: enable=protected-access
+
+
+def read_pictures(file_handle: tables.File) -> dict[str, list[str]]:
+    """Read the pictures of the measurement metadata"""
+
+    pictures: dict[str, list[str]] = {}
+    for node_name in get_picture_node_names(file_handle):
+        node = file_handle.get_node(node_name)
+        assert isinstance(node, tables.Array)
+        pictures[node_name.removeprefix("/")] = [
+            img.decode("utf-8") for img in node.read().tolist()
+        ]
+
+    return pictures
+
+
+def add_pictures_to_metadata(acceleration_meta: HDF5NodeInfo, pictures: dict[str, list[str]]):
+    """Add pictures to the parameters of the pre- and post-measurement metadata"""
+
+    try:
+        for pics_key, pics in pictures.items():
+            obj: dict[int, str] = dict(enumerate(pics))
+            if MetadataPrefix.PRE in pics_key:
+                stripped_key = pics_key.split(f"{MetadataPrefix.PRE}__")[1]
+                acceleration_meta.attributes["pre_metadata"]["parameters"][stripped_key] = obj
+            elif MetadataPrefix.POST in pics_key:
+                stripped_key = pics_key.split(f"{MetadataPrefix.POST}__")[1]
+                acceleration_meta.attributes["post_metadata"]["parameters"][stripped_key] = obj
+            else:
+                logger.error("Unknown picture key: %s", pics_key)
+    except KeyError:
+        pass
+    except IndexError as error:
+        raise MeasurementFileError("Picture data is not prefixed.") from error
+
+
+def read_sensor_dataframe(file_handle: tables.File) -> pd.DataFrame:
+    """Read the sensor table of a measurement file"""
+
+    try:
+        sensor_data = file_handle.get_node("/sensors")
+    except NoSuchNodeError:
+        # No sensor data available
+        return pd.DataFrame()
+    if not isinstance(sensor_data, tables.Table):
+        # Sensor data available, but not in the right shape
+        return pd.DataFrame()
+
+    return pd.DataFrame.from_records(sensor_data.read(), columns=sensor_data.colnames)
+
+
+@lru_cache(maxsize=METADATA_CACHE_SIZE)
+def read_metadata_cached(
+    file_path: str, modification_time: int, size: int  # pylint: disable=unused-argument
+) -> ParsedMetadata:
+    """
+    Read the metadata of a measurement file without pictures.
+
+    The result is cached by path, modification time and size. Pictures can
+    be large, so they are not part of the cached value.
+    """
+
+    with open_measurement_file(file_path) as file_handle:
+        acceleration_meta = node_to_dict(get_acceleration_table(file_handle))
+        sensors_raw = read_sensor_dataframe(file_handle).to_dict(orient="records")
+
+    for sensor_raw in sensors_raw:
+        sensor_raw.setdefault("dimension", "")
+
+    return ParsedMetadata(
+        acceleration=acceleration_meta,
+        pictures={},
+        sensors=[Sensor(**sensor) for sensor in sensors_raw],
+    )
+
+
+def read_metadata(file_path: str) -> ParsedMetadata:
+    """
+    Read the metadata of a measurement file without reading the measurement data.
+
+    The metadata (except for the pictures) is cached until the file changes.
+    """
+
+    stat = os.stat(file_path)
+    metadata = read_metadata_cached(os.path.realpath(file_path), stat.st_mtime_ns, stat.st_size)
+
+    with open_measurement_file(file_path) as file_handle:
+        pictures = read_pictures(file_handle)
+
+    # Never change the cached value
+    metadata = metadata.model_copy(deep=True)
+    add_pictures_to_metadata(metadata.acceleration, pictures)
+    metadata.pictures = pictures
+
+    return metadata
+
+
+def clear_metadata_cache() -> None:
+    """Drop the cached metadata (e.g. after files were deleted)"""
+
+    read_metadata_cached.cache_clear()
+
+
+def get_channel_names(table: tables.Table) -> list[str]:
+    """Get the names of the value columns of the acceleration table"""
+
+    return [name for name in table.colnames if name not in ("counter", "timestamp")]
+
+
+def find_row(table: tables.Table, timestamp: int) -> int:
+    """
+    Find the first row with a timestamp greater than or equal to ``timestamp``.
+
+    The timestamps of the acceleration table are sorted, so a binary search
+    only needs to read a few single values from the file.
+
+    :param timestamp: Timestamp in microseconds
+    """
+
+    low, high = 0, table.nrows
+    while low < high:
+        middle = (low + high) // 2
+        # Reading whole rows is much faster than reading single fields
+        if table.read(middle, middle + 1)["timestamp"][0] < timestamp:
+            low = middle + 1
+        else:
+            high = middle
+
+    return low
+
+
+def get_row_range(
+    table: tables.Table, start: float | None, end: float | None, unit: RangeUnit
+) -> tuple[int, int]:
+    """
+    Convert a time or row range into a row range.
+
+    :param start: Start of the range (seconds or row index), inclusive
+    :param end: End of the range (seconds or row index), exclusive
+    :return: Index of the first row and index after the last row
+    """
+
+    if unit == RangeUnit.ROW:
+        first = 0 if start is None else int(start)
+        last = table.nrows if end is None else int(end)
+    else:
+        first = 0 if start is None else find_row(table, math.ceil(start * 1_000_000))
+        last = table.nrows if end is None else find_row(table, math.ceil(end * 1_000_000))
+
+    first = min(max(0, first), table.nrows)
+    return first, min(max(first, last), table.nrows)
+
+
+def reduce_rows(data: np.ndarray, factor: int, channel_names: list[str]) -> dict[str, np.ndarray]:
+    """
+    Calculate minimum, maximum and mean of every ``factor`` rows.
+
+    :return: Columns of the overview table
+    """
+
+    buckets = math.ceil(len(data) / factor)
+    columns = {
+        "timestamp": data["timestamp"][::factor],
+        "counter": data["counter"][::factor],
+    }
+    for name in channel_names:
+        # Fill the last incomplete bucket with NaN values, which are ignored
+        padded = np.full((buckets, factor), np.nan)
+        padded.reshape(-1)[: len(data)] = data[name]
+        columns[f"{name}_min"] = np.nanmin(padded, axis=1)
+        columns[f"{name}_max"] = np.nanmax(padded, axis=1)
+        columns[f"{name}_mean"] = np.nanmean(padded, axis=1)
+
+    return columns
+
+
+def build_overview(file_handle: tables.File) -> None:  # pylint: disable=too-many-locals
+    """
+    Store a min/max/mean pyramid of the acceleration data in the file.
+
+    Every level of the group ``/overview`` contains one row for every
+    ``factor`` rows of the acceleration table with the timestamp and counter
+    of the first row and the minimum, maximum and mean value of every channel.
+    """
+
+    table = get_acceleration_table(file_handle)
+    channel_names = get_channel_names(table)
+
+    if f"/{OVERVIEW_GROUP}" in file_handle:
+        file_handle.remove_node(f"/{OVERVIEW_GROUP}", recursive=True)
+    group = file_handle.create_group("/", OVERVIEW_GROUP, "Overview of acceleration data")
+
+    description: dict[str, tables.Col] = {"timestamp": UInt64Col(pos=0), "counter": UInt8Col(pos=1)}
+    for name in channel_names:
+        for statistic in ("min", "max", "mean"):
+            description[f"{name}_{statistic}"] = Float32Col(pos=len(description))
+
+    levels = {
+        factor: file_handle.create_table(
+            group,
+            f"level_{factor}",
+            description,
+            title=f"Acceleration data reduced by factor {factor}",
+            expectedrows=table.nrows // factor + 1,
+        )
+        for factor in OVERVIEW_FACTORS
+    }
+
+    for start in range(0, table.nrows, OVERVIEW_CHUNK_ROWS):
+        data = table.read(start, min(start + OVERVIEW_CHUNK_ROWS, table.nrows))
+        for factor, level in levels.items():
+            columns = reduce_rows(data, factor, channel_names)
+            rows = np.empty(len(columns["timestamp"]), dtype=level.dtype)
+            for column, values in columns.items():
+                rows[column] = values
+            level.append(rows)
+
+    for factor, level in levels.items():
+        level.attrs["factor"] = factor
+        level.flush()
+    group._v_attrs["rows"] = table.nrows  # pylint: disable=protected-access
+
+    logger.info("Stored overview of %s rows in <%s>", table.nrows, file_handle.filename)
+
+
+def has_overview(file_handle: tables.File) -> bool:
+    """Check if the file contains an up-to-date overview of the acceleration data"""
+
+    try:
+        group = file_handle.get_node(f"/{OVERVIEW_GROUP}")
+        rows = group._v_attrs["rows"]  # pylint: disable=protected-access
+    except (NoSuchNodeError, KeyError):
+        return False
+
+    return int(rows) == get_acceleration_table(file_handle).nrows
+
+
+def ensure_overview(file_path: str) -> bool:
+    """
+    Create the overview of a measurement file, if it does not exist yet.
+
+    This changes the file, so it is only used when files are imported;
+    the overview of recorded files is stored at the end of the measurement.
+
+    :return: True if the file contains an up-to-date overview
+    """
+
+    try:
+        with get_file_lock(file_path):
+            with open_measurement_file(file_path) as file_handle:
+                if has_overview(file_handle):
+                    return True
+            with open_measurement_file(file_path, mode="a") as file_handle:
+                build_overview(file_handle)
+    except (MeasurementFileError, HDF5ExtError, OSError) as error:
+        logger.warning("Unable to store overview in <%s>: %s", file_path, error)
+        return False
+
+    return True
+
+
+def select_overview_factor(rows: int, points: int) -> int:
+    """
+    Get the coarsest overview level that still has ``points`` rows in the range.
+
+    :return: Reduction factor of the level or 1 for the raw data
+    """
+
+    factors = [factor for factor in OVERVIEW_FACTORS if rows // factor >= points]
+    return max(factors, default=1)
+
+
+def read_overview_envelope(
+    file_handle: tables.File,
+    factor: int,
+    first: int,
+    last: int,
+    channel_names: list[str],
+) -> dict[str, np.ndarray]:
+    """
+    Read the min/max envelope of a row range from an overview level.
+
+    Every overview row results in two rows: one with the minima and one with
+    the maxima of all channels.
+    """
+
+    level = file_handle.get_node(f"/{OVERVIEW_GROUP}/level_{factor}")
+    assert isinstance(level, tables.Table)
+    data = level.read(first // factor, math.ceil(last / factor))
+
+    columns = {
+        "timestamp": np.repeat(data["timestamp"], 2),
+        "counter": np.repeat(data["counter"], 2),
+    }
+    for name in channel_names:
+        columns[name] = np.column_stack((data[f"{name}_min"], data[f"{name}_max"])).ravel()
+
+    return columns
+
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+
+
+def read_range(
+    file_path: str,
+    start: float | None,
+    end: float | None,
+    unit: RangeUnit,
+    points: int,
+    mode: DownsamplingMode,
+) -> MeasurementRange:
+    """
+    Read a downsampled range of the acceleration data of a measurement file.
+
+    For the min/max envelope the coarsest overview level with enough rows for
+    the requested number of points is used, if the file contains an
+    up-to-date overview. Otherwise the range is read in chunks of at most
+    ``READ_CHUNK_ROWS`` rows, aligned to the HDF5 chunks of the table. Every
+    chunk is reduced to its share of the requested number of points, so the
+    memory usage does not depend on the size of the range.
+    """
+
+    with open_measurement_file(file_path) as file_handle:
+        table = get_acceleration_table(file_handle)
+        channel_names = get_channel_names(table)
+        first, last = get_row_range(table, start, end, unit)
+        rows = last - first
+        if rows == 0:
+            return MeasurementRange(
+                name=os.path.basename(file_path),
+                start_row=first,
+                end_row=last,
+                counter=[],
+                timestamp=[],
+                datasets=[Dataset(name=name, data=[]) for name in channel_names],
+            )
+
+        overview = mode == DownsamplingMode.MINMAX and has_overview(file_handle)
+        factor = select_overview_factor(rows, points) if overview else 1
+        if factor > 1:
+            envelope = read_overview_envelope(file_handle, factor, first, last, channel_names)
+            indices = downsample(
+                envelope["timestamp"], [envelope[name] for name in channel_names], points, mode
+            )
+            logger.debug(
+                "Read rows %s to %s of <%s> from overview level %s", first, last, file_path, factor
+            )
+            return MeasurementRange(
+                name=os.path.basename(file_path),
+                start_row=first,
+                end_row=last,
+                factor=factor,
+                counter=envelope["counter"][indices].tolist(),
+                timestamp=envelope["timestamp"][indices].tolist(),
+                datasets=[
+                    Dataset(name=name, data=envelope[name][indices].tolist())
+                    for name in channel_names
+                ],
+            )
+
+        parts = []
+        step = get_read_chunk_rows(table)
+        boundaries = [first, *range((first // step + 1) * step, last, step), last]
+        for chunk_start, chunk_end in zip(boundaries, boundaries[1:]):
+            chunk = table.read(chunk_start, chunk_end)
+            chunk_points = max(3, math.ceil(points * (chunk_end - chunk_start) / rows))
+            indices = downsample(
+                chunk["timestamp"],
+                [chunk[name] for name in channel_names],
+                chunk_points,
+                mode,
+            )
+            parts.append(chunk[indices])
+
+        data = np.concatenate(parts) if parts else np.empty(0, dtype=table.dtype)
+
+    logger.debug(
+        "Read rows %s to %s of <%s> and reduced them to %s rows", first, last, file_path, len(data)
+    )
+
+    return MeasurementRange(
+        name=os.path.basename(file_path),
+        start_row=first,
+        end_row=last,
+        counter=data["counter"].tolist(),
+        timestamp=data["timestamp"].tolist(),
+        datasets=[Dataset(name=name, data=data[name].tolist()) for name in channel_names],
+    )
+
+
+# pylint: enable=too-many-arguments, too-many-positional-arguments, too-many-locals
+
+
+def verify_copy(source_path: str, copy_path: str) -> None:
+    """
+    Check that a copy of a measurement file contains the same data.
+
+    The data of all tables is compared byte by byte, so compression of the
+    copy is fine, but any change of the values is not.
+    """
+
+    with tables.open_file(source_path, "r") as source, tables.open_file(copy_path, "r") as copy:
+        # pylint: disable=protected-access
+        source_leaves = {leaf._v_pathname: leaf for leaf in source.walk_nodes("/", "Leaf")}
+        copy_leaves = {leaf._v_pathname: leaf for leaf in copy.walk_nodes("/", "Leaf")}
+        # pylint: enable=protected-access
+        if source_leaves.keys() != copy_leaves.keys():
+            raise MeasurementFileError("Copy does not contain the same nodes")
+
+        for name, leaf in source_leaves.items():
+            copied = copy_leaves[name]
+            if leaf.nrows != copied.nrows or leaf.shape != copied.shape:
+                raise MeasurementFileError(f"Copy of {name} does not have the same size")
+            if not isinstance(leaf, tables.Table):
+                continue
+            for start in range(0, leaf.nrows, READ_CHUNK_ROWS):
+                stop = min(leaf.nrows, start + READ_CHUNK_ROWS)
+                if leaf.read(start, stop).tobytes() != copied.read(start, stop).tobytes():
+                    raise MeasurementFileError(f"Copy of {name} does not contain the same data")
+
+
+def repack(file_path: str, complib: str, complevel: int) -> None:
+    """
+    Rewrite a measurement file with compressed tables.
+
+    The file is copied with the given filters, verified and then replaces the
+    original file. If anything fails, the original file is kept. Other
+    changes of the file wait until it was replaced (see ``get_file_lock``).
+    """
+
+    directory, name = os.path.split(file_path)
+    # Hidden, so that the file index does not list the incomplete copy
+    temporary_path = os.path.join(directory, f".{name}.repack")
+    filters = tables.Filters(complevel=complevel, complib=complib, shuffle=True)
+    with get_file_lock(file_path):
+        try:
+            with (
+                open_measurement_file(file_path) as source,
+                tables.open_file(temporary_path, "w", title=source.title, filters=filters) as copy,
+            ):
+                # `File.copy_file` keeps the filters of the existing nodes
+                source.root._v_attrs._f_copy(copy.root)  # pylint: disable=protected-access
+                source.root._f_copy_children(  # pylint: disable=protected-access
+                    copy.root, recursive=True, filters=filters
+                )
+                # The copied attributes still describe the layout of the original
+                if "/acceleration" in copy:
+                    record_storage_layout(get_acceleration_table(copy))
+            verify_copy(file_path, temporary_path)
+            original_size = os.path.getsize(file_path)
+            os.replace(temporary_path, file_path)
+            logger.info(
+                "Repacked %s with %s (level %s): %s -> %s bytes",
+                name,
+                complib,
+                complevel,
+                original_size,
+                os.path.getsize(file_path),
+            )
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
@@ -0,0 +1,197 @@
+"""Cached access to the sensor configuration"""
+
+from functools import cache
+import logging
+import os
+import threading
+from typing import Optional
+
+from icoapi.models.models import (
+    ADCValues,
+    MeasurementInstructionChannel,
+    MeasurementInstructions,
+    PCBSensorConfiguration,
+    Sensor,
+)
+from icoapi.scripts.data_handling import (
+    get_sensor_configuration_defaults,
+    get_sensor_defaults,
+    get_voltage_from_raw,
+    read_and_parse_sensor_data,
+    write_sensor_defaults,
+)
+from icoapi.scripts.file_handling import get_sensors_file_path
+
+logger = logging.getLogger(__name__)
+
+
+class SensorRegistry:
+    """
+    Sensors and sensor configurations of the sensor configuration file.
+
+    The file is parsed only on the first access and whenever its modification
+    time or size changed since the last access. Uploading or restoring the
+    configuration file invalidates the registry explicitly, since the
+    modification time might not change within its resolution.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.stamp: tuple[str, int, int] | None = None
+        self.sensors: list[Sensor] = []
+        self.configurations: list[PCBSensorConfiguration] = []
+        self.default_configuration_id = ""
+        self.sensors_by_id: dict[str, Sensor] = {}
+
+    def invalidate(self) -> None:
+        """Read the configuration file again on the next access"""
+
+        with self.lock:
+            self.stamp = None
+
+    def refresh(self) -> None:
+        """Read the configuration file, if it changed since the last access"""
+
+        file_path = str(get_sensors_file_path())
+        with self.lock:
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                write_sensor_defaults(
+                    get_sensor_defaults(), get_sensor_configuration_defaults(), file_path
+                )
+                stat = os.stat(file_path)
+
+            stamp = (file_path, stat.st_mtime_ns, stat.st_size)
+            if stamp == self.stamp:
+                return
+
+            sensors, configurations, default_configuration_id = read_and_parse_sensor_data(
+                file_path
+            )
+            self.sensors = sensors
+            self.configurations = configurations
+            self.default_configuration_id = default_configuration_id
+            self.sensors_by_id = {sensor.sensor_id: sensor for sensor in sensors}
+            self.stamp = stamp
+
+    def get_sensors(self) -> list[Sensor]:
+        """Get all sensors"""
+
+        self.refresh()
+        return self.sensors
+
+    def get_sensor(self, sensor_id: str) -> Optional[Sensor]:
+        """Get the sensor with the given ID"""
+
+        self.refresh()
+        return self.sensors_by_id.get(sensor_id)
+
+    def get_config_data(self) -> tuple[list[Sensor], list[PCBSensorConfiguration], str]:
+        """Get sensors, sensor configurations and the ID of the default configuration"""
+
+        self.refresh()
+        return self.sensors, self.configurations, self.default_configuration_id
+
+
+@cache
+def get_sensor_registry() -> SensorRegistry:
+    """Get the sensor registry"""
+
+    return SensorRegistry()
+
+
+def get_sensor_for_channel(
+    channel_instruction: MeasurementInstructionChannel,
+) -> Optional[Sensor]:
+    """Get sensor for a specific measurement channel"""
+
+    registry = get_sensor_registry()
+
+    if channel_instruction.sensor_id:
+        logger.debug(
+            "Got sensor id %s for channel number %s",
+            channel_instruction.sensor_id,
+            channel_instruction.channel_number,
+        )
+        sensor = registry.get_sensor(channel_instruction.sensor_id)
+        if sensor:
+            logger.debug(
+                "Found sensor with ID %s: %s | k2: %s | d2: %s",
+                sensor.sensor_id,
+                sensor.name,
+                sensor.scaling_factor,
+                sensor.offset,
+            )
+            return sensor
+
+        logger.error("Could not find sensor with ID %s.", channel_instruction.sensor_id)
+
+    logger.info(
+        "No sensor ID requested or not found for channel %s. Taking defaults.",
+        channel_instruction.channel_number,
+    )
+    if channel_instruction.channel_number in range(1, 11):
+        sensor = registry.get_sensors()[channel_instruction.channel_number - 1]
+        logger.info(
+            "Default sensor for channel %s: %s | k2: %s | d2: %s",
+            channel_instruction.channel_number,
+            sensor.name,
+            sensor.scaling_factor,
+            sensor.offset,
+        )
+        return sensor
+
+    if channel_instruction.channel_number == 0:
+        logger.info("Disabled channel; return None")
+        return None
+
+    logger.error(
+        "Could not get sensor for channel %s. Interpreting as percentage.",
+        channel_instruction.channel_number,
+    )
+    return Sensor(
+        name="Raw",
+        sensor_type=None,
+        sensor_id="raw_default_01",
+        unit="-",
+        phys_min=-100,
+        phys_max=100,
+        volt_min=0,
+        volt_max=3.3,
+        dimension="Raw",
+    )
+
+
+# pylint: disable=too-few-public-methods
+
+
+class MeasurementSensorInfo:
+    """Sensor information for measurement"""
+
+    first_channel_sensor: Sensor | None
+    second_channel_sensor: Sensor | None
+    third_channel_sensor: Sensor | None
+    voltage_scaling: float
+
+    def __init__(self, instructions: MeasurementInstructions):
+        super().__init__()
+        self.first_channel_sensor = get_sensor_for_channel(instructions.first)
+        self.second_channel_sensor = get_sensor_for_channel(instructions.second)
+        self.third_channel_sensor = get_sensor_for_channel(instructions.third)
+        assert isinstance(instructions.adc, ADCValues)
+        assert isinstance(instructions.adc.reference_voltage, float)
+        self.voltage_scaling = get_voltage_from_raw(instructions.adc.reference_voltage)
+
+    def get_values(self):
+        """Return sensors for channels and voltage scaling"""
+
+        return (
+            self.first_channel_sensor,
+            self.second_channel_sensor,
+            self.third_channel_sensor,
+            self.voltage_scaling,
+        )
+
+
+# pylint: enable=too-few-public-methods
@@ -0,0 +1,147 @@
+"""Settings derived from environment variables"""
+
+from dataclasses import dataclass
+import logging
+import os
+from typing import Mapping
+
+from dotenv import dotenv_values
+from platformdirs import user_data_dir
+
+from icoapi.models.models import LagPolicy
+
+logger = logging.getLogger(__name__)
+
+
+# pylint: disable=too-many-instance-attributes
+@dataclass(frozen=True)
+class Settings:
+    """
+    Typed snapshot of the environment configuration.
+
+    The environment is parsed once (at startup and whenever a new ``.env``
+    file is stored), so code in the measurement loop or in request handlers
+    does not look up and convert environment variables on every call.
+    """
+
+    application_dir: str
+    measurement_dir: str
+    config_dir: str
+    api_origins: tuple[str, ...]
+    api_port: int
+    api_hostname: str
+    websocket_update_rate: int
+    websocket_queue_size: int
+    websocket_lag_policy: LagPolicy
+    websocket_state_interval: float
+    websocket_send_timeout: float
+    storage_writer_queue_size: int
+    storage_chunk_rows: int | None
+    storage_compression: str | None
+    storage_compression_level: int
+    trident_timeout: float
+    trident_workers: int
+    upload_concurrency: int
+    upload_multipart: bool
+    upload_part_size: int  # Bytes
+    cloud_list_ttl: float
+    disk_sample_interval: float
+    file_import_max_size: int | None  # Bytes, None: no limit
+    log_level: str
+    log_level_uvicorn: str
+    log_use_json: bool
+    log_use_color: bool
+    log_max_bytes: int
+    log_backup_count: int
+    log_name: str
+    log_path: str | None  # None: default path in the user data directory
+    log_folder: str
+
+
+# pylint: enable=too-many-instance-attributes
+
+
+def load_settings(environment: Mapping[str, str] | None = None) -> Settings:
+    """
+    Parse the environment variables.
+
+    :param environment: Variables to parse instead of the current environment
+    :raises ValueError: If a variable has a value of the wrong type
+    """
+
+    env = os.environ if environment is None else environment
+
+    application_folder = env.get("VITE_APPLICATION_FOLDER", "ICOdaq")
+    application_dir = user_data_dir(application_folder, appauthor=False)
+    chunk_rows = env.get("STORAGE_CHUNK_ROWS")
+    import_max_size = float(env.get("FILE_IMPORT_MAX_SIZE", "0"))
+
+    return Settings(
+        application_dir=application_dir,
+        measurement_dir=os.path.join(application_dir, "measurements"),
+        config_dir=os.path.join(application_dir, "config"),
+        api_origins=tuple(env.get("VITE_API_ORIGINS", "").split(",")),
+        api_port=int(env.get("VITE_API_PORT", "33215")),
+        api_hostname=env.get("VITE_API_HOSTNAME", "0.0.0.0"),
+        websocket_update_rate=max(1, int(env.get("WEBSOCKET_UPDATE_RATE", "60"))),
+        websocket_queue_size=max(1, int(env.get("WEBSOCKET_QUEUE_SIZE", "120"))),
+        websocket_lag_policy=LagPolicy(env.get("WEBSOCKET_LAG_POLICY", "drop_oldest")),
+        websocket_state_interval=max(0.0, float(env.get("WEBSOCKET_STATE_INTERVAL", "0.2"))),
+        websocket_send_timeout=max(0.1, float(env.get("WEBSOCKET_SEND_TIMEOUT", "5"))),
+        storage_writer_queue_size=max(1, int(env.get("STORAGE_WRITER_QUEUE_SIZE", "600"))),
+        storage_chunk_rows=int(chunk_rows) if chunk_rows else None,
+        storage_compression=env.get("STORAGE_COMPRESSION") or None,
+        storage_compression_level=int(env.get("STORAGE_COMPRESSION_LEVEL", "5")),
+        trident_timeout=max(1.0, float(env.get("TRIDENT_TIMEOUT", "30"))),
+        trident_workers=max(1, int(env.get("TRIDENT_WORKERS", "4"))),
+        upload_concurrency=max(1, int(env.get("UPLOAD_CONCURRENCY", "2"))),
+        upload_multipart=env.get("UPLOAD_MULTIPART", "0") == "1",
+        upload_part_size=max(5, int(env.get("UPLOAD_PART_SIZE", "16"))) * 1024 * 1024,
+        cloud_list_ttl=max(0.0, float(env.get("CLOUD_LIST_TTL", "30"))),
+        disk_sample_interval=max(0.0, float(env.get("DISK_SAMPLE_INTERVAL", "5"))),
+        file_import_max_size=int(import_max_size * 1024 * 1024) if import_max_size > 0 else None,
+        log_level=env.get("LOG_LEVEL", "").upper(),
+        log_level_uvicorn=env.get("LOG_LEVEL_UVICORN", "INFO"),
+        log_use_json=env.get("LOG_USE_JSON", "0") == "1",
+        log_use_color=env.get("LOG_USE_COLOR", "0") == "1",
+        log_max_bytes=int(env.get("LOG_MAX_BYTES", str(5 * 1024 * 1024))),
+        log_backup_count=int(env.get("LOG_BACKUP_COUNT", "5")),
+        log_name=f"{env.get('LOG_NAME_WITHOUT_EXTENSION', 'icodaq')}.log",
+        log_path=env.get("LOG_PATH") or None,
+        log_folder=env.get("VITE_BACKEND_MEASUREMENT_DIR", "ICOdaq"),
+    )
+
+
+_settings: list[Settings] = []
+
+
+def get_settings() -> Settings:
+    """Get the current settings (parsed on first use)"""
+
+    if not _settings:
+        _settings.append(load_settings())
+
+    return _settings[0]
+
+
+def reload_settings(env_file: str | os.PathLike | None = None) -> Settings:
+    """
+    Parse the environment again.
+
+    :param env_file: Environment file whose values replace the current ones
+        before the environment is parsed
+    :raises ValueError: If a variable has a value of the wrong type; the
+        environment and the previous settings stay unchanged in this case
+    """
+
+    values: dict[str, str] = {}
+    if env_file is not None:
+        values = {
+            key: value for key, value in dotenv_values(env_file).items() if value is not None
+        }
+    settings = load_settings({**os.environ, **values})
+    os.environ.update(values)
+    _settings[:] = [settings]
+    logger.info("Loaded settings from environment")
+
+    return settings
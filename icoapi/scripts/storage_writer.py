@@ -0,0 +1,252 @@
+"""Write measurement data to the HDF5 file from a background thread"""
+
+import asyncio
+from datetime import datetime
+import logging
+import queue
+import threading
+import time
+
+from icotronic.measurement import StorageData
+import numpy as np
+import tables
+
+from icoapi.models.models import StorageLayout, StorageWriterStatus
+from icoapi.scripts.conversion import ConvertedBlock
+from icoapi.scripts.measurement_file import record_storage_layout
+from icoapi.scripts.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def get_writer_queue_size() -> int:
+    """Get the maximum number of blocks waiting to be written to storage"""
+
+    return get_settings().storage_writer_queue_size
+
+
+def get_storage_layout(layout: StorageLayout | None = None) -> StorageLayout:
+    """
+    Get the layout for a new measurement file.
+
+    Values that are not set in ``layout`` are taken from the environment
+    variables ``STORAGE_CHUNK_ROWS``, ``STORAGE_COMPRESSION`` and
+    ``STORAGE_COMPRESSION_LEVEL``.
+    """
+
+    layout = layout or StorageLayout()
+    settings = get_settings()
+
+    return StorageLayout(
+        settings.storage_chunk_rows if layout.chunk_rows is None else layout.chunk_rows,
+        layout.compression or settings.storage_compression,
+        (
+            settings.storage_compression_level
+            if layout.compression_level is None
+            else layout.compression_level
+        ),
+    )
+
+
+def validate_storage_layout(layout: StorageLayout) -> list[str]:
+    """Check the values of a storage layout"""
+
+    errors = []
+    if layout.chunk_rows is not None and layout.chunk_rows < 1:
+        errors.append("chunk_rows: expected positive integer")
+    if layout.compression is not None and layout.compression not in tables.filters.all_complibs:
+        errors.append("compression: expected one of " + ", ".join(tables.filters.all_complibs))
+    if layout.compression_level is not None and not 0 <= layout.compression_level <= 9:
+        errors.append("compression_level: expected integer between 0 and 9")
+
+    return errors
+
+
+def apply_storage_layout(
+    storage: StorageData, layout: StorageLayout, expected_rows: int | None = None
+) -> None:
+    """
+    Recreate the (still empty) acceleration table with the given layout.
+
+    Without compression library the table keeps the compression of the
+    table created by ``Storage`` (zlib, level 4). The used chunk size and
+    compression are stored as attributes of the table, so readers can choose
+    matching access patterns.
+    """
+
+    table = storage.acceleration
+    if table.nrows > 0:
+        raise ValueError("The layout can only be changed before data is stored")
+
+    filters = (
+        tables.Filters(
+            complevel=layout.compression_level or 0,
+            complib=layout.compression,
+            shuffle=True,
+        )
+        if layout.compression
+        else table.filters
+    )
+    columns = dict(table.coldescrs)
+    title = table.title
+    table.remove()
+    storage.acceleration = storage.hdf.create_table(
+        storage.hdf.root,
+        name="acceleration",
+        description=columns,
+        title=title,
+        filters=filters,
+        expectedrows=expected_rows or 10_000,
+        chunkshape=(layout.chunk_rows,) if layout.chunk_rows else None,
+    )
+
+    record_storage_layout(storage.acceleration)
+    logger.info(
+        "Created acceleration table with %s rows per chunk and compression %s (level %s)",
+        storage["chunk_rows"],
+        storage["compression"],
+        storage["compression_level"],
+    )
+
+
+# pylint: disable=too-many-instance-attributes
+
+
+class StorageWriter:
+    """
+    Append converted measurement blocks to the acceleration table.
+
+    The blocks are passed to a dedicated thread through a bounded queue and
+    appended with one ``Table.append`` call per block. The rows are the same
+    as the ones created by ``StorageData.add_streaming_data``. While the
+    writer is running no other code must access the HDF5 file.
+    """
+
+    def __init__(self, storage: StorageData, queue_size: int | None = None) -> None:
+        self.storage = storage
+        self.queue_size = get_writer_queue_size() if queue_size is None else queue_size
+        self.queue: queue.Queue[tuple[ConvertedBlock, str] | None] = queue.Queue(self.queue_size)
+        self.thread = threading.Thread(target=self.run, name="storage-writer", daemon=True)
+        self.error: Exception | None = None
+        self.start_time: str | None = None
+        self.max_queue_depth = 0
+        self.blocks = 0
+        self.rows = 0
+        self.last_write_latency = 0.0
+        self.max_write_latency = 0.0
+        self.total_write_latency = 0.0
+
+    def start(self) -> None:
+        """Start the writer thread"""
+
+        self.thread.start()
+        logger.debug("Started storage writer with queue size %s", self.queue_size)
+
+    async def put(self, block: ConvertedBlock) -> None:
+        """
+        Queue a block for writing.
+
+        If the queue is full, wait (without blocking the event loop) until the
+        writer thread caught up.
+        """
+
+        if len(block) == 0:
+            return
+        if self.start_time is None:
+            self.start_time = datetime.now().isoformat()
+
+        try:
+            self.queue.put_nowait((block, self.start_time))
+        except queue.Full:
+            logger.warning("Storage writer queue is full - waiting for disk")
+            await asyncio.to_thread(self.queue.put, (block, self.start_time))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    async def drain(self) -> None:
+        """
+        Write all queued blocks and stop the writer thread.
+
+        :raises: Exception that occurred while writing data
+        """
+
+        if self.thread.is_alive():
+            await asyncio.to_thread(self.queue.put, None)
+            await asyncio.to_thread(self.thread.join)
+        logger.info(
+            "Stored %s rows in %s blocks (max. queue depth %s, max. write latency %.1f ms)",
+            self.rows,
+            self.blocks,
+            self.max_queue_depth,
+            self.max_write_latency * 1000,
+        )
+        if self.error is not None:
+            raise self.error
+
+    def run(self) -> None:
+        """Write queued blocks until the writer is drained"""
+
+        while (item := self.queue.get()) is not None:
+            if self.error is not None:
+                continue
+            block, start_time = item
+            started = time.perf_counter()
+            try:
+                self.write_block(block, start_time)
+            except Exception as error:  # pylint: disable=broad-exception-caught
+                logger.error("Unable to write measurement data: %s", error)
+                self.error = error
+                continue
+            latency = time.perf_counter() - started
+            self.blocks += 1
+            self.last_write_latency = latency
+            self.max_write_latency = max(self.max_write_latency, latency)
+            self.total_write_latency += latency
+
+        if self.error is None:
+            self.storage.acceleration.flush()
+
+    def write_block(self, block: ConvertedBlock, start_time: str) -> None:
+        """Append a block to the acceleration table"""
+
+        table = self.storage.acceleration
+        if self.storage.start_time is None:
+            self.storage.start_time = float(block.timestamp[0])
+            table.attrs["Start_Time"] = start_time
+        assert isinstance(self.storage.start_time, float)
+
+        timestamps = (block.timestamp - self.storage.start_time) * 1_000_000
+        axes = self.storage.axes
+        if len(axes) == 1:
+            # Every message contains multiple samples of the same channel,
+            # which are stored as separate rows with the same timestamp
+            samples = block.values.shape[1]
+            rows = np.empty(len(block) * samples, dtype=table.dtype)
+            rows["timestamp"] = np.repeat(timestamps, samples)
+            rows["counter"] = np.repeat(block.counter, samples)
+            rows[axes[0]] = block.values.ravel()
+        else:
+            rows = np.empty(len(block), dtype=table.dtype)
+            rows["timestamp"] = timestamps
+            rows["counter"] = block.counter
+            for column, axis in enumerate(axes):
+                rows[axis] = block.values[:, column]
+
+        table.append(rows)
+        self.rows += len(rows)
+
+    def get_status(self) -> StorageWriterStatus:
+        """Get queue and latency metrics of the writer"""
+
+        return StorageWriterStatus(
+            queue_depth=self.queue.qsize(),
+            queue_size=self.queue_size,
+            max_queue_depth=self.max_queue_depth,
+            blocks=self.blocks,
+            rows=self.rows,
+            last_write_latency=self.last_write_latency,
+            max_write_latency=self.max_write_latency,
+            mean_write_latency=self.total_write_latency / self.blocks if self.blocks else 0.0,
+        )
+
+
+# pylint: enable=too-many-instance-attributes
@@ -0,0 +1,95 @@
+"""Binary frame format for the measurement stream (see README for the layout)"""
+
+from enum import IntEnum, unique
+import struct
+
+import numpy as np
+from starlette.websockets import WebSocket
+
+from icoapi.models.models import StreamFormat
+from icoapi.scripts.conversion import CHANNEL_NAMES, ConvertedBlock
+
+FRAME_MAGIC = b"ICOF"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<4sBBBBId")
+
+BINARY_SUBPROTOCOL = "icoapi.binary.v1"
+
+
+@unique
+class FrameType(IntEnum):
+    """Type of binary measurement stream frame"""
+
+    DATA = 1
+    IFT = 2
+    DATALOSS = 3
+
+
+def pack_header(frame_type: FrameType, channel_mask: int, count: int, base: float) -> bytes:
+    """Create binary frame header"""
+
+    return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, frame_type, channel_mask, 0, count, base)
+
+
+def encode_data_frame(block: ConvertedBlock) -> bytes:
+    """Encode converted measurement data as binary frame"""
+
+    base = float(block.timestamp[0]) if len(block) > 0 else 0.0
+    channel_mask = 0
+    columns = [(block.timestamp - base).astype("<f4").tobytes()]
+    for bit, channel in enumerate(CHANNEL_NAMES):
+        values = block.channel_values(channel)
+        if values is not None:
+            channel_mask |= 1 << bit
+            columns.append(values.astype("<f4").tobytes())
+    columns.append(block.counter.astype(np.uint8).tobytes())
+
+    return pack_header(FrameType.DATA, channel_mask, len(block), base) + b"".join(columns)
+
+
+def encode_ift_frame(timestamps: np.ndarray, ift_values: np.ndarray) -> bytes:
+    """Encode IFT values as binary frame"""
+
+    if len(timestamps) != len(ift_values):
+        raise ValueError("Both arrays must have the same length")
+
+    timestamp_array = np.asarray(timestamps, dtype=np.float64)
+    base = float(timestamp_array[0]) if len(timestamp_array) > 0 else 0.0
+
+    return b"".join((
+        pack_header(FrameType.IFT, 0, len(timestamp_array), base),
+        (timestamp_array - base).astype("<f4").tobytes(),
+        np.asarray(ift_values, dtype="<f4").tobytes(),
+    ))
+
+
+def encode_dataloss_frame(dataloss: float) -> bytes:
+    """Encode data loss as binary frame"""
+
+    return pack_header(FrameType.DATALOSS, 0, 1, 0.0) + struct.pack("<f", dataloss)
+
+
+def negotiate_stream_format(websocket: WebSocket, requested: StreamFormat) -> str | None:
+    """
+    Determine the stream format of a measurement client.
+
+    Clients can request the binary format either with the query parameter
+    ``format=binary`` or with the WebSocket subprotocol ``icoapi.binary.v1``.
+    The chosen format is stored in the state of the WebSocket connection.
+
+    :return: Subprotocol that should be used to accept the connection
+    """
+
+    subprotocol = None
+    if BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        subprotocol = BINARY_SUBPROTOCOL
+        requested = StreamFormat.BINARY
+
+    websocket.state.stream_format = requested
+    return subprotocol
+
+
+def get_stream_format(websocket: WebSocket) -> StreamFormat:
+    """Get the negotiated stream format of a measurement client"""
+
+    return getattr(websocket.state, "stream_format", StreamFormat.JSON)
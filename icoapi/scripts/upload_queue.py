@@ -0,0 +1,478 @@
+"""Persistent queue of cloud uploads"""
+
+import asyncio
+from contextlib import closing, contextmanager
+from datetime import datetime
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Iterator
+from uuid import uuid4
+
+import tables
+
+from icoapi.models.globals import TridentHandler, get_messenger, get_trident_client
+from icoapi.models.models import UploadJob, UploadJobState
+from icoapi.models.trident import StorageClient
+from icoapi.scripts.bucket_cache import get_bucket_cache
+from icoapi.scripts.disk_sampler import get_disk_sampler
+from icoapi.scripts.file_handling import get_application_dir
+from icoapi.scripts.file_index import get_file_index
+from icoapi.scripts.measurement_file import MeasurementFileError, repack
+from icoapi.scripts.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    state TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    uploaded INTEGER NOT NULL DEFAULT 0,
+    part_size INTEGER,
+    upload_id TEXT,
+    parts TEXT NOT NULL DEFAULT '[]',
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+POLL_INTERVAL = 5  # Seconds between checks for jobs without notification
+PROGRESS_INTERVAL = 0.5  # Minimum seconds between progress messages of a job
+PART_ATTEMPTS = 3  # Attempts per part of a multipart upload
+FINISHED_STATES = (UploadJobState.COMPLETED, UploadJobState.FAILED, UploadJobState.CANCELLED)
+
+
+def get_upload_concurrency() -> int:
+    """Get the maximum number of concurrent uploads"""
+
+    return get_settings().upload_concurrency
+
+
+def get_part_size() -> int | None:
+    """
+    Get the part size in bytes for multipart uploads.
+
+    :return: The part size or ``None`` if multipart uploads are disabled
+    """
+
+    settings = get_settings()
+
+    # S3 requires at least 5 MiB for all parts except the last one
+    return settings.upload_part_size if settings.upload_multipart else None
+
+
+class UploadCancelledError(Exception):
+    """Error raised in an upload thread if its job was cancelled"""
+
+
+class UploadInterruptedError(Exception):
+    """Error raised in an upload thread if the queue stops"""
+
+
+def row_to_job(row: sqlite3.Row) -> UploadJob:
+    """Convert a database row to an upload job"""
+
+    return UploadJob(
+        id=row["id"],
+        filename=row["filename"],
+        bucket=row["bucket"],
+        key=row["key"],
+        state=UploadJobState(row["state"]),
+        size=row["size"],
+        uploaded=row["uploaded"],
+        multipart=row["part_size"] is not None,
+        created=datetime.fromtimestamp(row["created"]).isoformat(),
+        updated=datetime.fromtimestamp(row["updated"]).isoformat(),
+        error=row["error"],
+    )
+
+
+def upload_part(
+    client: StorageClient, row: sqlite3.Row, upload_id: str, number: int, data: bytes
+) -> str:
+    """Upload a single part of a job, retrying after failures"""
+
+    for attempt in range(1, PART_ATTEMPTS):
+        try:
+            return client.upload_part(row["key"], upload_id, number, data, row["bucket"])
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("Upload of part %s failed, retrying: %s", number, e)
+            time.sleep(attempt)
+
+    return client.upload_part(row["key"], upload_id, number, data, row["bucket"])
+
+
+# pylint: disable=too-many-instance-attributes
+
+
+class UploadQueue:
+    """
+    Upload measurement files to the cloud in the background.
+
+    Jobs are stored in a SQLite database, so queued and interrupted uploads
+    continue after a restart. Up to ``UPLOAD_CONCURRENCY`` jobs run at the
+    same time, each in the thread pool of the storage client. Large files
+    can optionally be uploaded in parts; the uploaded parts are recorded, so
+    an interrupted multipart upload only repeats the current part.
+
+    The database is shared with the upload threads, so coroutines only access
+    it from a separate thread and never wait for its lock on the event loop.
+    """
+
+    def __init__(self, database_path: str, concurrency: int | None = None) -> None:
+        self.database_path = database_path
+        self.concurrency = get_upload_concurrency() if concurrency is None else concurrency
+        self.lock = threading.Lock()
+        self.wakeup = asyncio.Event()
+        self.workers: list[asyncio.Task] = []
+        self.cancelled: set[str] = set()
+        self.stopping = False
+        with self.transaction() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection and commit all changes at the end (if successful)"""
+
+        with self.lock, closing(sqlite3.connect(self.database_path)) as connection:
+            connection.row_factory = sqlite3.Row
+            with connection:
+                yield connection
+
+    def update(self, job_id: str, **values: Any) -> None:
+        """Change columns of a job"""
+
+        values["updated"] = time.time()
+        columns = ", ".join(f"{column} = ?" for column in values)
+        with self.transaction() as connection:
+            connection.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ?", (*values.values(), job_id)
+            )
+
+    def get_row(self, job_id: str) -> sqlite3.Row | None:
+        """Get the database row of a job"""
+
+        with self.transaction() as connection:
+            return connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def get_job(self, job_id: str) -> UploadJob | None:
+        """Get a single job"""
+
+        row = self.get_row(job_id)
+        return None if row is None else row_to_job(row)
+
+    def list_jobs(self) -> list[UploadJob]:
+        """Get all jobs, newest first"""
+
+        with self.transaction() as connection:
+            rows = connection.execute("SELECT * FROM jobs ORDER BY created DESC").fetchall()
+
+        return [row_to_job(row) for row in rows]
+
+    def add(self, path: str, bucket: str, key: str) -> UploadJob:
+        """Add a job for the upload of a file"""
+
+        size = os.path.getsize(path)
+        part_size = get_part_size()
+        now = time.time()
+        job_id = uuid4().hex
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, path, filename, bucket, key, state, size, part_size,"
+                " created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    path,
+                    os.path.basename(path),
+                    bucket,
+                    key,
+                    UploadJobState.QUEUED,
+                    size,
+                    part_size if part_size is not None and size > part_size else None,
+                    now,
+                    now,
+                ),
+            )
+        logger.info("Queued upload of <%s> as <%s>", path, key)
+
+        job = self.get_job(job_id)
+        assert job is not None
+        return job
+
+    def claim(self) -> sqlite3.Row | None:
+        """Mark the oldest queued job as running and return it"""
+
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE state = ? ORDER BY created LIMIT 1",
+                (UploadJobState.QUEUED,),
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET state = ?, error = NULL, updated = ? WHERE id = ?",
+                (UploadJobState.RUNNING, time.time(), row["id"]),
+            )
+
+        return row
+
+    def cancel(self, job_id: str) -> UploadJob | None:
+        """
+        Cancel a queued or running job.
+
+        Running jobs stop at the next chunk of data they send.
+
+        :return: The job or ``None`` if there is no job with the given ID
+        """
+
+        row = self.get_row(job_id)
+        if row is None:
+            return None
+
+        if row["state"] == UploadJobState.QUEUED:
+            self.update(job_id, state=UploadJobState.CANCELLED)
+        elif row["state"] == UploadJobState.RUNNING:
+            self.cancelled.add(job_id)
+
+        return self.get_job(job_id)
+
+    def check(self, job_id: str) -> None:
+        """Stop the upload thread of a job if it should not continue"""
+
+        if job_id in self.cancelled:
+            raise UploadCancelledError(job_id)
+        if self.stopping:
+            raise UploadInterruptedError(job_id)
+
+    async def start(self) -> None:
+        """Resume interrupted jobs and start the upload workers"""
+
+        self.stopping = False
+        resumed = await asyncio.to_thread(self.resume)
+        if resumed:
+            logger.info("Resuming %s interrupted upload(s)", resumed)
+
+        self.workers = [asyncio.create_task(self.work()) for _ in range(self.concurrency)]
+
+    def resume(self) -> int:
+        """
+        Queue the jobs that were running when the queue stopped.
+
+        :return: Number of resumed jobs
+        """
+
+        with self.transaction() as connection:
+            return connection.execute(
+                "UPDATE jobs SET state = ? WHERE state = ?",
+                (UploadJobState.QUEUED, UploadJobState.RUNNING),
+            ).rowcount
+
+    async def stop(self) -> None:
+        """Stop the upload workers; running jobs are resumed on the next start"""
+
+        self.stopping = True
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def notify(self) -> None:
+        """Wake up the workers to check for new jobs"""
+
+        self.wakeup.set()
+
+    async def send_progress(self, job_id: str) -> None:
+        """Send the current state of a job to the state WebSocket clients"""
+
+        job = await asyncio.to_thread(self.get_job, job_id)
+        if job is not None:
+            await get_messenger().send_upload_progress(job)
+
+    async def work(self) -> None:
+        """Run queued jobs one after another"""
+
+        while True:
+            client = await get_trident_client()
+            row = await asyncio.to_thread(self.claim) if client is not None else None
+            if client is None or row is None:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                continue
+
+            await self.run(client, row)
+
+    async def run(self, client: StorageClient, row: sqlite3.Row) -> None:
+        """Upload the file of a single job"""
+
+        job_id = row["id"]
+        await self.send_progress(job_id)
+        loop = asyncio.get_running_loop()
+        try:
+            await client.run(self.execute, client, row, loop)
+            await asyncio.to_thread(
+                self.update, job_id, state=UploadJobState.COMPLETED, uploaded=row["size"]
+            )
+            get_bucket_cache().invalidate(row["bucket"])
+            logger.info("Successfully uploaded file <%s>", row["filename"])
+        except UploadInterruptedError:
+            logger.info("Interrupted upload of <%s>", row["filename"])
+            return
+        except UploadCancelledError:
+            await client.run(self.abort, client, job_id)
+            await asyncio.to_thread(self.update, job_id, state=UploadJobState.CANCELLED)
+            logger.info("Cancelled upload of <%s>", row["filename"])
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            await asyncio.to_thread(
+                self.update, job_id, state=UploadJobState.FAILED, error=str(e) or type(e).__name__
+            )
+            logger.error("Upload of <%s> failed: %s", row["filename"], e)
+        finally:
+            self.cancelled.discard(job_id)
+
+        await self.send_progress(job_id)
+
+    def abort(self, client: StorageClient, job_id: str) -> None:
+        """Remove the uploaded parts of a cancelled multipart upload (runs in a worker thread)"""
+
+        row = self.get_row(job_id)
+        if row is None or row["upload_id"] is None:
+            return
+        try:
+            client.abort_multipart_upload(row["key"], row["upload_id"], row["bucket"])
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning("Could not abort multipart upload of <%s>: %s", row["filename"], e)
+
+    def execute(
+        self, client: StorageClient, row: sqlite3.Row, loop: asyncio.AbstractEventLoop
+    ) -> None:
+        """Upload the file of a job (runs in a worker thread)"""
+
+        job_id = row["id"]
+        last_progress = 0.0
+
+        def progress(uploaded: int, force: bool = False) -> None:
+            nonlocal last_progress
+            self.check(job_id)
+            now = time.monotonic()
+            if force or now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                self.update(job_id, uploaded=uploaded)
+                asyncio.run_coroutine_threadsafe(self.send_progress(job_id), loop)
+
+        if os.path.getsize(row["path"]) != row["size"]:
+            raise ValueError(f"File <{row['filename']}> changed after the upload was queued")
+
+        if row["part_size"] is None:
+            response = client.upload_object(row["path"], row["key"], row["bucket"], progress)
+            response.raise_for_status()
+        else:
+            self.upload_parts(client, row, progress)
+
+    def upload_parts(
+        self, client: StorageClient, row: sqlite3.Row, progress: Callable[..., None]
+    ) -> None:
+        """Upload the missing parts of a multipart upload and combine them"""
+
+        job_id = row["id"]
+        upload_id = row["upload_id"]
+        if upload_id is None:
+            upload_id = client.create_multipart_upload(row["key"], row["bucket"])
+            self.update(job_id, upload_id=upload_id)
+
+        parts: list[dict[str, Any]] = json.loads(row["parts"])
+        done = {part["PartNumber"] for part in parts}
+        part_size = row["part_size"]
+        uploaded = sum(min(part_size, row["size"] - (number - 1) * part_size) for number in done)
+        with open(row["path"], "rb") as file:
+            for number in range(1, math.ceil(row["size"] / part_size) + 1):
+                self.check(job_id)
+                if number in done:
+                    continue
+                file.seek((number - 1) * part_size)
+                data = file.read(part_size)
+                etag = upload_part(client, row, upload_id, number, data)
+                parts.append({"PartNumber": number, "ETag": etag})
+                uploaded += len(data)
+                self.update(job_id, parts=json.dumps(parts), uploaded=uploaded)
+                progress(uploaded, force=True)
+
+        parts.sort(key=lambda part: part["PartNumber"])
+        client.complete_multipart_upload(row["key"], upload_id, parts, row["bucket"])
+
+
+# pylint: enable=too-many-instance-attributes
+
+_queues: dict[str, UploadQueue] = {}
+
+
+def get_upload_queue() -> UploadQueue:
+    """Get the upload queue of the application directory"""
+
+    database_path = os.path.join(get_application_dir(), "upload_queue.sqlite")
+    if database_path not in _queues:
+        os.makedirs(os.path.dirname(database_path), exist_ok=True)
+        _queues[database_path] = UploadQueue(database_path)
+
+    return _queues[database_path]
+
+
+async def queue_upload(client: StorageClient, file_path: str) -> UploadJob:
+    """Add a job for the upload of a measurement file and start it"""
+
+    queue = get_upload_queue()
+    key = client.get_object_key(os.path.basename(file_path))
+    job = await asyncio.to_thread(queue.add, file_path, client.default_bucket, key)
+    queue.notify()
+    await get_messenger().send_upload_progress(job)
+    return job
+
+
+async def process_measurement_file(file_path: str) -> None:
+    """
+    Compress and upload a finished measurement file.
+
+    Both steps are configured in the ``upload`` section of the dataspace
+    configuration. If the compression fails, the original file is uploaded.
+    """
+
+    config = TridentHandler.config
+    client = await get_trident_client()
+    if config is None or client is None or not config.auto_upload:
+        return
+
+    if config.compression is not None:
+        try:
+            await asyncio.to_thread(
+                repack, file_path, config.compression, config.compression_level
+            )
+        except (MeasurementFileError, tables.exceptions.HDF5ExtError, OSError) as error:
+            logger.warning("Unable to compress %s: %s", file_path, error)
+        directory, name = os.path.split(file_path)
+        await asyncio.to_thread(get_file_index().update, directory, name)
+        get_disk_sampler().sample()
+
+    await queue_upload(client, file_path)
+
+
+_pipeline_tasks: set[asyncio.Task] = set()
+
+
+def schedule_measurement_processing(file_path: str) -> None:
+    """Process a finished measurement file in the background"""
+
+    task = asyncio.create_task(process_measurement_file(file_path))
+    _pipeline_tasks.add(task)
+    task.add_done_callback(_pipeline_tasks.discard)
@@ -15,27 +15,28 @@ from fastapi import WebSocket
 from platformdirs import user_data_dir
 
 from icoapi.scripts.file_handling import load_env_file
+from icoapi.scripts.settings import get_settings
 
 log_watchers: List[WebSocket] = []
 log_queue: asyncio.Queue[str] = asyncio.Queue()
 
 load_env_file()
 
-log_level = os.getenv("LOG_LEVEL")
-LOG_LEVEL = "" if log_level is None else log_level.upper()
-LOG_USE_JSON = os.getenv("LOG_USE_JSON", "0") == "1"
-LOG_USE_COLOR = os.getenv("LOG_USE_COLOR", "0") == "1"
-LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))
-LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
-LOG_NAME_WITHOUT_EXTENSION = os.getenv("LOG_NAME_WITHOUT_EXTENSION", "icodaq")
-LOG_NAME = f"{LOG_NAME_WITHOUT_EXTENSION}.log"
-LOG_LEVEL_UVICORN = os.getenv("LOG_LEVEL_UVICORN", "INFO")
+# Log handlers are set up once, so the logging settings are only read at startup
+settings = get_settings()
+LOG_LEVEL = settings.log_level
+LOG_USE_JSON = settings.log_use_json
+LOG_USE_COLOR = settings.log_use_color
+LOG_MAX_BYTES = settings.log_max_bytes
+LOG_BACKUP_COUNT = settings.log_backup_count
+LOG_NAME = settings.log_name
+LOG_LEVEL_UVICORN = settings.log_level_uvicorn
 
 
 def get_default_log_path() -> str:
     """Get default log path"""
 
-    app_folder = os.getenv("VITE_BACKEND_MEASUREMENT_DIR", "ICOdaq")
+    app_folder = settings.log_folder
     file_name = "icodaq.log"
     base = user_data_dir(app_folder, appauthor=False)
     log_dir = os.path.join(base, "logs")
@@ -43,7 +44,7 @@ def get_default_log_path() -> str:
     return os.path.join(log_dir, file_name)
 
 
-LOG_PATH = os.getenv("LOG_PATH", get_default_log_path())
+LOG_PATH = settings.log_path or get_default_log_path()
 
 
 class JSONFormatter(logging.Formatter):
@@ -0,0 +1,105 @@
+"""Tests for the distribution of measurement data to stream clients"""
+
+# -- Imports ------------------------------------------------------------------
+
+import asyncio
+from types import SimpleNamespace
+
+from icoapi.models.models import LagPolicy, StreamFormat
+from icoapi.scripts.broadcast import MeasurementBroadcaster
+
+# -- Classes ------------------------------------------------------------------
+
+
+class FakeWebSocket:
+    """WebSocket that records sent messages or fails to send them"""
+
+    def __init__(self, fail: bool = False, stream_format=StreamFormat.JSON) -> None:
+        self.client = SimpleNamespace(host="test", port=0)
+        self.state = SimpleNamespace(stream_format=stream_format)
+        self.fail = fail
+        self.messages: list[str | bytes] = []
+
+    async def send_text(self, payload: str) -> None:
+        """Send a text message"""
+
+        if self.fail:
+            raise RuntimeError("WebSocket is not connected")
+        self.messages.append(payload)
+
+    async def send_bytes(self, payload: bytes) -> None:
+        """Send a binary message"""
+
+        await self.send_text(payload)  # type: ignore[arg-type]
+
+    async def close(self, code: int = 1000) -> None:  # pylint: disable=unused-argument
+        """Close the connection"""
+
+
+class TestMeasurementBroadcaster:
+    """Measurement broadcaster test methods"""
+
+    async def test_publish_prunes_dead_clients(self) -> None:
+        """Test that clients with a failed socket are removed on the next block"""
+
+        broadcaster = MeasurementBroadcaster(queue_size=10, lag_policy=LagPolicy.DROP_OLDEST)
+        alive = FakeWebSocket()
+        dead = FakeWebSocket(fail=True)
+        broadcaster.add(alive)  # type: ignore[arg-type]
+        broadcaster.add(dead)  # type: ignore[arg-type]
+
+        serialized = []
+
+        def get_json() -> list[int]:
+            serialized.append(1)
+            return [1]
+
+        broadcaster.publish(get_json)
+        await asyncio.sleep(0.01)
+        assert len(broadcaster) == 2
+
+        broadcaster.publish(get_json)
+        await asyncio.sleep(0.01)
+
+        assert len(broadcaster) == 1
+        assert broadcaster.clients[0].websocket is alive
+        assert alive.messages == ["[1]", "[1]"]
+        assert len(serialized) == 2
+
+        await broadcaster.close(timeout=1)
+
+    async def test_publish_serializes_once(self) -> None:
+        """Test that every payload is created once per stream format"""
+
+        broadcaster = MeasurementBroadcaster(queue_size=10, lag_policy=LagPolicy.DROP_OLDEST)
+        clients = [
+            FakeWebSocket(),
+            FakeWebSocket(),
+            FakeWebSocket(stream_format=StreamFormat.BINARY),
+            FakeWebSocket(stream_format=StreamFormat.BINARY),
+        ]
+        for client in clients:
+            broadcaster.add(client)  # type: ignore[arg-type]
+
+        created: list[str] = []
+
+        def get_json() -> dict[str, int]:
+            created.append("json")
+            return {"value": 1}
+
+        def get_binary() -> bytes:
+            created.append("binary")
+            return b"\x01"
+
+        broadcaster.publish(get_json, get_binary)
+        # Without binary payload all clients receive JSON
+        broadcaster.publish(get_json)
+        await asyncio.sleep(0.01)
+
+        assert sorted(created) == ["binary", "json", "json"]
+        for client in clients[:2]:
+            assert client.messages == ['{"value":1}', '{"value":1}']
+        for client in clients[2:]:
+            assert client.messages == [b"\x01", '{"value":1}']
+
+        await broadcaster.close(timeout=1)
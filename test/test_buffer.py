@@ -0,0 +1,58 @@
+"""Tests for the growable measurement buffer"""
+
+# -- Imports ------------------------------------------------------------------
+
+import numpy as np
+
+from icoapi.scripts.buffer import Float64Buffer
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestFloat64Buffer:
+    """Float64 buffer test methods"""
+
+    def test_append(self) -> None:
+        """Test adding single values beyond the initial capacity"""
+
+        buffer = Float64Buffer(chunk_size=4)
+        for value in range(10):
+            buffer.append(value)
+
+        assert len(buffer) == 10
+        assert buffer[0] == 0
+        assert buffer[-1] == 9
+        assert buffer.view().tolist() == list(range(10))
+        assert buffer.view().dtype == np.float64
+
+    def test_extend(self) -> None:
+        """Test adding multiple values"""
+
+        buffer = Float64Buffer(chunk_size=4)
+        buffer.extend(np.arange(3))
+        buffer.extend(np.arange(3, 100))
+        buffer.extend(np.array([]))
+
+        assert buffer.view().tolist() == list(range(100))
+
+    def test_discard(self) -> None:
+        """Test using the buffer as sliding window"""
+
+        buffer = Float64Buffer(chunk_size=8)
+        expected: list[float] = []
+        for value in range(1000):
+            buffer.append(value)
+            expected.append(value)
+            if len(buffer) > 5:
+                buffer.discard(1)
+                expected.pop(0)
+
+            assert buffer.view().tolist() == expected
+
+        # Moving the values to the start keeps the capacity small
+        assert len(buffer.data) <= 16
+
+        buffer.discard(100)
+        assert len(buffer) == 0
+        buffer.discard(-1)
+        assert len(buffer) == 0
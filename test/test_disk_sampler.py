@@ -0,0 +1,98 @@
+"""Tests for the sampled disk capacity"""
+
+# -- Imports ------------------------------------------------------------------
+
+from collections import namedtuple
+from types import SimpleNamespace
+
+from pytest import fixture
+
+from icoapi.models.models import DiskCapacity
+from icoapi.scripts.disk_sampler import DiskSampler
+
+# -- Fixtures -----------------------------------------------------------------
+
+# pylint: disable=redefined-outer-name
+
+Usage = namedtuple("Usage", ["total", "used", "free"])
+GIB = 2**30
+
+
+@fixture
+def disk(monkeypatch, tmp_path):
+    """Simulated disk usage and clock"""
+
+    disk = SimpleNamespace(free=50 * GIB, time=100.0)
+    monkeypatch.setattr(
+        "icoapi.scripts.disk_sampler.shutil",
+        SimpleNamespace(disk_usage=lambda _: Usage(100 * GIB, 100 * GIB - disk.free, disk.free)),
+    )
+    monkeypatch.setattr(
+        "icoapi.scripts.disk_sampler.time", SimpleNamespace(monotonic=lambda: disk.time)
+    )
+    monkeypatch.setattr(DiskSampler, "get_path", staticmethod(lambda: str(tmp_path)))
+
+    return disk
+
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestDiskSampler:
+    """Disk sampler test methods"""
+
+    def test_get_capacity(self, disk) -> None:
+        """Test that the capacity is only sampled once per interval"""
+
+        sampler = DiskSampler(interval=5)
+
+        assert sampler.get_capacity() == DiskCapacity(100.0, 50.0)
+
+        disk.free = 40 * GIB
+        disk.time += 1
+        assert sampler.get_capacity().available == 50.0
+        disk.time += 5
+        assert sampler.get_capacity().available == 40.0
+
+    def test_on_change(self, disk) -> None:
+        """Test that changes of the capacity are reported"""
+
+        sampler = DiskSampler(interval=5)
+        changes: list[DiskCapacity] = []
+        sampler.on_change = lambda: changes.append(sampler.capacity)
+
+        sampler.sample()
+        sampler.sample()
+        assert changes == [DiskCapacity(100.0, 50.0)]
+
+        disk.free = 49 * GIB
+        sampler.sample()
+        assert changes == [DiskCapacity(100.0, 50.0), DiskCapacity(100.0, 49.0)]
+
+    def test_recording_time_remaining(self, disk, tmp_path) -> None:
+        """Test the projection of the remaining recording time"""
+
+        sampler = DiskSampler(interval=5)
+        measurement = tmp_path / "measurement.hdf5"
+        measurement.write_bytes(b"x" * 1000)
+
+        # No projection without recording
+        assert sampler.get_recording_time_remaining(disk.free) is None
+
+        sampler.start_recording(measurement)
+        # No projection before the file grows
+        disk.time += 10
+        assert sampler.get_recording_time_remaining(disk.free) is None
+
+        # 1 MiB per second
+        with open(measurement, "ab") as file:
+            file.write(b"x" * (10 * 2**20))
+        assert sampler.get_recording_time_remaining(disk.free) == 50 * 1024
+        assert sampler.sample().recording_time_remaining == 50 * 1024
+
+        measurement.unlink()
+        assert sampler.get_recording_time_remaining(disk.free) is None
+
+        sampler.stop_recording()
+        assert sampler.recording is None
+        assert sampler.capacity.recording_time_remaining is None
@@ -0,0 +1,90 @@
+"""Tests for downsampling of measurement data"""
+
+# -- Imports ------------------------------------------------------------------
+
+import numpy as np
+
+from icoapi.models.models import DownsamplingMode
+from icoapi.scripts.downsampling import downsample, lttb_indices, minmax_indices
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestDownsampling:
+    """Downsampling test methods"""
+
+    def test_minmax_indices(self) -> None:
+        """Test selection of bucket minima and maxima"""
+
+        values = np.sin(np.arange(10_000) / 50)
+        indices = minmax_indices(values, 100)
+
+        assert len(indices) <= 100
+        assert np.all(np.diff(indices) > 0)
+        assert values[indices].max() == values.max()
+        assert values[indices].min() == values.min()
+
+        # Short input is returned unchanged
+        assert minmax_indices(values[:10], 100).tolist() == list(range(10))
+
+        # Spikes are always kept
+        spiky = np.zeros(10_000)
+        spiky[1234] = 10
+        spiky[8765] = -10
+        indices = minmax_indices(spiky, 20)
+        assert 1234 in indices
+        assert 8765 in indices
+
+    def test_minmax_indices_nan(self) -> None:
+        """Test that missing values do not break the selection"""
+
+        values = np.arange(1000, dtype=np.float64)
+        values[:200] = np.nan
+        indices = minmax_indices(values, 20)
+
+        assert 999 in indices
+        assert 200 in indices
+
+    def test_lttb_indices(self) -> None:
+        """Test Largest-Triangle-Three-Buckets selection"""
+
+        x = np.arange(10_000, dtype=np.float64)
+        y = np.sin(x / 50)
+        indices = lttb_indices(x, y, 100)
+
+        assert len(indices) == 100
+        assert indices[0] == 0
+        assert indices[-1] == len(y) - 1
+        assert np.all(np.diff(indices) > 0)
+
+        # Short input is returned unchanged
+        assert lttb_indices(x[:10], y[:10], 100).tolist() == list(range(10))
+        # Too few points keep only the first and the last value
+        assert lttb_indices(x, y, 2).tolist() == [0, len(y) - 1]
+
+    def test_downsample(self) -> None:
+        """Test shared indices of multiple channels"""
+
+        length = 10_000
+        timestamps = np.arange(length, dtype=np.uint64) * 100
+        first = np.zeros(length)
+        first[1000] = 1
+        second = np.zeros(length)
+        second[9000] = -1
+
+        for mode in DownsamplingMode:
+            indices = downsample(timestamps, [first, second], 100, mode)
+
+            assert indices[0] == 0
+            assert indices[-1] == length - 1
+            assert np.all(np.diff(indices) > 0)
+            assert len(indices) <= 2 * 100 + 2
+            assert 1000 in indices
+            assert 9000 in indices
+
+        assert downsample(timestamps[:50], [first[:50]], 100, DownsamplingMode.LTTB).tolist() == (
+            list(range(50))
+        )
+        assert downsample(timestamps, [], 100, DownsamplingMode.MINMAX).tolist() == list(
+            range(length)
+        )
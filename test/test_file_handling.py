@@ -0,0 +1,75 @@
+"""Tests for storing uploaded files"""
+
+# -- Imports ------------------------------------------------------------------
+
+import hashlib
+from io import BytesIO
+
+from pytest import raises
+
+from icoapi.scripts.file_handling import (
+    ChecksumMismatchError,
+    create_unique_file,
+    FileTooLargeError,
+    store_file,
+)
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestFileHandling:
+    """File handling test methods"""
+
+    def test_create_unique_file(self, tmp_path) -> None:
+        """Test that existing files are never overwritten"""
+
+        (tmp_path / "measurement.hdf5").write_bytes(b"existing")
+
+        names = []
+        for _ in range(3):
+            name, file = create_unique_file("measurement.hdf5", str(tmp_path))
+            with file:
+                file.write(name.encode())
+            names.append(name)
+
+        assert names == ["measurement__1.hdf5", "measurement__2.hdf5", "measurement__3.hdf5"]
+        assert (tmp_path / "measurement.hdf5").read_bytes() == b"existing"
+        for name in names:
+            assert (tmp_path / name).read_bytes() == name.encode()
+
+        # An existing suffix is replaced instead of extended
+        name, file = create_unique_file("measurement__2.hdf5", str(tmp_path))
+        file.close()
+        assert name == "measurement__4.hdf5"
+
+        # Free names are used unchanged
+        name, file = create_unique_file("other.hdf5", str(tmp_path))
+        file.close()
+        assert name == "other.hdf5"
+
+    def test_store_file(self, tmp_path, monkeypatch) -> None:
+        """Test copying a file in chunks"""
+
+        monkeypatch.setattr("icoapi.scripts.file_handling.COPY_CHUNK_SIZE", 7)
+        content = bytes(range(256)) * 10
+        checksum = hashlib.sha256(content).hexdigest()
+
+        name = store_file(BytesIO(content), "upload.hdf5", str(tmp_path), len(content), checksum)
+        assert name == "upload.hdf5"
+        assert (tmp_path / name).read_bytes() == content
+
+        name = store_file(BytesIO(content), "upload.hdf5", str(tmp_path), sha256=checksum.upper())
+        assert name == "upload__1.hdf5"
+        assert (tmp_path / name).read_bytes() == content
+
+    def test_store_file_errors(self, tmp_path) -> None:
+        """Test that rejected files are removed"""
+
+        content = b"x" * 100
+
+        with raises(FileTooLargeError):
+            store_file(BytesIO(content), "large.hdf5", str(tmp_path), max_size=99)
+        with raises(ChecksumMismatchError):
+            store_file(BytesIO(content), "changed.hdf5", str(tmp_path), sha256="0" * 64)
+
+        assert not list(tmp_path.iterdir())
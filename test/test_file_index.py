@@ -0,0 +1,163 @@
+"""Tests for the index of measurement files"""
+
+# -- Imports ------------------------------------------------------------------
+
+import os
+import sqlite3
+
+from pytest import fixture
+
+from icoapi.models.models import FileSortKey, SortOrder
+from icoapi.scripts.file_index import FileIndex
+
+# -- Fixtures -----------------------------------------------------------------
+
+# pylint: disable=redefined-outer-name
+
+
+@fixture
+def directory(tmp_path):
+    """Measurement directory with three files of different size"""
+
+    directory = tmp_path / "measurements"
+    directory.mkdir()
+    for name, size in (("b.hdf5", 30), ("a.hdf5", 10), ("c.hdf5", 20)):
+        (directory / name).write_bytes(b"x" * size)
+    (directory / ".a.hdf5.tmp").write_bytes(b"x")
+    (directory / "folder").mkdir()
+
+    return str(directory)
+
+
+@fixture
+def file_index(tmp_path):
+    """Empty file index"""
+
+    return FileIndex(str(tmp_path / "file_index.sqlite"))
+
+
+def touch_directory(directory: str, offset: int) -> None:
+    """Change the modification time of a directory by ``offset`` seconds"""
+
+    modified = os.stat(directory).st_mtime_ns + offset * 1_000_000_000
+    os.utime(directory, ns=(modified, modified))
+
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestFileIndex:
+    """File index test methods"""
+
+    def test_list_files(self, directory, file_index) -> None:
+        """Test sorting and paging of the indexed files"""
+
+        file_index.sync(directory)
+
+        files, total = file_index.list_files(directory, FileSortKey.NAME, SortOrder.ASC)
+        assert total == 3
+        assert [name for name, _, _ in files] == ["a.hdf5", "b.hdf5", "c.hdf5"]
+
+        files, _ = file_index.list_files(directory, FileSortKey.SIZE, SortOrder.DESC)
+        assert [(name, size) for name, size, _ in files] == [
+            ("b.hdf5", 30),
+            ("c.hdf5", 20),
+            ("a.hdf5", 10),
+        ]
+
+        files, total = file_index.list_files(
+            directory, FileSortKey.NAME, SortOrder.ASC, offset=1, limit=1
+        )
+        assert total == 3
+        assert [name for name, _, _ in files] == ["b.hdf5"]
+
+        files, total = file_index.list_files(directory, offset=5)
+        assert (files, total) == ([], 3)
+
+    def test_sync(self, directory, file_index) -> None:
+        """Test that the index follows changes of the directory"""
+
+        file_index.sync(directory)
+
+        os.remove(os.path.join(directory, "a.hdf5"))
+        with open(os.path.join(directory, "d.hdf5"), "wb") as file:
+            file.write(b"x" * 40)
+        touch_directory(directory, 1)
+        file_index.sync(directory)
+
+        files, total = file_index.list_files(directory, FileSortKey.NAME, SortOrder.ASC)
+        assert total == 3
+        assert [(name, size) for name, size, _ in files] == [
+            ("b.hdf5", 30),
+            ("c.hdf5", 20),
+            ("d.hdf5", 40),
+        ]
+
+    def test_sync_unchanged_directory(self, directory, file_index) -> None:
+        """Test that the directory is only scanned after it changed"""
+
+        file_index.sync(directory)
+
+        # Changing the content of a file does not change the directory
+        with open(os.path.join(directory, "a.hdf5"), "ab") as file:
+            file.write(b"x" * 90)
+        file_index.sync(directory)
+        files, _ = file_index.list_files(directory, FileSortKey.NAME, SortOrder.ASC)
+        assert files[0][:2] == ("a.hdf5", 10)
+
+        file_index.update(directory, "a.hdf5")
+        files, _ = file_index.list_files(directory, FileSortKey.NAME, SortOrder.ASC)
+        assert files[0][:2] == ("a.hdf5", 100)
+
+        os.remove(os.path.join(directory, "a.hdf5"))
+        file_index.update(directory, "a.hdf5")
+        _, total = file_index.list_files(directory)
+        assert total == 2
+
+    def test_multiple_directories(self, directory, file_index, tmp_path) -> None:
+        """Test switching between measurement directories"""
+
+        other = tmp_path / "other"
+        other.mkdir()
+        (other / "z.hdf5").write_bytes(b"x")
+
+        file_index.sync(directory)
+        file_index.sync(str(other))
+        # The first directory did not change, so it is not scanned again
+        file_index.sync(directory)
+
+        files, total = file_index.list_files(directory, FileSortKey.NAME, SortOrder.ASC)
+        assert total == 3
+        assert [name for name, _, _ in files] == ["a.hdf5", "b.hdf5", "c.hdf5"]
+        files, total = file_index.list_files(str(other))
+        assert (total, [name for name, _, _ in files]) == (1, ["z.hdf5"])
+
+        # Files with the same name in different directories are independent
+        (other / "a.hdf5").write_bytes(b"x" * 50)
+        file_index.update(str(other), "a.hdf5")
+        os.remove(os.path.join(directory, "b.hdf5"))
+        file_index.update(directory, "b.hdf5")
+
+        files, _ = file_index.list_files(directory, FileSortKey.NAME, SortOrder.ASC)
+        assert [(name, size) for name, size, _ in files] == [("a.hdf5", 10), ("c.hdf5", 20)]
+        files, _ = file_index.list_files(str(other), FileSortKey.NAME, SortOrder.ASC)
+        assert [(name, size) for name, size, _ in files] == [("a.hdf5", 50), ("z.hdf5", 1)]
+
+    def test_old_schema(self, directory, tmp_path) -> None:
+        """Test that an index with an outdated schema is rebuilt"""
+
+        database_path = str(tmp_path / "file_index.sqlite")
+        connection = sqlite3.connect(database_path)
+        with connection:
+            connection.execute(
+                "CREATE TABLE files (name TEXT PRIMARY KEY, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, modified INTEGER NOT NULL)"
+            )
+            connection.execute("INSERT INTO files VALUES ('old.hdf5', 1, 0, 0)")
+        connection.close()
+
+        file_index = FileIndex(database_path)
+        file_index.sync(directory)
+
+        _, total = file_index.list_files(directory)
+        assert total == 3
@@ -0,0 +1,77 @@
+"""Tests for helpers of the file endpoints"""
+
+# -- Imports ------------------------------------------------------------------
+
+from email.utils import formatdate
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from icoapi.routers.file_routes import is_not_modified
+
+# -- Functions ----------------------------------------------------------------
+
+MODIFIED = 1_700_000_000  # Modification time of the file in seconds since the epoch
+ETAG = '"abc-123"'
+
+
+def create_request(headers: dict[str, str]) -> Request:
+    """Create a request with the given headers"""
+
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "headers": [(key.encode(), value.encode()) for key, value in headers.items()],
+        }
+    )
+
+
+def create_response() -> Response:
+    """Create a response for a file with validators"""
+
+    return Response(
+        headers={"etag": ETAG, "last-modified": formatdate(MODIFIED, usegmt=True)},
+    )
+
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestFileRoutes:
+    """File route helper test methods"""
+
+    def test_is_not_modified_etag(self) -> None:
+        """Test conditional requests with entity tags"""
+
+        response = create_response()
+
+        assert is_not_modified(create_request({"if-none-match": ETAG}), response)
+        assert is_not_modified(create_request({"if-none-match": f"W/{ETAG}"}), response)
+        assert is_not_modified(create_request({"if-none-match": f'"other", {ETAG}'}), response)
+        assert is_not_modified(create_request({"if-none-match": "*"}), response)
+        assert not is_not_modified(create_request({"if-none-match": '"other"'}), response)
+
+    def test_is_not_modified_date(self) -> None:
+        """Test conditional requests with modification dates"""
+
+        response = create_response()
+
+        for seconds, expected in ((MODIFIED, True), (MODIFIED + 60, True), (MODIFIED - 60, False)):
+            request = create_request({"if-modified-since": formatdate(seconds, usegmt=True)})
+            assert is_not_modified(request, response) is expected
+
+        assert not is_not_modified(create_request({"if-modified-since": "invalid"}), response)
+        assert not is_not_modified(create_request({}), response)
+
+    def test_is_not_modified_precedence(self) -> None:
+        """Test that entity tags take precedence over modification dates"""
+
+        request = create_request(
+            {
+                "if-none-match": '"other"',
+                "if-modified-since": formatdate(MODIFIED + 60, usegmt=True),
+            }
+        )
+
+        assert not is_not_modified(request, create_response())
@@ -0,0 +1,84 @@
+"""Tests for the online IFT calculation"""
+
+# -- Imports ------------------------------------------------------------------
+
+from icolyzer import iftlibrary
+import numpy as np
+from pytest import approx
+
+from icoapi.scripts.ift import IFTEngine, is_ift_computable
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestIFTEngine:
+    """IFT engine test methods"""
+
+    async def run_engine(
+        self, samples: np.ndarray, sample_frequency: float, window_length: float, block: int
+    ) -> tuple[np.ndarray, np.ndarray, IFTEngine]:
+        """Feed samples block by block and collect the published values"""
+
+        published: list[tuple[np.ndarray, np.ndarray]] = []
+        engine = IFTEngine(
+            sample_frequency,
+            window_length,
+            lambda timestamps, values: published.append((timestamps, values)),
+        )
+        timestamps = np.arange(len(samples)) / sample_frequency
+        for start in range(0, len(samples), block):
+            engine.append(timestamps[start : start + block], samples[start : start + block])
+            if engine.task is not None:
+                await engine.task
+        await engine.finish()
+
+        if not published:
+            return np.empty(0), np.empty(0), engine
+
+        return (
+            np.concatenate([timestamps for timestamps, _ in published]),
+            np.concatenate([values for _, values in published]),
+            engine,
+        )
+
+    async def test_segments_match_full_calculation(self) -> None:
+        """Test that segmented values equal a single calculation over all samples"""
+
+        sample_frequency = 3174.0
+        window_length = 0.15
+        random = np.random.default_rng(0)
+        samples = np.sin(np.arange(20_000) / 50) + random.normal(size=20_000) * 0.1
+
+        expected = np.asarray(
+            iftlibrary.ift_value(samples, sample_frequency, window_length), dtype=np.float64
+        )
+        timestamps, values, engine = await self.run_engine(
+            samples, sample_frequency, window_length, 256
+        )
+
+        assert len(values) == len(samples)
+        assert timestamps.tolist() == approx((np.arange(len(samples)) / sample_frequency).tolist())
+        assert values.tolist() == approx(expected.tolist())
+        # Only the current segment and its context are kept in memory
+        assert len(engine.samples) < 2 * (engine.segment_size + engine.context)
+
+    async def test_too_few_samples(self) -> None:
+        """Test that short measurements do not publish values"""
+
+        samples = np.zeros(100)
+        _, values, _ = await self.run_engine(samples, 3174.0, 0.15, 50)
+
+        assert len(values) == 0
+
+    async def test_disabled(self) -> None:
+        """Test parameters that do not allow an IFT calculation"""
+
+        assert is_ift_computable(3174.0, 0.15)
+        assert not is_ift_computable(100.0, 0.15)
+        assert not is_ift_computable(3174.0, 2)
+
+        samples = np.zeros(10_000)
+        _, values, engine = await self.run_engine(samples, 3174.0, 2, 256)
+
+        assert not engine.enabled
+        assert len(values) == 0
@@ -1,5 +1,11 @@
 """Tests for measurement endpoint"""
 
+# -- Imports ------------------------------------------------------------------
+
+import numpy as np
+
+from icoapi.scripts.stream_encoding import FRAME_HEADER, FrameType
+
 # -- Classes ------------------------------------------------------------------
 
 
@@ -17,10 +23,12 @@ class TestMeasurement:
         body = response.json()
 
         for key in (
+            "clients",
             "instructions",
             "name",
             "running",
             "start_time",
+            "storage",
             "tool_name",
         ):
             assert key in body
@@ -102,3 +110,30 @@ class TestMeasurement:
             assert message["third"] is None
             assert 0 <= message["counter"] <= 255
             assert message["ift"] is None
+
+    def test_stream_binary(
+        self, measurement, measurement_prefix, client  # pylint: disable=unused-argument
+    ) -> None:
+        """Check binary WebSocket streaming data"""
+
+        ws_url = str(client.base_url).replace("http", "ws")
+        stream = f"{ws_url}{measurement_prefix}/stream?format=binary"
+
+        with client.websocket_connect(stream) as websocket:
+            frame = websocket.receive_bytes()
+            header = FRAME_HEADER.unpack_from(frame)
+            # Magic bytes, format version, frame type and channel mask (only the
+            # first channel is enabled in the test configuration)
+            assert header[:4] == (b"ICOF", 1, FrameType.DATA, 0b001)
+            count = header[5]
+            assert count >= 1
+            assert header[6] >= 0  # Base timestamp
+
+            offset = FRAME_HEADER.size
+            timestamps = np.frombuffer(frame, dtype="<f4", count=count, offset=offset)
+            first = np.frombuffer(frame, dtype="<f4", count=count, offset=offset + 4 * count)
+            counters = np.frombuffer(frame, dtype=np.uint8, offset=offset + 8 * count)
+
+            assert (timestamps >= 0).all()
+            assert ((first >= -100) & (first <= 100)).all()
+            assert len(counters) == count
@@ -0,0 +1,282 @@
+"""Tests for reading ranges of measurement files"""
+
+# -- Imports ------------------------------------------------------------------
+
+import os
+import shutil
+import threading
+
+from icotronic.can.streaming import StreamingConfiguration
+from icotronic.measurement import Storage
+import numpy as np
+from pytest import approx, fixture, raises
+import tables
+
+from icoapi.models.models import DownsamplingMode, RangeUnit
+from icoapi.scripts.measurement_file import (
+    build_overview,
+    ensure_overview,
+    find_row,
+    get_file_lock,
+    get_row_range,
+    has_overview,
+    MeasurementFileError,
+    OVERVIEW_FACTORS,
+    read_metadata,
+    read_range,
+    repack,
+    select_overview_factor,
+    verify_copy,
+)
+
+# -- Fixtures -----------------------------------------------------------------
+
+# pylint: disable=redefined-outer-name
+
+ROWS = 20_000
+TIMESTAMP_STEP = 100  # Microseconds between two rows
+
+
+@fixture
+def measurement_file(tmp_path):
+    """Measurement file with one sine wave channel"""
+
+    file_path = tmp_path / "measurement.hdf5"
+    with Storage(file_path, StreamingConfiguration(first=True)) as storage:
+        rows = np.zeros(ROWS, dtype=storage.acceleration.dtype)
+        rows["counter"] = np.arange(ROWS) % 256
+        rows["timestamp"] = np.arange(ROWS) * TIMESTAMP_STEP
+        rows["x"] = np.sin(np.arange(ROWS) / 100)
+        storage.acceleration.append(rows)
+
+    return str(file_path)
+
+
+@fixture
+def empty_measurement_file(tmp_path):
+    """Measurement file without acceleration data"""
+
+    file_path = tmp_path / "empty.hdf5"
+    with Storage(file_path, StreamingConfiguration(first=True)):
+        pass
+
+    return str(file_path)
+
+
+@fixture
+def acceleration_table(measurement_file):
+    """Acceleration table of the measurement file"""
+
+    with tables.open_file(measurement_file, mode="r") as file_handle:
+        yield file_handle.get_node("/acceleration")
+
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestMeasurementFile:
+    """Measurement file test methods"""
+
+    def test_find_row(self, acceleration_table) -> None:
+        """Test binary search for timestamps"""
+
+        assert find_row(acceleration_table, 0) == 0
+        assert find_row(acceleration_table, 300) == 3
+        assert find_row(acceleration_table, 250) == 3
+        assert find_row(acceleration_table, (ROWS - 1) * TIMESTAMP_STEP) == ROWS - 1
+        assert find_row(acceleration_table, ROWS * TIMESTAMP_STEP) == ROWS
+
+    def test_get_row_range(self, acceleration_table) -> None:
+        """Test conversion of time and row ranges"""
+
+        assert get_row_range(acceleration_table, None, None, RangeUnit.TIME) == (0, ROWS)
+        assert get_row_range(acceleration_table, 0.001, 0.002, RangeUnit.TIME) == (10, 20)
+        assert get_row_range(acceleration_table, 100, 110, RangeUnit.ROW) == (100, 110)
+
+        # Ranges outside of the table are clamped
+        assert get_row_range(acceleration_table, -5, ROWS + 5, RangeUnit.ROW) == (0, ROWS)
+        assert get_row_range(acceleration_table, 100, 50, RangeUnit.ROW) == (100, 100)
+        assert get_row_range(acceleration_table, 10, None, RangeUnit.TIME) == (ROWS, ROWS)
+
+    def test_read_range_small(self, measurement_file) -> None:
+        """Test reading a range with fewer rows than requested points"""
+
+        for mode in DownsamplingMode:
+            measurement = read_range(measurement_file, 100, 110, RangeUnit.ROW, 1000, mode)
+
+            assert (measurement.start_row, measurement.end_row) == (100, 110)
+            assert measurement.timestamp == [row * TIMESTAMP_STEP for row in range(100, 110)]
+            assert measurement.counter == list(range(100, 110))
+            assert [dataset.name for dataset in measurement.datasets] == ["x"]
+            assert measurement.datasets[0].data == approx(np.sin(np.arange(100, 110) / 100))
+
+    def test_read_range_downsampled(self, measurement_file) -> None:
+        """Test reducing a range to the requested number of points"""
+
+        for mode in DownsamplingMode:
+            measurement = read_range(measurement_file, None, None, RangeUnit.TIME, 500, mode)
+
+            assert (measurement.start_row, measurement.end_row) == (0, ROWS)
+            assert 0 < len(measurement.timestamp) <= 2 * 500 + 2
+            assert measurement.timestamp == sorted(measurement.timestamp)
+            data = measurement.datasets[0].data
+            assert len(data) == len(measurement.timestamp)
+
+        # Files without overview are read without changing them
+        modified = os.stat(measurement_file).st_mtime_ns
+        measurement = read_range(
+            measurement_file, None, None, RangeUnit.TIME, 500, DownsamplingMode.MINMAX
+        )
+        assert measurement.factor == 1
+        assert os.stat(measurement_file).st_mtime_ns == modified
+        raw = measurement.datasets[0].data
+
+        # The min/max envelope (read from the overview) keeps the extreme values
+        assert ensure_overview(measurement_file)
+        measurement = read_range(
+            measurement_file, None, None, RangeUnit.TIME, 500, DownsamplingMode.MINMAX
+        )
+        assert measurement.factor > 1
+        assert max(measurement.datasets[0].data) == approx(max(raw), abs=1e-6)
+        assert max(measurement.datasets[0].data) == approx(1, abs=1e-6)
+        assert min(measurement.datasets[0].data) == approx(-1, abs=1e-6)
+
+    def test_read_range_empty(self, measurement_file, empty_measurement_file) -> None:
+        """Test reading ranges without any rows"""
+
+        end = ROWS * TIMESTAMP_STEP / 1_000_000
+        for file_path, start, stop, unit, expected in (
+            (measurement_file, 100.0, None, RangeUnit.TIME, (ROWS, ROWS)),
+            (measurement_file, end + 1, end + 2, RangeUnit.TIME, (ROWS, ROWS)),
+            (measurement_file, 1.0, 1.0, RangeUnit.TIME, (10_000, 10_000)),
+            (measurement_file, 0, 0, RangeUnit.ROW, (0, 0)),
+            (empty_measurement_file, None, None, RangeUnit.TIME, (0, 0)),
+        ):
+            for mode in DownsamplingMode:
+                measurement = read_range(file_path, start, stop, unit, 500, mode)
+
+                assert (measurement.start_row, measurement.end_row) == expected
+                assert measurement.timestamp == []
+                assert measurement.counter == []
+                assert [dataset.data for dataset in measurement.datasets] == [[]]
+
+    def test_select_overview_factor(self) -> None:
+        """Test selection of the overview level"""
+
+        assert select_overview_factor(0, 1000) == 1
+        assert select_overview_factor(5000, 1000) == 1
+        assert select_overview_factor(10_000, 1000) == 10
+        assert select_overview_factor(999_999, 1000) == 100
+        assert select_overview_factor(1_000_000, 1000) == 1000
+        assert select_overview_factor(10**9, 1000) == max(OVERVIEW_FACTORS)
+
+    def test_build_overview(self, measurement_file) -> None:
+        """Test minimum, maximum and mean of the overview levels"""
+
+        with tables.open_file(measurement_file, mode="a") as file_handle:
+            assert not has_overview(file_handle)
+            build_overview(file_handle)
+            assert has_overview(file_handle)
+
+            data = file_handle.get_node("/acceleration").read()
+            for factor in OVERVIEW_FACTORS:
+                level = file_handle.get_node(f"/overview/level_{factor}").read()
+                buckets = -(-ROWS // factor)
+
+                assert len(level) == buckets
+                assert level["timestamp"].tolist() == data["timestamp"][::factor].tolist()
+                assert level["counter"].tolist() == data["counter"][::factor].tolist()
+                for bucket in (0, buckets - 1):
+                    values = data["x"][bucket * factor : (bucket + 1) * factor]
+                    assert level["x_min"][bucket] == approx(values.min(), abs=1e-6)
+                    assert level["x_max"][bucket] == approx(values.max(), abs=1e-6)
+                    assert level["x_mean"][bucket] == approx(values.mean(), abs=1e-6)
+
+            # The overview is outdated as soon as rows are added
+            table = file_handle.get_node("/acceleration")
+            table.append(data[:10])
+            assert not has_overview(file_handle)
+
+    def test_ensure_overview(self, measurement_file, tmp_path) -> None:
+        """Test storing the overview of imported files"""
+
+        assert ensure_overview(measurement_file)
+        modified = os.stat(measurement_file).st_mtime_ns
+        assert ensure_overview(measurement_file)
+        assert os.stat(measurement_file).st_mtime_ns == modified
+
+        invalid_file = tmp_path / "invalid.hdf5"
+        invalid_file.write_bytes(b"no HDF5 file")
+        assert not ensure_overview(str(invalid_file))
+
+    def test_file_in_use(self, measurement_file) -> None:
+        """Test reading a file that is open in another mode"""
+
+        with tables.open_file(measurement_file, mode="a"):
+            with raises(MeasurementFileError):
+                read_range(measurement_file, 0, 10, RangeUnit.ROW, 500, DownsamplingMode.MINMAX)
+            with raises(MeasurementFileError):
+                read_metadata(measurement_file)
+            assert not ensure_overview(measurement_file)
+
+    def test_repack(self, measurement_file, tmp_path) -> None:
+        """Test compressing a file and replacing the original"""
+
+        original = tmp_path / "original.hdf5"
+        shutil.copyfile(measurement_file, original)
+
+        repack(measurement_file, "blosc", 5)
+
+        verify_copy(str(original), measurement_file)
+        with tables.open_file(measurement_file, mode="r") as file_handle:
+            table = file_handle.get_node("/acceleration")
+            assert (table.filters.complib, table.filters.complevel) == ("blosc", 5)
+            assert table.attrs["compression"] == "blosc"
+            assert table.attrs["compression_level"] == "5"
+            assert table.attrs["chunk_rows"] == f"{table.chunkshape[0]}"
+        assert sorted(os.listdir(tmp_path)) == ["measurement.hdf5", "original.hdf5"]
+
+    def test_repack_failure(self, measurement_file, monkeypatch) -> None:
+        """Test that the original file is kept if the copy is different"""
+
+        def fail(*_):
+            raise MeasurementFileError("Copy does not contain the same data")
+
+        monkeypatch.setattr("icoapi.scripts.measurement_file.verify_copy", fail)
+        with open(measurement_file, "rb") as file:
+            content = file.read()
+
+        with raises(MeasurementFileError):
+            repack(measurement_file, "blosc", 5)
+
+        with open(measurement_file, "rb") as file:
+            assert file.read() == content
+        assert os.listdir(os.path.dirname(measurement_file)) == ["measurement.hdf5"]
+
+        with tables.open_file(measurement_file, mode="a"):
+            with raises(MeasurementFileError):
+                repack(measurement_file, "blosc", 5)
+
+    def test_repack_lock(self, measurement_file) -> None:
+        """Test that compression waits until other changes of the file are done"""
+
+        repacked = threading.Event()
+
+        def compress() -> None:
+            repack(measurement_file, "blosc", 5)
+            repacked.set()
+
+        thread = threading.Thread(target=compress)
+
+        with get_file_lock(measurement_file):
+            thread.start()
+            assert not repacked.wait(0.2)
+            with tables.open_file(measurement_file, mode="a") as file_handle:
+                file_handle.get_node("/acceleration").attrs["post_metadata"] = "changed"
+
+        thread.join()
+        assert repacked.is_set()
+        with tables.open_file(measurement_file, mode="r") as file_handle:
+            table = file_handle.get_node("/acceleration")
+            assert table.attrs["post_metadata"] == "changed"
+            assert table.filters.complib == "blosc"
@@ -0,0 +1,152 @@
+"""Tests for updates of the system state"""
+
+# -- Imports ------------------------------------------------------------------
+
+import asyncio
+from dataclasses import replace
+from typing import Any
+
+from pytest import fixture
+
+from icoapi.models.globals import GeneralMessenger, get_state_changes
+from icoapi.scripts.settings import get_settings
+
+# -- Fixtures -----------------------------------------------------------------
+
+# pylint: disable=redefined-outer-name, protected-access
+
+
+@fixture
+def sent_states(monkeypatch) -> list[int]:
+    """Record the calls of ``send_state`` with a short update interval"""
+
+    settings = replace(get_settings(), websocket_state_interval=0.01)
+    monkeypatch.setattr("icoapi.models.globals.get_settings", lambda: settings)
+    monkeypatch.setattr(GeneralMessenger, "_changed", False)
+    monkeypatch.setattr(GeneralMessenger, "_update_task", None)
+
+    sent: list[int] = []
+
+    async def send_state() -> None:
+        sent.append(len(sent))
+
+    monkeypatch.setattr(GeneralMessenger, "send_state", send_state)
+
+    return sent
+
+
+# -- Functions ----------------------------------------------------------------
+
+
+def apply_patch(state: Any, patch: Any) -> Any:
+    """Apply a JSON merge patch (RFC 7396)"""
+
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(state) if isinstance(state, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = apply_patch(result.get(key), value)
+
+    return result
+
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestStateUpdates:
+    """State update test methods"""
+
+    def test_get_state_changes(self) -> None:
+        """Test that only changed fields are part of a patch"""
+
+        previous = {
+            "can_ready": True,
+            "disk_capacity": {"total": 100, "available": 50},
+            "clients": [1, 2],
+        }
+
+        assert not get_state_changes(previous, previous)
+        assert get_state_changes({}, previous) == previous
+        assert get_state_changes(
+            previous,
+            {
+                "can_ready": False,
+                "disk_capacity": {"total": 100, "available": 40},
+                "clients": [1, 2, 3],
+            },
+        ) == {"can_ready": False, "disk_capacity": {"available": 40}, "clients": [1, 2, 3]}
+
+    def test_get_state_changes_removed_fields(self) -> None:
+        """Test that removed fields are deleted by the patch"""
+
+        previous = {
+            "measurement_status": {
+                "name": "test",
+                "instructions": {"meta": {"parameters": {"a": 1, "b": 2}}},
+            }
+        }
+        current = {
+            "measurement_status": {
+                "name": None,
+                "instructions": {"meta": {"parameters": {"a": 1}}},
+            }
+        }
+
+        changes = get_state_changes(previous, current)
+
+        assert changes == {
+            "measurement_status": {
+                "name": None,
+                "instructions": {"meta": {"parameters": {"b": None}}},
+            }
+        }
+        patched = apply_patch(previous, changes)
+        assert patched["measurement_status"]["instructions"] == current["measurement_status"][
+            "instructions"
+        ]
+        assert "name" not in patched["measurement_status"]
+
+        # Objects that replace other values are sent complete
+        assert get_state_changes({"cloud": None}, {"cloud": {"ready": True}}) == {
+            "cloud": {"ready": True}
+        }
+
+    async def test_run_updates(self, sent_states) -> None:
+        """Test that changes within the update interval are sent once"""
+
+        for _ in range(10):
+            GeneralMessenger.mark_changed()
+        task = GeneralMessenger._update_task
+        assert task is not None
+        await task
+
+        assert len(sent_states) == 1
+
+        # A change while an update is pending results in one more update
+        GeneralMessenger.mark_changed()
+        await asyncio.sleep(0)
+        GeneralMessenger.mark_changed()
+        assert GeneralMessenger._update_task is not None
+        await GeneralMessenger._update_task
+
+        assert len(sent_states) == 2
+
+    async def test_run_updates_continues(self, sent_states, monkeypatch) -> None:
+        """Test that changes during sending are sent in the next interval"""
+
+        async def send_state() -> None:
+            sent_states.append(len(sent_states))
+            if len(sent_states) == 1:
+                GeneralMessenger.mark_changed()
+
+        monkeypatch.setattr(GeneralMessenger, "send_state", send_state)
+
+        GeneralMessenger.mark_changed()
+        assert GeneralMessenger._update_task is not None
+        await GeneralMessenger._update_task
+
+        assert len(sent_states) == 2
@@ -0,0 +1,95 @@
+"""Tests for the layout of new measurement files"""
+
+# -- Imports ------------------------------------------------------------------
+
+from dataclasses import replace
+
+from icotronic.can.streaming import StreamingConfiguration
+from icotronic.measurement import Storage
+import numpy as np
+from pytest import raises
+
+from icoapi.models.models import StorageLayout
+from icoapi.scripts.settings import get_settings
+from icoapi.scripts.storage_writer import (
+    apply_storage_layout,
+    get_storage_layout,
+    validate_storage_layout,
+)
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestStorageLayout:
+    """Storage layout test methods"""
+
+    def test_validate_storage_layout(self) -> None:
+        """Test checking the values of a layout"""
+
+        assert not validate_storage_layout(StorageLayout())
+        assert not validate_storage_layout(StorageLayout(1024, "blosc", 9))
+        assert not validate_storage_layout(StorageLayout(1, "zlib", 0))
+
+        errors = validate_storage_layout(StorageLayout(0, "unknown", 10))
+        assert [error.split(":")[0] for error in errors] == [
+            "chunk_rows",
+            "compression",
+            "compression_level",
+        ]
+
+    def test_get_storage_layout(self, monkeypatch) -> None:
+        """Test filling missing values from the settings"""
+
+        settings = replace(
+            get_settings(),
+            storage_chunk_rows=512,
+            storage_compression="blosc",
+            storage_compression_level=3,
+        )
+        monkeypatch.setattr("icoapi.scripts.storage_writer.get_settings", lambda: settings)
+
+        assert get_storage_layout() == StorageLayout(512, "blosc", 3)
+        assert get_storage_layout(StorageLayout(1024, "zlib", 0)) == StorageLayout(1024, "zlib", 0)
+        assert get_storage_layout(StorageLayout(compression_level=7)) == StorageLayout(
+            512, "blosc", 7
+        )
+
+    def test_apply_storage_layout(self, tmp_path) -> None:
+        """Test chunk size, filters and attributes of the acceleration table"""
+
+        with Storage(tmp_path / "blosc.hdf5", StreamingConfiguration(first=True)) as storage:
+            columns = storage.acceleration.colnames
+            apply_storage_layout(storage, StorageLayout(1000, "blosc", 5))
+
+            table = storage.acceleration
+            assert table.colnames == columns
+            assert table.chunkshape == (1000,)
+            assert (table.filters.complib, table.filters.complevel) == ("blosc", 5)
+            assert table.filters.shuffle
+            assert storage["chunk_rows"] == "1000"
+            assert storage["compression"] == "blosc"
+            assert storage["compression_level"] == "5"
+
+        with Storage(tmp_path / "none.hdf5", StreamingConfiguration(first=True)) as storage:
+            apply_storage_layout(storage, StorageLayout(compression="zlib", compression_level=0))
+
+            assert storage.acceleration.filters.complevel == 0
+            assert storage["compression"] == "none"
+            assert storage["compression_level"] == "0"
+
+    def test_apply_storage_layout_default(self, tmp_path) -> None:
+        """Test that the table keeps zlib without configured compression library"""
+
+        with Storage(tmp_path / "default.hdf5", StreamingConfiguration(first=True)) as storage:
+            apply_storage_layout(storage, StorageLayout(compression_level=9), expected_rows=10**6)
+
+            table = storage.acceleration
+            assert (table.filters.complib, table.filters.complevel) == ("zlib", 4)
+            assert storage["compression"] == "zlib"
+            assert storage["compression_level"] == "4"
+            assert storage["chunk_rows"] == f"{table.chunkshape[0]}"
+
+            # The layout cannot change after data was stored
+            table.append(np.zeros(1, dtype=table.dtype))
+            with raises(ValueError):
+                apply_storage_layout(storage, StorageLayout(1000, "blosc", 5))
@@ -0,0 +1,113 @@
+"""Tests for the persistent upload queue"""
+
+# -- Imports ------------------------------------------------------------------
+
+from pytest import fixture, raises
+
+from icoapi.models.models import UploadJobState
+from icoapi.scripts.upload_queue import UploadCancelledError, UploadQueue
+
+# -- Fixtures -----------------------------------------------------------------
+
+# pylint: disable=redefined-outer-name
+
+
+@fixture
+def database_path(tmp_path):
+    """Path of the queue database"""
+
+    return str(tmp_path / "uploads.sqlite")
+
+
+@fixture
+def upload_queue(database_path):
+    """Empty upload queue"""
+
+    return UploadQueue(database_path, concurrency=1)
+
+
+@fixture
+def measurement_files(tmp_path):
+    """Files that can be uploaded"""
+
+    paths = []
+    for number in range(3):
+        path = tmp_path / f"measurement_{number}.hdf5"
+        path.write_bytes(b"x" * (number + 1))
+        paths.append(str(path))
+
+    return paths
+
+
+# -- Classes ------------------------------------------------------------------
+
+
+class TestUploadQueue:
+    """Upload queue test methods"""
+
+    def test_add(self, upload_queue, measurement_files) -> None:
+        """Test adding jobs"""
+
+        job = upload_queue.add(measurement_files[2], "bucket", "folder/measurement_2.hdf5")
+
+        assert job.state == UploadJobState.QUEUED
+        assert job.filename == "measurement_2.hdf5"
+        assert job.size == 3
+        assert upload_queue.get_job(job.id) == job
+        assert upload_queue.list_jobs() == [job]
+        assert upload_queue.get_job("unknown") is None
+
+    def test_claim(self, upload_queue, measurement_files) -> None:
+        """Test that jobs are claimed in the order they were added"""
+
+        jobs = [upload_queue.add(path, "bucket", path) for path in measurement_files]
+
+        claimed = [upload_queue.claim() for _ in jobs]
+        assert [row["id"] for row in claimed] == [job.id for job in jobs]
+        assert upload_queue.claim() is None
+        for job in jobs:
+            assert upload_queue.get_job(job.id).state == UploadJobState.RUNNING
+
+    def test_resume(self, upload_queue, database_path, measurement_files) -> None:
+        """Test that interrupted jobs are queued again after a restart"""
+
+        running = upload_queue.add(measurement_files[0], "bucket", "running")
+        queued = upload_queue.add(measurement_files[1], "bucket", "queued")
+        completed = upload_queue.add(measurement_files[2], "bucket", "completed")
+        upload_queue.claim()
+        upload_queue.update(completed.id, state=UploadJobState.COMPLETED)
+
+        restarted = UploadQueue(database_path, concurrency=1)
+        assert restarted.resume() == 1
+
+        states = {job.id: job.state for job in restarted.list_jobs()}
+        assert states == {
+            running.id: UploadJobState.QUEUED,
+            queued.id: UploadJobState.QUEUED,
+            completed.id: UploadJobState.COMPLETED,
+        }
+        row = restarted.claim()
+        assert row is not None
+        assert row["id"] == running.id
+
+    def test_cancel(self, upload_queue, measurement_files) -> None:
+        """Test cancelling queued, running and finished jobs"""
+
+        running = upload_queue.add(measurement_files[0], "bucket", "running")
+        queued = upload_queue.add(measurement_files[1], "bucket", "queued")
+        completed = upload_queue.add(measurement_files[2], "bucket", "completed")
+        upload_queue.claim()
+        upload_queue.update(completed.id, state=UploadJobState.COMPLETED)
+
+        assert upload_queue.cancel(queued.id).state == UploadJobState.CANCELLED
+        assert upload_queue.claim() is None
+
+        # Running jobs stop in their upload thread
+        assert upload_queue.cancel(running.id).state == UploadJobState.RUNNING
+        with raises(UploadCancelledError):
+            upload_queue.check(running.id)
+
+        assert upload_queue.cancel(completed.id).state == UploadJobState.COMPLETED
+        upload_queue.check(completed.id)
+
+        assert upload_queue.cancel("unknown") is None